@@ -0,0 +1,267 @@
+"""
+Batch uploads: many images, or ZIP archives of them, in one request
+
+``POST /api/uploads/batch`` takes any number of ``images`` files (ZIP
+archives among them are unpacked member by member) and answers with a
+batch id. Every file is streamed straight into content-addressed storage;
+archive members are decompressed chunk by chunk, never held in memory as a
+whole. All detections are created with one bulk insert and queued in one
+go. ``GET /api/uploads/batch/<batch_id>`` reports progress and results.
+"""
+import os
+import zipfile
+from datetime import datetime
+
+from flask import Blueprint, Request, current_app, jsonify, request
+from werkzeug.utils import secure_filename
+
+from models import db
+from utils.file_handler import file_extension, store_stream
+
+bp = Blueprint('upload_batch', __name__)
+
+ARCHIVE_EXTENSIONS = {'.zip'}
+
+
+class BatchRequest(Request):
+    """Request class that allows BATCH_MAX_CONTENT_LENGTH bodies on the batch endpoints"""
+
+    @property
+    def max_content_length(self):
+        if self.blueprint == bp.name:
+            return current_app.config.get('BATCH_MAX_CONTENT_LENGTH')
+        return super().max_content_length
+
+
+class _LimitedReader:
+    """Read at most ``limit`` bytes from ``stream``; archive headers can lie about sizes"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.remaining = limit
+
+    def read(self, size=-1):
+        chunk = self.stream.read(size)
+        self.remaining -= len(chunk)
+        if self.remaining < 0:
+            raise ValueError("File is larger than the per-file limit")
+        return chunk
+
+
+def _archive_members(archive, max_size, allowed_file):
+    """
+    Yield (filename, stream, skip_reason) for each file in a ZIP archive
+
+    Members are opened one at a time and decompressed as they are read.
+    """
+    try:
+        zf = zipfile.ZipFile(archive.stream)
+    except zipfile.BadZipFile:
+        yield archive.filename, None, 'Not a valid ZIP archive'
+        return
+    with zf:
+        for info in zf.infolist():
+            name = os.path.basename(info.filename)
+            if info.is_dir() or not name or name.startswith('.') or info.filename.startswith('__MACOSX/'):
+                continue
+            if not allowed_file(name):
+                yield info.filename, None, 'Invalid file type'
+            elif info.file_size > max_size:
+                yield info.filename, None, 'File is larger than the per-file limit'
+            else:
+                with zf.open(info) as member:
+                    yield info.filename, _LimitedReader(member, max_size), None
+
+
+def _uploads(files, max_size, allowed_file):
+    """Yield (filename, stream, skip_reason) for every image in the request"""
+    for upload in files:
+        if not upload or not upload.filename:
+            continue
+        if file_extension(upload.filename) in ARCHIVE_EXTENSIONS:
+            yield from _archive_members(upload, max_size, allowed_file)
+        elif allowed_file(upload.filename):
+            yield upload.filename, _LimitedReader(upload.stream, max_size), None
+        else:
+            yield upload.filename, None, 'Invalid file type'
+
+
+@bp.route('/uploads/batch', methods=['POST'])
+def upload_batch():
+    """
+    Store a batch of images and queue a detection for each
+
+    Form fields: ``images`` (repeatable; images and/or ZIP archives),
+    optional ``name``, ``email`` and ``tiled``.
+    """
+    from app import allowed_file
+    from config import Config
+    from models.detection import Detection
+    from models.detection_fingerprint import DetectionFingerprint
+    from models.organism import DetectionOrganism
+    from models.statistics import record_inserted
+    from models.upload_batch import UploadBatch, UploadBatchItem
+    from services.gram_staining import stain_version
+    from services.response_cache import mark_written
+    from services.yolo_detection import model_version
+    from utils.database import bulk_insert, insert_returning_ids
+
+    files = request.files.getlist('images')
+    if not any(upload.filename for upload in files):
+        return jsonify({
+            "success": False,
+            "error": "No files provided",
+            "details": "Send one or more 'images' files (images or ZIP archives)"
+        }), 400
+
+    name = request.form.get('name')
+    email = request.form.get('email')
+    tiled_param = request.form.get('tiled')
+    tiled = Config.TILED_INFERENCE if tiled_param is None else tiled_param.lower() in ['true', '1', 't', 'yes']
+
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    max_files = current_app.config.get('BATCH_MAX_FILES', 1000)
+    max_size = current_app.config.get('BATCH_MAX_FILE_SIZE') or current_app.config['MAX_CONTENT_LENGTH']
+
+    # Stream every file into storage, one at a time
+    stored, skipped = [], []
+    try:
+        for filename, stream, reason in _uploads(files, max_size, allowed_file):
+            if reason is None and len(stored) >= max_files:
+                reason = f"Batch limit of {max_files} files reached"
+            if reason is not None:
+                skipped.append({'filename': filename, 'reason': reason})
+                continue
+            safe_name = secure_filename(os.path.basename(filename)) or 'image'
+            try:
+                blob = store_stream(stream, upload_folder, file_extension(safe_name))
+            except (IOError, ValueError, zipfile.BadZipFile) as e:
+                skipped.append({'filename': filename, 'reason': str(e)})
+                continue
+            stored.append((safe_name, blob))
+    except Exception as e:
+        print(f"Error storing batch upload: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to store uploaded files", "details": str(e)}), 500
+
+    if not stored:
+        return jsonify({"success": False, "error": "No valid images in the upload", "skipped": skipped}), 400
+
+    # Images already processed under the same model and staining reuse those results
+    sources = DetectionFingerprint.find_sources(
+        [blob.content_hash for _, blob in stored], model_version(Config), stain_version(Config), tiled
+    )
+
+    now = datetime.utcnow()
+    rows = []
+    for safe_name, blob in stored:
+        source = sources.get(blob.content_hash)
+        rows.append({
+            'filename': safe_name,
+            'original_image_path': blob.path,
+            'processed_image_path': source.processed_image_path if source else None,
+            'detection_results': source.detection_results if source else None,
+            'detected_organisms': source.detected_organisms if source else None,
+            'water_usage_recommendations': source.water_usage_recommendations if source else None,
+            'status': 'completed' if source else 'pending',
+            'name': name,
+            'email': email,
+            'timestamp': now
+        })
+
+    try:
+        connection = db.session.connection()
+        batch = UploadBatch(name=name, email=email, tiled=tiled, total=len(rows), skipped=len(skipped))
+        db.session.add(batch)
+        db.session.flush()
+
+        detection_ids = insert_returning_ids(connection, Detection.__table__, rows)
+        record_inserted(connection, rows)
+        bulk_insert(connection, UploadBatchItem.__table__, [
+            {
+                'batch_id': batch.id,
+                'detection_id': detection_id,
+                'position': position,
+                'filename': safe_name,
+                'content_hash': blob.content_hash
+            }
+            for position, (detection_id, (safe_name, blob)) in enumerate(zip(detection_ids, stored))
+        ])
+        DetectionOrganism.add_for_detections({
+            detection_id: sources[blob.content_hash].parsed_organisms
+            for detection_id, (_, blob) in zip(detection_ids, stored)
+            if blob.content_hash in sources
+        })
+        mark_written(db.session, detection_ids)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating batch detections: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to create detections", "details": str(e)}), 500
+
+    # Queue the new detections; cached ones only need their results email
+    payloads = []
+    for detection_id, (_, blob) in zip(detection_ids, stored):
+        if blob.content_hash in sources:
+            if email:
+                payloads.append({'detection_id': detection_id, 'notify_only': True})
+        else:
+            payloads.append({'detection_id': detection_id, 'tiled': tiled, 'content_hash': blob.content_hash})
+    try:
+        from services.job_queue import get_job_queue
+        get_job_queue(current_app.config).enqueue_many(payloads)
+    except Exception as e:
+        print(f"Error queueing batch {batch.id}: {str(e)}")
+        pending = [p['detection_id'] for p in payloads if not p.get('notify_only')]
+        if pending:
+            # Through the ORM, so the statistics rollups and response cache see the change
+            for detection in Detection.query.filter(Detection.id.in_(pending)).all():
+                detection.status = 'failed'
+                detection.error_message = f"Failed to queue detection: {str(e)}"
+            db.session.commit()
+        return jsonify({
+            "success": False,
+            "error": "Failed to queue images for processing",
+            "details": str(e),
+            "batch_id": batch.id
+        }), 503
+
+    print(f"Batch {batch.id}: {len(rows)} detection(s) created, {len(sources)} from cache, {len(skipped)} skipped")
+    return jsonify({
+        "success": True,
+        "batch_id": batch.id,
+        "total": len(rows),
+        "cached": sum(1 for _, blob in stored if blob.content_hash in sources),
+        "skipped": skipped,
+        "detection_ids": detection_ids,
+        "message": "Images uploaded and queued for processing"
+    }), 202
+
+
+@bp.route('/uploads/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """
+    Progress of a batch, plus each file's detection unless ``results=false``
+    """
+    from models.organism import DetectionOrganism
+    from models.upload_batch import UploadBatch
+
+    batch = UploadBatch.query.get(batch_id)
+    if batch is None:
+        return jsonify({"success": False, "error": "Batch not found"}), 404
+
+    payload = batch.to_dict()
+    if request.args.get('results', 'true').lower() not in ['false', '0', 'no']:
+        items = batch.items()
+        organism_counts = DetectionOrganism.counts_by_detection([item[2] for item in items])
+        payload['detections'] = [
+            {
+                'position': position,
+                'filename': filename,
+                'detection_id': detection_id,
+                'status': status,
+                'organism_count': organism_counts.get(detection_id, 0),
+                'error_message': error_message
+            }
+            for position, filename, detection_id, status, error_message in items
+        ]
+    return jsonify(payload)
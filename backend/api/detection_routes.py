@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from sqlalchemy import func, literal_column, select
+
+from models import db
+from models.detection import Detection
+from models.organism import DetectionOrganism, Organism
+
+bp = Blueprint('detection_export', __name__)
+
+# Rows fetched per round trip from the server-side cursor
+YIELD_PER = 1000
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CSV_COLUMNS = [
+    'id', 'timestamp', 'filename', 'status', 'organism_count', 'organisms',
+    'original_image_path', 'processed_image_path', 'error_message'
+]
+
+
+def _parse_bound(value, end=False):
+    """ISO date or datetime; a bare end date includes that whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _organism_names(dialect):
+    """Correlated subquery with a detection's organism classes joined by ';'"""
+    if dialect == 'postgresql':
+        names = func.string_agg(Organism.name, literal_column("';'"))
+    else:
+        names = func.group_concat(Organism.name, ';')
+    return (
+        select(names)
+        .select_from(DetectionOrganism)
+        .join(Organism, Organism.id == DetectionOrganism.organism_id)
+        .where(DetectionOrganism.detection_id == Detection.id)
+        .correlate(Detection)
+        .scalar_subquery()
+    )
+
+
+def _export_query(args, columns):
+    """Column query for the export filters, oldest first"""
+    query = db.session.query(*columns)
+
+    start = _parse_bound(args.get('start'))
+    end = _parse_bound(args.get('end'), end=True)
+    if start:
+        query = query.filter(Detection.timestamp >= start)
+    if end:
+        query = query.filter(Detection.timestamp < end)
+
+    statuses = [s for s in (args.get('status') or '').split(',') if s]
+    if statuses:
+        query = query.filter(Detection.status.in_(statuses))
+
+    organism = args.get('organism')
+    if organism:
+        query = query.filter(
+            db.session.query(DetectionOrganism.id)
+            .join(Organism, Organism.id == DetectionOrganism.organism_id)
+            .filter(DetectionOrganism.detection_id == Detection.id, Organism.name == organism)
+            .exists()
+        )
+
+    # Server-side cursor where the driver supports it, fetched YIELD_PER rows at a time
+    return (
+        query.order_by(Detection.timestamp, Detection.id)
+        .execution_options(stream_results=True)
+        .yield_per(YIELD_PER)
+    )
+
+
+def _raw_json(value):
+    """Stored JSON text passed through unparsed, or null when it isn't a JSON document"""
+    if value and value.lstrip()[:1] in ('[', '{'):
+        return value
+    return 'null'
+
+
+def _ndjson_lines(query):
+    for row in query:
+        fields = json.dumps({
+            'id': row.id,
+            'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+            'filename': row.filename,
+            'status': row.status,
+            'original_image_path': row.original_image_path,
+            'processed_image_path': row.processed_image_path,
+            'error_message': row.error_message
+        })
+        # Splice the stored JSON in as-is instead of decoding and re-encoding it
+        yield (
+            f'{fields[:-1]},"organisms":{_raw_json(row.detected_organisms)},'
+            f'"recommendations":{_raw_json(row.water_usage_recommendations)}}}\n'
+        )
+
+
+def _csv_chunks(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+
+    for count, row in enumerate(query, 1):
+        names = row.organism_names.split(';') if row.organism_names else []
+        writer.writerow([
+            row.id,
+            row.timestamp.isoformat() if row.timestamp else '',
+            row.filename,
+            row.status,
+            len(names),
+            ';'.join(names),
+            row.original_image_path,
+            row.processed_image_path or '',
+            row.error_message or ''
+        ])
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
+
+
+@bp.route('/detections/export', methods=['GET'])
+def export_detections():
+    """
+    Stream the detection history as NDJSON (default) or CSV
+
+    Query parameters: format (ndjson|csv), start / end (ISO date or datetime),
+    status (comma-separated), organism (model class, e.g. e_coli).
+    """
+    export_format = (request.args.get('format') or 'ndjson').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': f"Unsupported format, expected one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    try:
+        base_columns = [
+            Detection.id, Detection.timestamp, Detection.filename, Detection.status,
+            Detection.original_image_path, Detection.processed_image_path, Detection.error_message
+        ]
+        if export_format == 'csv':
+            dialect = db.engine.dialect.name
+            query = _export_query(request.args, base_columns + [_organism_names(dialect).label('organism_names')])
+            body = _csv_chunks(query)
+        else:
+            query = _export_query(request.args, base_columns + [
+                Detection.detected_organisms, Detection.water_usage_recommendations
+            ])
+            body = _ndjson_lines(query)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid filter', 'details': str(e)}), 400
+
+    filename = f"detections-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    return Response(
+        stream_with_context(body),
+        mimetype=EXPORT_FORMATS[export_format],
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
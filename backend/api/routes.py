@@ -1,23 +1,65 @@
 
 from flask import Blueprint, jsonify, request
-import json
 from models.detection import Detection
-from utils.email_service import send_detection_results
+from utils.email_service import queue_detection_results
 from models import EmailLog
+from utils.json_codec import json_response
+from utils.pagination import paginate
+from utils.projection import parse_fields, project
 
 bp = Blueprint('api', __name__)
 
+def latest_email_logs(detection_ids):
+    """
+    Latest EmailLog per detection for a page of ids, in one query
+
+    Joins each detection's MAX(sent_at) back to email_log, which the
+    (detection_id, sent_at) index answers without scanning the table.
+
+    Returns:
+        dict: detection id -> EmailLog
+    """
+    if not detection_ids:
+        return {}
+
+    from models import db
+    from sqlalchemy import and_, func
+
+    latest = (
+        db.session.query(EmailLog.detection_id, func.max(EmailLog.sent_at).label('sent_at'))
+        .filter(EmailLog.detection_id.in_(list(detection_ids)))
+        .group_by(EmailLog.detection_id)
+        .subquery()
+    )
+    logs = EmailLog.query.join(latest, and_(
+        EmailLog.detection_id == latest.c.detection_id,
+        EmailLog.sent_at == latest.c.sent_at
+    )).all()
+
+    by_detection = {}
+    for log in logs:
+        detection_id = int(log.detection_id)
+        # Two logs with the same timestamp: keep the later row
+        if detection_id not in by_detection or log.id > by_detection[detection_id].id:
+            by_detection[detection_id] = log
+    return by_detection
+
+
 # List detections with status and details
+# ?page=N&per_page=M for offset paging, ?cursor=<next_cursor>&per_page=M for keyset paging (per_page is capped at 100)
 @bp.route('/detections', methods=['GET'])
 def list_detections():
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 10, type=int)
-    detections = Detection.query.order_by(Detection.timestamp.desc()).paginate(page=page, per_page=per_page, error_out=False)
+    try:
+        detections = paginate(Detection.query, Detection.timestamp, Detection.id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    email_logs = latest_email_logs([d.id for d in detections.items])
+    # fields=id,status,detected_organisms.class,... trims verbose organism metadata
+    selection = parse_fields(request.args.get('fields'))
     detection_list = []
     for d in detections.items:
         det = d.to_dict()
-        # Find latest email log for this detection
-        email_log = EmailLog.query.filter_by(detection_id=str(d.id)).order_by(EmailLog.sent_at.desc()).first()
+        email_log = email_logs.get(d.id)
         if email_log:
             det['email_status'] = email_log.status
             det['email_sent_at'] = email_log.sent_at.isoformat() if email_log.sent_at else None
@@ -26,13 +68,17 @@ def list_detections():
             det['email_status'] = 'never_sent'
             det['email_sent_at'] = None
             det['email_recipient'] = None
-        detection_list.append(det)
-    return jsonify({
+        detection_list.append(project(det, selection))
+    response = {
         'detections': detection_list,
-        'total': detections.total,
-        'page': detections.page,
-        'pages': detections.pages
-    })
+        'next_cursor': detections.next_cursor,
+        'has_more': detections.next_cursor is not None
+    }
+    if detections.page is not None:
+        response.update(page=detections.page, pages=detections.pages)
+    if detections.total is not None:
+        response['total'] = detections.total
+    return json_response(response)
 
 # Email logs endpoint
 @bp.route('/email-logs', methods=['GET'])
@@ -42,6 +88,39 @@ def get_email_logs():
     logs = EmailLog.query.order_by(EmailLog.sent_at.desc()).limit(limit).all()
     return jsonify([log.to_dict() for log in logs])
 
+# Per-recipient delivery mode: one email per detection, or an hourly/daily digest
+@bp.route('/email-preferences', methods=['GET'])
+def get_email_preference():
+    from models.email_preference import EmailPreference, normalize_recipient
+
+    email = request.args.get('email')
+    if not email:
+        return jsonify({'error': 'Missing email'}), 400
+    preference = EmailPreference.query.filter_by(recipient=normalize_recipient(email)).first()
+    if preference is None:
+        return jsonify({'email': normalize_recipient(email), 'mode': 'immediate', 'last_digest_at': None})
+    return jsonify(preference.to_dict())
+
+@bp.route('/email-preferences', methods=['PUT', 'POST'])
+def set_email_preference():
+    from models import db
+    from models.email_preference import EMAIL_MODES, EmailPreference
+
+    data = request.get_json(silent=True) or {}
+    email = data.get('email')
+    mode = data.get('mode')
+    if not email or '@' not in email:
+        return jsonify({'error': 'Missing or invalid email'}), 400
+    if mode not in EMAIL_MODES:
+        return jsonify({'error': f"mode must be one of: {', '.join(EMAIL_MODES)}"}), 400
+    try:
+        preference = EmailPreference.set_mode(email, mode)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to save email preference', 'details': str(e)}), 500
+    return jsonify(preference.to_dict())
+
 # Send detection results via email
 @bp.route('/send-results-email', methods=['POST'])
 def send_results_email():
@@ -56,68 +135,61 @@ def send_results_email():
     detection_data = detection.to_dict()
     # Use processed image if available
     image_path = detection_data.get('processed_image_path')
-    from models import EmailLog, db
-    from datetime import datetime
     # Prepare result summary (short text)
     summary = f"{len(detection_data.get('detections', []))} detections: "
     summary += ', '.join([d.get('class', 'unknown') for d in detection_data.get('detections', [])])
-    success = send_detection_results(email, detection_data, image_path)
-    log = EmailLog(
-        recipient=email,
-        detection_id=str(detection_id),
-        sent_at=datetime.utcnow(),
-        status='success' if success else 'failure',
-        result_summary=summary
-    )
-    db.session.add(log)
-    db.session.commit()
-    if success:
-        return jsonify({'message': 'Detection results sent successfully'}), 200
-    else:
-        return jsonify({'error': 'Failed to send email'}), 500
+    # The outbox sender delivers it and moves its EmailLog entry from queued to sent/failed
+    try:
+        entry = queue_detection_results(email, detection_data, image_path, detection_id=detection.id, summary=summary)
+    except Exception as e:
+        from models import db
+        db.session.rollback()
+        return jsonify({'error': 'Failed to queue email', 'details': str(e)}), 500
+    return jsonify({
+        'message': 'Detection results queued for sending',
+        'outbox_id': entry.id,
+        'email_log_id': entry.email_log_id
+    }), 202
 
 
 @bp.route('/statistics', methods=['GET'])
 def get_statistics():
     try:
-        total_detections = Detection.query.count()
-        completed_detections = Detection.query.filter_by(status='completed').count()
-        failed_detections = Detection.query.filter_by(status='failed').count()
+        from models.statistics import OrganismStats, SystemStats
+        from services.response_cache import REVALIDATE_CACHE_CONTROL, statistics_cache
+        from utils.http_cache import conditional, serialize
+
+        # Dashboards poll this; writes clear the cache, workers' writes show up within its TTL
+        cached = statistics_cache.get('api')
+        if cached is not None:
+            return conditional(cached, REVALIDATE_CACHE_CONTROL)
+
+        # Served from the incrementally maintained rollups, not the raw rows
+        totals = SystemStats.totals()
+        total_detections = totals['total_detections']
+        completed_detections = totals['completed_detections']
+        failed_detections = totals['failed_detections']
 
         # Success rate (percentage)
         success_rate = (completed_detections / total_detections * 100) if total_detections > 0 else 0.0
 
-        # Build organism statistics from completed detections
-        organism_statistics = {}
-        completed_list = Detection.query.filter_by(status='completed').order_by(Detection.timestamp.desc()).all()
-        for d in completed_list:
-            raw = d.detected_organisms
-            try:
-                data = json.loads(raw) if isinstance(raw, str) else raw
-            except Exception:
-                data = []
-            if not data:
-                continue
-            # Support list of dicts (detailed objects) or list of strings
-            for item in data:
-                if isinstance(item, dict):
-                    key = item.get('class') or item.get('name') or 'unknown'
-                else:
-                    key = str(item)
-                organism_statistics[key] = organism_statistics.get(key, 0) + 1
+        # Organism rows are only written for completed detections
+        organism_statistics = OrganismStats.counts()
 
         # Latest completed detections (limited)
-        latest = completed_list[:5]
+        latest = Detection.query.filter_by(status='completed').order_by(Detection.timestamp.desc()).limit(5).all()
         latest_data = [d.to_dict() for d in latest]
 
-        return jsonify({
+        cached = serialize({
             'total_detections': total_detections,
             'completed_detections': completed_detections,
             'failed_detections': failed_detections,
             'success_rate': success_rate,
             'organism_statistics': organism_statistics,
             'latest_detections': latest_data
-        }), 200
+        })
+        statistics_cache.set('api', cached)
+        return conditional(cached, REVALIDATE_CACHE_CONTROL)
     except Exception as e:
         print(f"Error getting statistics: {str(e)}")
-        return jsonify({'error': 'Failed to get statistics', 'details': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to get statistics', 'details': str(e)}), 500
@@ -0,0 +1,306 @@
+"""
+Resumable chunked uploads for large images (e.g. stitched whole-slide TIFFs)
+
+1. ``POST /api/uploads`` with JSON ``{filename, size, sha256?, name?, email?, tiled?}``
+   starts an upload and returns its ``upload_id`` and a suggested ``chunk_size``.
+2. ``PUT /api/uploads/<upload_id>?offset=<n>`` with the raw bytes of the next
+   chunk as the body (``application/octet-stream``). ``offset`` must be the
+   offset the server last acknowledged; a mismatch gets a 409 carrying the
+   right one. Chunks go straight to disk, never through the form parser.
+3. ``POST /api/uploads/<upload_id>/finalize`` (optionally ``{sha256}``)
+   checks the size and checksum, stores the image and queues its detection
+   exactly like ``POST /api/upload``. If the detection can't be queued the
+   upload stays open and finalizing again retries.
+
+After a dropped connection, ``GET /api/uploads/<upload_id>`` returns the
+acknowledged ``offset`` to resume from. ``DELETE`` abandons an upload.
+"""
+import re
+
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.exceptions import ClientDisconnected
+from werkzeug.utils import secure_filename
+
+from models import db
+from utils.file_handler import (append_chunk, create_partial, file_extension, locked_partial, partial_digest,
+                                partial_path, remove_partial, store_partial)
+
+bp = Blueprint('uploads', __name__)
+
+UPLOAD_ID = re.compile(r'[0-9a-f]{32}')
+SHA256 = re.compile(r'[0-9a-f]{64}')
+
+
+def _not_found():
+    return jsonify({"success": False, "error": "Upload not found"}), 404
+
+
+def _upload_payload(upload):
+    payload = upload.to_dict()
+    payload['success'] = True
+    payload['chunk_size'] = current_app.config['UPLOAD_CHUNK_SIZE']
+    return payload
+
+
+@bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start a resumable upload"""
+    from app import allowed_file
+    from config import Config
+    from models.resumable_upload import ResumableUpload
+
+    data = request.get_json(silent=True) or {}
+    filename = secure_filename(data.get('filename') or '')
+    if not filename or not allowed_file(filename):
+        return jsonify({
+            "success": False,
+            "error": "Invalid file type",
+            "details": "Provide the filename of a supported image"
+        }), 400
+
+    max_size = current_app.config['RESUMABLE_UPLOAD_MAX_SIZE']
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        size = 0
+    if not 0 < size <= max_size:
+        return jsonify({
+            "success": False,
+            "error": "Invalid file size",
+            "details": f"size must be between 1 and {max_size} bytes"
+        }), 400
+
+    expected_sha256 = (data.get('sha256') or '').lower() or None
+    if expected_sha256 is not None and not SHA256.fullmatch(expected_sha256):
+        return jsonify({"success": False, "error": "sha256 must be 64 hex digits"}), 400
+
+    tiled = data.get('tiled')
+    if tiled is None:
+        tiled = Config.TILED_INFERENCE
+    elif isinstance(tiled, str):
+        tiled = tiled.lower() in ['true', '1', 't', 'yes']
+
+    upload = ResumableUpload(
+        filename=filename,
+        size=size,
+        expected_sha256=expected_sha256,
+        name=data.get('name'),
+        email=data.get('email'),
+        tiled=bool(tiled)
+    )
+    try:
+        db.session.add(upload)
+        db.session.flush()
+        create_partial(current_app.config['UPLOAD_FOLDER'], upload.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error starting upload: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to start upload", "details": str(e)}), 500
+
+    print(f"Started resumable upload {upload.id} of {filename} ({size} bytes)")
+    return jsonify(_upload_payload(upload)), 201
+
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def get_upload(upload_id):
+    """State of an upload; ``offset`` is where to resume"""
+    from models.resumable_upload import ResumableUpload
+
+    upload = ResumableUpload.query.get(upload_id) if UPLOAD_ID.fullmatch(upload_id) else None
+    if upload is None:
+        return _not_found()
+    return jsonify(_upload_payload(upload))
+
+
+@bp.route('/uploads/<upload_id>', methods=['PUT'])
+def put_chunk(upload_id):
+    """Append the request body at ``?offset=``"""
+    from models.resumable_upload import ResumableUpload
+
+    if not UPLOAD_ID.fullmatch(upload_id):
+        return _not_found()
+    try:
+        offset = int(request.args['offset'])
+    except (KeyError, ValueError):
+        return jsonify({"success": False, "error": "offset query parameter is required"}), 400
+
+    length = request.content_length
+    if length is None:
+        return jsonify({"success": False, "error": "Content-Length is required"}), 411
+    max_chunk = current_app.config['UPLOAD_CHUNK_MAX_SIZE']
+    if length > max_chunk:
+        return jsonify({"success": False, "error": f"Chunks can be at most {max_chunk} bytes"}), 413
+
+    path = partial_path(current_app.config['UPLOAD_FOLDER'], upload_id)
+    try:
+        # Looked up under the lock, so concurrent chunks see each other's offset
+        with locked_partial(path) as f:
+            upload = ResumableUpload.query.get(upload_id)
+            if upload is None:
+                return _not_found()
+            if upload.status != 'uploading':
+                return jsonify({"success": False, "error": f"Upload is {upload.status}"}), 409
+            if offset != upload.received:
+                return jsonify({
+                    "success": False,
+                    "error": "Offset mismatch",
+                    "details": f"Resume from offset {upload.received}",
+                    "offset": upload.received
+                }), 409
+            if offset + length > upload.size:
+                return jsonify({
+                    "success": False,
+                    "error": "Chunk goes past the end of the file",
+                    "details": f"{upload.size - offset} bytes left",
+                    "offset": upload.received
+                }), 400
+
+            written = append_chunk(f, path, offset, request.stream, length)
+            if written != length:
+                return jsonify({
+                    "success": False,
+                    "error": "Incomplete chunk",
+                    "details": f"Received {written} of {length} bytes",
+                    "offset": upload.received
+                }), 400
+
+            # Acknowledge only once the chunk is on disk
+            upload.received = offset + written
+            db.session.commit()
+    except FileNotFoundError:
+        db.session.rollback()
+        upload = ResumableUpload.query.get(upload_id)
+        if upload is None:
+            return _not_found()
+        return jsonify({"success": False, "error": f"Upload is {upload.status}"}), 409
+    except ClientDisconnected:
+        # The partial chunk is dropped; the client resumes from the acknowledged offset
+        db.session.rollback()
+        print(f"Client disconnected while sending chunk of upload {upload_id} at {offset}")
+        return jsonify({"success": False, "error": "Incomplete chunk", "offset": offset}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error writing chunk of upload {upload_id} at {offset}: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to write chunk", "details": str(e)}), 500
+
+    return jsonify({
+        "success": True,
+        "upload_id": upload_id,
+        "offset": upload.received,
+        "size": upload.size,
+        "complete": upload.received == upload.size
+    })
+
+
+@bp.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_upload(upload_id):
+    """Verify a complete upload, store it and queue its detection"""
+    from app import create_upload_detection
+    from models.resumable_upload import ResumableUpload
+
+    if not UPLOAD_ID.fullmatch(upload_id):
+        return _not_found()
+    data = request.get_json(silent=True) or {}
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    path = partial_path(upload_folder, upload_id)
+
+    try:
+        with locked_partial(path) as f:
+            upload = ResumableUpload.query.get(upload_id)
+            if upload is None:
+                return _not_found()
+            if upload.status != 'uploading':
+                return _finished(upload)
+            if upload.received != upload.size:
+                return jsonify({
+                    "success": False,
+                    "error": "Upload incomplete",
+                    "details": f"{upload.received} of {upload.size} bytes received",
+                    "offset": upload.received
+                }), 409
+
+            content_hash = partial_digest(f, path, upload.size)
+            expected = (data.get('sha256') or upload.expected_sha256 or '').lower()
+            if expected and expected != content_hash:
+                remove_partial(path)
+                upload.status = 'failed'
+                upload.error_message = f"Checksum mismatch: expected {expected}, got {content_hash}"
+                db.session.commit()
+                print(f"Upload {upload_id} failed verification: {upload.error_message}")
+                return jsonify({
+                    "success": False,
+                    "error": "Checksum mismatch",
+                    "details": "The received file does not match its sha256; upload it again",
+                    "sha256": content_hash
+                }), 422
+
+            blob = store_partial(path, upload_folder, content_hash, upload.size, file_extension(upload.filename))
+            print(f"Upload {upload_id} stored at {blob.path} ({blob.size} bytes, sha256 {content_hash})")
+            upload.content_hash = content_hash
+            body, status = create_upload_detection(blob, upload.filename, upload.name, upload.email, upload.tiled)
+            upload.detection_id = body.get('detection_id')
+            if status < 400:
+                upload.status = 'completed'
+                upload.error_message = None
+            else:
+                # Not queued: keep the received bytes so finalizing again retries
+                upload.error_message = body.get('details') or body.get('error')
+            db.session.commit()
+            if upload.status == 'completed':
+                remove_partial(path)
+    except FileNotFoundError:
+        # Finalized by a concurrent request in the meantime
+        db.session.rollback()
+        upload = ResumableUpload.query.get(upload_id)
+        if upload is None:
+            return _not_found()
+        return _finished(upload)
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error finalizing upload {upload_id}: {str(e)}")
+        return jsonify({"success": False, "error": "Failed to finalize upload", "details": str(e)}), 500
+
+    body['upload_id'] = upload_id
+    return jsonify(body), status
+
+
+def _finished(upload):
+    """Response for finalizing an upload that is no longer in progress"""
+    if upload.status == 'completed':
+        from models.detection import Detection
+
+        detection = Detection.query.get(upload.detection_id) if upload.detection_id else None
+        return jsonify({
+            "success": True,
+            "upload_id": upload.id,
+            "detection_id": upload.detection_id,
+            "status": detection.status if detection else None,
+            "message": "Upload already finalized"
+        }), 200
+    return jsonify({
+        "success": False,
+        "error": f"Upload is {upload.status}",
+        "details": upload.error_message
+    }), 409
+
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def cancel_upload(upload_id):
+    """Abandon an upload and delete what was received"""
+    from models.resumable_upload import ResumableUpload
+
+    upload = ResumableUpload.query.get(upload_id) if UPLOAD_ID.fullmatch(upload_id) else None
+    if upload is None:
+        return _not_found()
+    if upload.status == 'completed':
+        return jsonify({"success": False, "error": "Upload is already finalized"}), 409
+    try:
+        remove_partial(partial_path(current_app.config['UPLOAD_FOLDER'], upload_id))
+        db.session.delete(upload)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error cancelling upload {upload_id}: {str(e)}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    return jsonify({"success": True, "message": "Upload cancelled"})
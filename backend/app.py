@@ -3,38 +3,41 @@ import cv2
 import uuid
 import json
 from datetime import datetime
-from flask import Flask, request, jsonify, send_file, send_from_directory
+from flask import Flask, current_app, request, jsonify, send_file, send_from_directory
 from flask_cors import CORS
-from flask_sqlalchemy import SQLAlchemy
 from werkzeug.utils import secure_filename
-from config import Config
+from config import Config, config
+from models import db
 from flask import Flask, send_from_directory
 from flask_mail import Mail
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Initialize extensions
-db = SQLAlchemy()
-
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'webp', 'jfif', 'heic', 'heif', 'svg'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff', 'tif', 'webp', 'jfif', 'heic', 'heif', 'svg'}
 
 def allowed_file(filename: str) -> bool:
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-DB_PATH = os.path.join(BASE_DIR, 'microorganism_detection.db')
 
 
-def create_app():
+def create_app(config_name=None):
+    """
+    Args:
+        config_name (str): Key into config.config ('development', 'production',
+            'testing'); defaults to FLASK_CONFIG, then FLASK_ENV, then the base Config
+    """
     app = Flask(__name__)
     
     # Configuration
-    app.config.from_object(Config)
-    app.config['UPLOAD_FOLDER'] = 'uploads'
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{DB_PATH}'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    config_name = config_name or os.environ.get('FLASK_CONFIG') or os.environ.get('FLASK_ENV') or 'default'
+    config_class = config.get(config_name, config['default'])
+    app.config.from_object(config_class)
+    from utils.database import engine_options, normalize_url
+    # DATABASE_URL (or the config class default); relative SQLite paths resolve against this directory
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config)
     
     # Initialize extensions
     db.init_app(app)
@@ -53,12 +56,36 @@ def create_app():
     # Create upload directory if it doesn't exist
     os.makedirs('uploads', exist_ok=True)
     
+    # Compress large JSON responses for clients that accept it
+    from utils import compression
+    compression.init_app(app)
+    
     # Register blueprints
     from api.routes import bp as api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
+    from api.detection_routes import bp as detection_export_bp
+    app.register_blueprint(detection_export_bp, url_prefix='/api')
+    from api.batch_routes import BatchRequest, bp as upload_batch_bp
+    app.register_blueprint(upload_batch_bp, url_prefix='/api')
+    from api.upload_routes import bp as uploads_bp
+    app.register_blueprint(uploads_bp, url_prefix='/api')
+    # Lets the batch endpoint take bodies up to BATCH_MAX_CONTENT_LENGTH
+    app.request_class = BatchRequest
     
     # Create database tables
     with app.app_context():
+        # Pragmas have to be hooked up before the engine opens its first connection
+        from utils.database import configure_engine
+        configure_engine(db.engine, app.config)
+        import models.detection_fingerprint  # noqa: F401 - registers the tables
+        import models.email_outbox  # noqa: F401
+        import models.email_preference  # noqa: F401
+        import models.organism  # noqa: F401
+        import models.resumable_upload  # noqa: F401
+        import models.statistics  # noqa: F401 - also installs the rollup hooks
+        import models.upload_batch  # noqa: F401
+        import services.response_cache  # noqa: F401 - cache invalidation hooks
+        import models.indexes  # noqa: F401
         db.create_all()
     
     return app
@@ -76,43 +103,18 @@ def serve_processed(filename):
     return send_from_directory('uploads', filename)
 # Database Models
 
-def apply_gram_staining_effect(image_path):
+def gram_stain_image(img):
     """
-    Apply digital gram staining effect to enhance contrast
+    Apply digital gram staining effect to an in-memory BGR image
     """
-    try:
-        # Read the image
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError("Could not read image")
-        
-        # Convert to different color spaces for processing
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-        
-        # Enhance contrast using CLAHE
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8))
-        lab[:,:,0] = clahe.apply(lab[:,:,0])
-        enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-        
-        # Apply color enhancement to simulate gram staining
-        # Enhance purple/blue regions (gram-positive bacteria)
-        mask_positive = cv2.inRange(hsv, (100, 50, 50), (130, 255, 255))
-        enhanced[mask_positive > 0] = [255, 0, 128]  # Purple-pink color
-        
-        # Enhance red/pink regions (gram-negative bacteria)
-        mask_negative = cv2.inRange(hsv, (0, 50, 50), (20, 255, 255))
-        enhanced[mask_negative > 0] = [0, 100, 255]  # Red color
-        
-        # Save processed image
-        processed_filename = f"processed_{os.path.basename(image_path)}"
-        processed_path = os.path.join(app.config['UPLOAD_FOLDER'], processed_filename)
-        cv2.imwrite(processed_path, enhanced)
-        
-        return processed_path
-    except Exception as e:
-        print(f"Error in gram staining: {str(e)}")
-        return image_path
+    from services.gram_staining import stain_image
+    return stain_image(img, Config.GRAM_STAIN_PRESET, Config.GRAM_STAIN_QUALITY)
+
+def processed_path_for(image_path):
+    """Where the gram-stained version of an upload is served from (one per blob and stain_version)"""
+    from services.gram_staining import stain_version
+    processed_filename = f"processed_{stain_version(Config).replace(':', '_')}_{os.path.basename(image_path)}"
+    return os.path.join(app.config['UPLOAD_FOLDER'], processed_filename)
 
 def get_organism_info(class_name):
     """
@@ -145,355 +147,396 @@ def get_organism_info(class_name):
         'health_effects': 'No health effects information available.'
     })
 
-def detect_microorganisms_colab(image_path):
+# Microorganism classes the detector knows about, with their properties
+MICROORGANISM_CLASSES = [
+    {
+        "class": "e_coli",
+        "name": "Escherichia coli",
+        "scientific_name": "Escherichia coli",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 2.0 μm long and 0.25–1.0 μm in diameter",
+        "description": "A gram-negative, facultative anaerobic, rod-shaped coliform bacterium commonly found in the lower intestine of warm-blooded organisms.",
+        "risk": "High",
+        "health_effects": "Can cause diarrhea, urinary tract infections, respiratory illness, and other infections. Some strains can cause serious food poisoning.",
+        "common_sources": "Contaminated water, undercooked ground beef, raw milk, and fresh produce.",
+        "optimal_ph": "6.5-7.5",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "staphylococcus_aureus",
+        "name": "Staphylococcus aureus",
+        "scientific_name": "Staphylococcus aureus",
+        "gram_type": "positive",
+        "morphology": "Spherical cells, 1 μm in diameter, forms grape-like clusters",
+        "description": "A gram-positive, round-shaped bacterium that is a usual member of the microbiota of the body.",
+        "risk": "High",
+        "health_effects": "Can cause skin infections, pneumonia, heart valve infections, and bone infections. Some strains are resistant to common antibiotics (MRSA).",
+        "common_sources": "Human skin and nasal passages, can contaminate food and water.",
+        "optimal_ph": "7.0-7.5",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "salmonella_enterica",
+        "name": "Salmonella",
+        "scientific_name": "Salmonella enterica",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 2-5 μm long and 0.5-1.5 μm in diameter",
+        "description": "A rod-shaped, gram-negative bacterium that causes foodborne illness. It is motile and does not form spores.",
+        "risk": "High",
+        "health_effects": "Causes salmonellosis with symptoms including diarrhea, fever, and abdominal cramps 12-72 hours after infection.",
+        "common_sources": "Raw poultry, eggs, beef, and sometimes on unwashed fruit and vegetables.",
+        "optimal_ph": "6.5-7.5",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "pseudomonas_aeruginosa",
+        "name": "Pseudomonas aeruginosa",
+        "scientific_name": "Pseudomonas aeruginosa",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 0.5-0.8 μm by 1.5-3.0 μm",
+        "description": "A common encapsulated, gram-negative, rod-shaped bacterium that can cause disease in plants and animals.",
+        "risk": "High in healthcare settings",
+        "health_effects": "Can cause serious infections in the blood, lungs, or other parts of the body, especially in people with weakened immune systems.",
+        "common_sources": "Soil, water, and moist environments like sinks and toilets.",
+        "optimal_ph": "6.6-7.4",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Obligate aerobe"
+    },
+    {
+        "class": "bacillus_subtilis",
+        "name": "Bacillus subtilis",
+        "scientific_name": "Bacillus subtilis",
+        "gram_type": "positive",
+        "morphology": "Rod-shaped, 4-10 μm long and 0.25-1.0 μm in diameter, forms endospores",
+        "description": "A gram-positive, catalase-positive bacterium, found in soil and the gastrointestinal tract of ruminants and humans.",
+        "risk": "Low",
+        "health_effects": "Generally considered non-pathogenic, but can cause food spoilage and, rarely, infections in immunocompromised individuals.",
+        "common_sources": "Soil, water, and air.",
+        "optimal_ph": "5.5-8.5",
+        "optimal_temp": "25-35°C (77-95°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "enterococcus_faecalis",
+        "name": "Enterococcus faecalis",
+        "scientific_name": "Enterococcus faecalis",
+        "gram_type": "positive",
+        "morphology": "Oval cocci, 0.5-1.0 μm in diameter, occurring in pairs or short chains",
+        "description": "A gram-positive, commensal bacterium inhabiting the gastrointestinal tracts of humans and other mammals.",
+        "risk": "Medium",
+        "health_effects": "Can cause urinary tract infections, bacteremia, bacterial endocarditis, diverticulitis, and meningitis.",
+        "common_sources": "Human gastrointestinal tract, can contaminate water supplies.",
+        "optimal_ph": "6.5-7.5",
+        "optimal_temp": "35-37°C (95-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "vibrio_cholerae",
+        "name": "Vibrio cholerae",
+        "scientific_name": "Vibrio cholerae",
+        "gram_type": "negative",
+        "morphology": "Comma-shaped rod, 1.4-2.6 μm long and 0.5 μm in diameter",
+        "description": "A gram-negative, comma-shaped bacterium that is the causative agent of the diarrheal disease cholera.",
+        "risk": "High in endemic areas",
+        "health_effects": "Causes severe watery diarrhea that can lead to dehydration and death if untreated.",
+        "common_sources": "Contaminated water, especially in areas with poor sanitation.",
+        "optimal_ph": "8.5-9.5",
+        "optimal_temp": "30-40°C (86-104°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "klebsiella_pneumoniae",
+        "name": "Klebsiella pneumoniae",
+        "scientific_name": "Klebsiella pneumoniae",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 0.3-1.0 μm wide and 0.6-6.0 μm long",
+        "description": "A gram-negative, encapsulated, non-motile bacterium found in the normal flora of the mouth, skin, and intestines.",
+        "risk": "High in healthcare settings",
+        "health_effects": "Can cause pneumonia, bloodstream infections, wound or surgical site infections, and meningitis.",
+        "common_sources": "Human gastrointestinal tract, soil, and water.",
+        "optimal_ph": "7.2-7.4",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "proteus_mirabilis",
+        "name": "Proteus mirabilis",
+        "scientific_name": "Proteus mirabilis",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 0.4-0.8 μm wide and 1.0-3.0 μm long, highly motile",
+        "description": "A gram-negative, facultatively anaerobic, rod-shaped bacterium that shows swarming motility and urease activity.",
+        "risk": "Medium",
+        "health_effects": "Common cause of urinary tract infections and is also known to cause wound infections and other infections in humans.",
+        "common_sources": "Widely distributed in soil and water, and in the human intestinal tract.",
+        "optimal_ph": "6.0-7.0",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "serratia_marcescens",
+        "name": "Serratia marcescens",
+        "scientific_name": "Serratia marcescens",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 0.5-0.8 μm wide and 0.9-2.0 μm long",
+        "description": "A gram-negative, rod-shaped, facultatively anaerobic, opportunistic pathogen that produces a red pigment called prodigiosin.",
+        "risk": "Medium to High in healthcare settings",
+        "health_effects": "Can cause urinary tract infections, respiratory tract infections, endocarditis, osteomyelitis, septicemia, and eye infections.",
+        "common_sources": "Ubiquitous in the environment, found in soil, water, plants, and animals.",
+        "optimal_ph": "5-9",
+        "optimal_temp": "20-37°C (68-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "shigella_dysenteriae",
+        "name": "Shigella dysenteriae",
+        "scientific_name": "Shigella dysenteriae",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, non-motile, non-spore forming, 1-3 μm in length",
+        "description": "A gram-negative, non-motile, non-spore forming, rod-shaped bacterium that is the causative agent of bacillary dysentery.",
+        "risk": "High",
+        "health_effects": "Causes severe diarrhea (dysentery) with blood and mucus in the stools, fever, and abdominal pain.",
+        "common_sources": "Contaminated food and water, poor sanitation.",
+        "optimal_ph": "6.0-8.0",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "enterobacter_aerogenes",
+        "name": "Enterobacter aerogenes",
+        "scientific_name": "Enterobacter aerogenes",
+        "gram_type": "negative",
+        "morphology": "Rod-shaped, 0.6-1.0 μm in diameter and 1.2-3.0 μm in length",
+        "description": "A gram-negative, rod-shaped, facultative-anaerobic bacterium that is part of the normal gut flora.",
+        "risk": "Medium to High in healthcare settings",
+        "health_effects": "Can cause various infections including bacteremia, lower respiratory tract infections, skin and soft-tissue infections, and urinary tract infections.",
+        "common_sources": "Human gastrointestinal tract, soil, water, and sewage.",
+        "optimal_ph": "6.0-7.5",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "citrobacter_freundii",
+        "name": "Citrobacter freundii",
+        "scientific_name": "Citrobacter freundii",
+        "gram_type": "negative",
+        "morphology": "Straight rod, 1.0 μm in diameter and 2.0-6.0 μm in length",
+        "description": "A gram-negative, rod-shaped bacterium that is a member of the Enterobacteriaceae family.",
+        "risk": "Medium",
+        "health_effects": "Can cause opportunistic infections including respiratory infections, urinary tract infections, and bacteremia.",
+        "common_sources": "Widely distributed in water, soil, and the intestinal tracts of animals and humans.",
+        "optimal_ph": "7.0-7.5",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "acinetobacter_baumannii",
+        "name": "Acinetobacter baumannii",
+        "scientific_name": "Acinetobacter baumannii",
+        "gram_type": "negative",
+        "morphology": "Coccobacillus, 1.0-1.5 μm in diameter and 1.5-2.5 μm in length",
+        "description": "A gram-negative, aerobic, non-motile, oxidase-negative coccobacillus that is an important nosocomial pathogen.",
+        "risk": "High in healthcare settings",
+        "health_effects": "Can cause pneumonia, bloodstream infections, meningitis, and wound infections, particularly in intensive care units.",
+        "common_sources": "Soil, water, and in the hospital environment on surfaces and medical equipment.",
+        "optimal_ph": "6.5-7.5",
+        "optimal_temp": "30-35°C (86-95°F)",
+        "oxygen_requirements": "Obligate aerobe"
+    },
+    {
+        "class": "streptococcus_pyogenes",
+        "name": "Streptococcus pyogenes",
+        "scientific_name": "Streptococcus pyogenes",
+        "gram_type": "positive",
+        "morphology": "Spherical, 0.6-1.0 μm in diameter, forms chains",
+        "description": "A gram-positive, non-motile, non-spore forming coccus that is the cause of group A streptococcal infections.",
+        "risk": "High",
+        "health_effects": "Causes a wide range of infections including strep throat, scarlet fever, impetigo, and necrotizing fasciitis.",
+        "common_sources": "Human respiratory tract and skin.",
+        "optimal_ph": "7.4-7.6",
+        "optimal_temp": "37°C (98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "staphylococcus_epidermidis",
+        "name": "Staphylococcus epidermidis",
+        "scientific_name": "Staphylococcus epidermidis",
+        "gram_type": "positive",
+        "morphology": "Spherical cells, 0.5-1.5 μm in diameter, forms grape-like clusters",
+        "description": "A gram-positive, coagulase-negative coccus that is part of the normal human flora, typically the skin flora and less commonly the mucosal flora.",
+        "risk": "Low to Medium",
+        "health_effects": "Generally non-pathogenic but can cause infections in immunocompromised individuals or when introduced into the body through medical devices.",
+        "common_sources": "Human skin and mucous membranes.",
+        "optimal_ph": "7.0-7.5",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "bacillus_cereus",
+        "name": "Bacillus cereus",
+        "scientific_name": "Bacillus cereus",
+        "gram_type": "positive",
+        "morphology": "Large rod, 1.0-1.2 μm in diameter and 3.0-5.0 μm in length, forms endospores",
+        "description": "A gram-positive, rod-shaped, beta-hemolytic, spore-forming bacterium that can cause foodborne illness.",
+        "risk": "Medium",
+        "health_effects": "Causes two types of food poisoning: diarrheal and emetic (vomiting) syndromes.",
+        "common_sources": "Soil, vegetation, and a wide range of foods including rice, pasta, and dairy products.",
+        "optimal_ph": "6.0-8.5",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "listeria_monocytogenes",
+        "name": "Listeria monocytogenes",
+        "scientific_name": "Listeria monocytogenes",
+        "gram_type": "positive",
+        "morphology": "Short rod, 0.5-2.0 μm in diameter and 0.5-2.0 μm in length",
+        "description": "A gram-positive, facultative anaerobic, rod-shaped bacterium that can grow and reproduce inside the host's cells.",
+        "risk": "High for pregnant women, newborns, elderly, and immunocompromised individuals",
+        "health_effects": "Causes listeriosis, which can result in sepsis, meningitis, and complications during pregnancy.",
+        "common_sources": "Soil, water, decaying vegetation, and can grow at refrigeration temperatures.",
+        "optimal_ph": "6.0-8.0",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    },
+    {
+        "class": "clostridium_perfringens",
+        "name": "Clostridium perfringens",
+        "scientific_name": "Clostridium perfringens",
+        "gram_type": "positive",
+        "morphology": "Large, rod-shaped, 4-8 μm long and 0.8-1.5 μm wide, forms spores",
+        "description": "A gram-positive, rod-shaped, anaerobic, spore-forming bacterium that is found in soil, decaying vegetation, and the intestinal tract of humans and animals.",
+        "risk": "Medium",
+        "health_effects": "Causes food poisoning, gas gangrene, and other infections. Produces several toxins that can cause tissue damage.",
+        "common_sources": "Soil, decaying vegetation, marine sediment, and the intestinal tract of humans and animals.",
+        "optimal_ph": "6.0-7.0",
+        "optimal_temp": "37-45°C (98.6-113°F)",
+        "oxygen_requirements": "Obligate anaerobe"
+    },
+    {
+        "class": "vibrio_parahaemolyticus",
+        "name": "Vibrio parahaemolyticus",
+        "scientific_name": "Vibrio parahaemolyticus",
+        "gram_type": "negative",
+        "morphology": "Curved rod, 0.4-0.5 μm in diameter and 1.4-2.6 μm in length",
+        "description": "A curved, rod-shaped, gram-negative bacterium found in brackish saltwater which, when ingested, causes gastrointestinal illness in humans.",
+        "risk": "Medium",
+        "health_effects": "Causes watery diarrhea, abdominal cramping, nausea, vomiting, fever, and chills. In rare cases, can cause septicemia.",
+        "common_sources": "Coastal waters, especially in warm months, and in undercooked or raw seafood.",
+        "optimal_ph": "7.6-8.6",
+        "optimal_temp": "30-37°C (86-98.6°F)",
+        "oxygen_requirements": "Facultative anaerobe"
+    }
+]
+
+ORGANISM_CATALOGUE = {organism['class']: organism for organism in MICROORGANISM_CLASSES}
+
+def build_organism_record(class_name, confidence, bbox):
+    """
+    Combine a raw model detection with the organism's reference properties
+    """
+    organism = ORGANISM_CATALOGUE.get(class_name)
+    if organism is None:
+        info = get_organism_info(class_name)
+        organism = dict(info, gram_type='unknown', common_sources='No source information available.')
+
+    return {
+        "class": class_name,
+        "confidence": confidence,
+        "bbox": bbox,
+        "gram_type": organism["gram_type"],
+        "name": organism["name"],
+        "scientific_name": organism["scientific_name"],
+        "description": organism["description"],
+        "risk": organism["risk"],
+        "health_effects": organism["health_effects"],
+        "common_sources": organism["common_sources"]
+    }
+
+def simulate_detections(width, height):
+    """
+    Produce demo detections when no trained model is available
+    """
+    # For demo purposes, we'll randomly select 2-4 microorganisms to detect
+    import random
+    num_detections = random.randint(2, 4)
+    selected_organisms = random.sample(MICROORGANISM_CLASSES, num_detections)
+    
+    detected_organisms = []
+    
+    for i, organism in enumerate(selected_organisms):
+        # Calculate random but reasonable bounding box
+        box_w = max(10, min(int(width * 0.15), width - 20))
+        box_h = max(10, min(int(height * 0.15), height - 20))
+        
+        # Position the box in a grid-like pattern
+        row = i // 2
+        col = i % 2
+        
+        x1 = max(10, int(width * (0.1 + col * 0.4)))
+        y1 = max(10, int(height * (0.1 + row * 0.4)))
+        x2 = min(width - 10, x1 + box_w)
+        y2 = min(height - 10, y1 + box_h)
+        
+        # Add some randomness to the confidence score
+        confidence = round(0.7 + random.random() * 0.25, 2)  # Between 0.7 and 0.95
+        
+        detected_organisms.append(build_organism_record(organism["class"], confidence, [x1, y1, x2, y2]))
+    
+    return detected_organisms
+
+def detect_microorganisms_colab(image, tiled=False):
     """
     Process the image to detect microorganisms with improved error handling and logging
+
+    ``image`` is either a path or an already decoded BGR array. With ``tiled``
+    set, large images are run as overlapping full-resolution tiles instead of
+    being downscaled to the model input size.
     """
     print(f"\n=== Starting Microorganism Detection ===")
-    print(f"Processing image: {image_path}")
-    
-    # List of possible microorganism classes with their properties
-    MICROORGANISM_CLASSES = [
-        {
-            "class": "e_coli",
-            "name": "Escherichia coli",
-            "scientific_name": "Escherichia coli",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 2.0 μm long and 0.25–1.0 μm in diameter",
-            "description": "A gram-negative, facultative anaerobic, rod-shaped coliform bacterium commonly found in the lower intestine of warm-blooded organisms.",
-            "risk": "High",
-            "health_effects": "Can cause diarrhea, urinary tract infections, respiratory illness, and other infections. Some strains can cause serious food poisoning.",
-            "common_sources": "Contaminated water, undercooked ground beef, raw milk, and fresh produce.",
-            "optimal_ph": "6.5-7.5",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "staphylococcus_aureus",
-            "name": "Staphylococcus aureus",
-            "scientific_name": "Staphylococcus aureus",
-            "gram_type": "positive",
-            "morphology": "Spherical cells, 1 μm in diameter, forms grape-like clusters",
-            "description": "A gram-positive, round-shaped bacterium that is a usual member of the microbiota of the body.",
-            "risk": "High",
-            "health_effects": "Can cause skin infections, pneumonia, heart valve infections, and bone infections. Some strains are resistant to common antibiotics (MRSA).",
-            "common_sources": "Human skin and nasal passages, can contaminate food and water.",
-            "optimal_ph": "7.0-7.5",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "salmonella_enterica",
-            "name": "Salmonella",
-            "scientific_name": "Salmonella enterica",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 2-5 μm long and 0.5-1.5 μm in diameter",
-            "description": "A rod-shaped, gram-negative bacterium that causes foodborne illness. It is motile and does not form spores.",
-            "risk": "High",
-            "health_effects": "Causes salmonellosis with symptoms including diarrhea, fever, and abdominal cramps 12-72 hours after infection.",
-            "common_sources": "Raw poultry, eggs, beef, and sometimes on unwashed fruit and vegetables.",
-            "optimal_ph": "6.5-7.5",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "pseudomonas_aeruginosa",
-            "name": "Pseudomonas aeruginosa",
-            "scientific_name": "Pseudomonas aeruginosa",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 0.5-0.8 μm by 1.5-3.0 μm",
-            "description": "A common encapsulated, gram-negative, rod-shaped bacterium that can cause disease in plants and animals.",
-            "risk": "High in healthcare settings",
-            "health_effects": "Can cause serious infections in the blood, lungs, or other parts of the body, especially in people with weakened immune systems.",
-            "common_sources": "Soil, water, and moist environments like sinks and toilets.",
-            "optimal_ph": "6.6-7.4",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Obligate aerobe"
-        },
-        {
-            "class": "bacillus_subtilis",
-            "name": "Bacillus subtilis",
-            "scientific_name": "Bacillus subtilis",
-            "gram_type": "positive",
-            "morphology": "Rod-shaped, 4-10 μm long and 0.25-1.0 μm in diameter, forms endospores",
-            "description": "A gram-positive, catalase-positive bacterium, found in soil and the gastrointestinal tract of ruminants and humans.",
-            "risk": "Low",
-            "health_effects": "Generally considered non-pathogenic, but can cause food spoilage and, rarely, infections in immunocompromised individuals.",
-            "common_sources": "Soil, water, and air.",
-            "optimal_ph": "5.5-8.5",
-            "optimal_temp": "25-35°C (77-95°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "enterococcus_faecalis",
-            "name": "Enterococcus faecalis",
-            "scientific_name": "Enterococcus faecalis",
-            "gram_type": "positive",
-            "morphology": "Oval cocci, 0.5-1.0 μm in diameter, occurring in pairs or short chains",
-            "description": "A gram-positive, commensal bacterium inhabiting the gastrointestinal tracts of humans and other mammals.",
-            "risk": "Medium",
-            "health_effects": "Can cause urinary tract infections, bacteremia, bacterial endocarditis, diverticulitis, and meningitis.",
-            "common_sources": "Human gastrointestinal tract, can contaminate water supplies.",
-            "optimal_ph": "6.5-7.5",
-            "optimal_temp": "35-37°C (95-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "vibrio_cholerae",
-            "name": "Vibrio cholerae",
-            "scientific_name": "Vibrio cholerae",
-            "gram_type": "negative",
-            "morphology": "Comma-shaped rod, 1.4-2.6 μm long and 0.5 μm in diameter",
-            "description": "A gram-negative, comma-shaped bacterium that is the causative agent of the diarrheal disease cholera.",
-            "risk": "High in endemic areas",
-            "health_effects": "Causes severe watery diarrhea that can lead to dehydration and death if untreated.",
-            "common_sources": "Contaminated water, especially in areas with poor sanitation.",
-            "optimal_ph": "8.5-9.5",
-            "optimal_temp": "30-40°C (86-104°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "klebsiella_pneumoniae",
-            "name": "Klebsiella pneumoniae",
-            "scientific_name": "Klebsiella pneumoniae",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 0.3-1.0 μm wide and 0.6-6.0 μm long",
-            "description": "A gram-negative, encapsulated, non-motile bacterium found in the normal flora of the mouth, skin, and intestines.",
-            "risk": "High in healthcare settings",
-            "health_effects": "Can cause pneumonia, bloodstream infections, wound or surgical site infections, and meningitis.",
-            "common_sources": "Human gastrointestinal tract, soil, and water.",
-            "optimal_ph": "7.2-7.4",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "proteus_mirabilis",
-            "name": "Proteus mirabilis",
-            "scientific_name": "Proteus mirabilis",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 0.4-0.8 μm wide and 1.0-3.0 μm long, highly motile",
-            "description": "A gram-negative, facultatively anaerobic, rod-shaped bacterium that shows swarming motility and urease activity.",
-            "risk": "Medium",
-            "health_effects": "Common cause of urinary tract infections and is also known to cause wound infections and other infections in humans.",
-            "common_sources": "Widely distributed in soil and water, and in the human intestinal tract.",
-            "optimal_ph": "6.0-7.0",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "serratia_marcescens",
-            "name": "Serratia marcescens",
-            "scientific_name": "Serratia marcescens",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 0.5-0.8 μm wide and 0.9-2.0 μm long",
-            "description": "A gram-negative, rod-shaped, facultatively anaerobic, opportunistic pathogen that produces a red pigment called prodigiosin.",
-            "risk": "Medium to High in healthcare settings",
-            "health_effects": "Can cause urinary tract infections, respiratory tract infections, endocarditis, osteomyelitis, septicemia, and eye infections.",
-            "common_sources": "Ubiquitous in the environment, found in soil, water, plants, and animals.",
-            "optimal_ph": "5-9",
-            "optimal_temp": "20-37°C (68-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "shigella_dysenteriae",
-            "name": "Shigella dysenteriae",
-            "scientific_name": "Shigella dysenteriae",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, non-motile, non-spore forming, 1-3 μm in length",
-            "description": "A gram-negative, non-motile, non-spore forming, rod-shaped bacterium that is the causative agent of bacillary dysentery.",
-            "risk": "High",
-            "health_effects": "Causes severe diarrhea (dysentery) with blood and mucus in the stools, fever, and abdominal pain.",
-            "common_sources": "Contaminated food and water, poor sanitation.",
-            "optimal_ph": "6.0-8.0",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "enterobacter_aerogenes",
-            "name": "Enterobacter aerogenes",
-            "scientific_name": "Enterobacter aerogenes",
-            "gram_type": "negative",
-            "morphology": "Rod-shaped, 0.6-1.0 μm in diameter and 1.2-3.0 μm in length",
-            "description": "A gram-negative, rod-shaped, facultative-anaerobic bacterium that is part of the normal gut flora.",
-            "risk": "Medium to High in healthcare settings",
-            "health_effects": "Can cause various infections including bacteremia, lower respiratory tract infections, skin and soft-tissue infections, and urinary tract infections.",
-            "common_sources": "Human gastrointestinal tract, soil, water, and sewage.",
-            "optimal_ph": "6.0-7.5",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "citrobacter_freundii",
-            "name": "Citrobacter freundii",
-            "scientific_name": "Citrobacter freundii",
-            "gram_type": "negative",
-            "morphology": "Straight rod, 1.0 μm in diameter and 2.0-6.0 μm in length",
-            "description": "A gram-negative, rod-shaped bacterium that is a member of the Enterobacteriaceae family.",
-            "risk": "Medium",
-            "health_effects": "Can cause opportunistic infections including respiratory infections, urinary tract infections, and bacteremia.",
-            "common_sources": "Widely distributed in water, soil, and the intestinal tracts of animals and humans.",
-            "optimal_ph": "7.0-7.5",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "acinetobacter_baumannii",
-            "name": "Acinetobacter baumannii",
-            "scientific_name": "Acinetobacter baumannii",
-            "gram_type": "negative",
-            "morphology": "Coccobacillus, 1.0-1.5 μm in diameter and 1.5-2.5 μm in length",
-            "description": "A gram-negative, aerobic, non-motile, oxidase-negative coccobacillus that is an important nosocomial pathogen.",
-            "risk": "High in healthcare settings",
-            "health_effects": "Can cause pneumonia, bloodstream infections, meningitis, and wound infections, particularly in intensive care units.",
-            "common_sources": "Soil, water, and in the hospital environment on surfaces and medical equipment.",
-            "optimal_ph": "6.5-7.5",
-            "optimal_temp": "30-35°C (86-95°F)",
-            "oxygen_requirements": "Obligate aerobe"
-        },
-        {
-            "class": "streptococcus_pyogenes",
-            "name": "Streptococcus pyogenes",
-            "scientific_name": "Streptococcus pyogenes",
-            "gram_type": "positive",
-            "morphology": "Spherical, 0.6-1.0 μm in diameter, forms chains",
-            "description": "A gram-positive, non-motile, non-spore forming coccus that is the cause of group A streptococcal infections.",
-            "risk": "High",
-            "health_effects": "Causes a wide range of infections including strep throat, scarlet fever, impetigo, and necrotizing fasciitis.",
-            "common_sources": "Human respiratory tract and skin.",
-            "optimal_ph": "7.4-7.6",
-            "optimal_temp": "37°C (98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "staphylococcus_epidermidis",
-            "name": "Staphylococcus epidermidis",
-            "scientific_name": "Staphylococcus epidermidis",
-            "gram_type": "positive",
-            "morphology": "Spherical cells, 0.5-1.5 μm in diameter, forms grape-like clusters",
-            "description": "A gram-positive, coagulase-negative coccus that is part of the normal human flora, typically the skin flora and less commonly the mucosal flora.",
-            "risk": "Low to Medium",
-            "health_effects": "Generally non-pathogenic but can cause infections in immunocompromised individuals or when introduced into the body through medical devices.",
-            "common_sources": "Human skin and mucous membranes.",
-            "optimal_ph": "7.0-7.5",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "bacillus_cereus",
-            "name": "Bacillus cereus",
-            "scientific_name": "Bacillus cereus",
-            "gram_type": "positive",
-            "morphology": "Large rod, 1.0-1.2 μm in diameter and 3.0-5.0 μm in length, forms endospores",
-            "description": "A gram-positive, rod-shaped, beta-hemolytic, spore-forming bacterium that can cause foodborne illness.",
-            "risk": "Medium",
-            "health_effects": "Causes two types of food poisoning: diarrheal and emetic (vomiting) syndromes.",
-            "common_sources": "Soil, vegetation, and a wide range of foods including rice, pasta, and dairy products.",
-            "optimal_ph": "6.0-8.5",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "listeria_monocytogenes",
-            "name": "Listeria monocytogenes",
-            "scientific_name": "Listeria monocytogenes",
-            "gram_type": "positive",
-            "morphology": "Short rod, 0.5-2.0 μm in diameter and 0.5-2.0 μm in length",
-            "description": "A gram-positive, facultative anaerobic, rod-shaped bacterium that can grow and reproduce inside the host's cells.",
-            "risk": "High for pregnant women, newborns, elderly, and immunocompromised individuals",
-            "health_effects": "Causes listeriosis, which can result in sepsis, meningitis, and complications during pregnancy.",
-            "common_sources": "Soil, water, decaying vegetation, and can grow at refrigeration temperatures.",
-            "optimal_ph": "6.0-8.0",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        },
-        {
-            "class": "clostridium_perfringens",
-            "name": "Clostridium perfringens",
-            "scientific_name": "Clostridium perfringens",
-            "gram_type": "positive",
-            "morphology": "Large, rod-shaped, 4-8 μm long and 0.8-1.5 μm wide, forms spores",
-            "description": "A gram-positive, rod-shaped, anaerobic, spore-forming bacterium that is found in soil, decaying vegetation, and the intestinal tract of humans and animals.",
-            "risk": "Medium",
-            "health_effects": "Causes food poisoning, gas gangrene, and other infections. Produces several toxins that can cause tissue damage.",
-            "common_sources": "Soil, decaying vegetation, marine sediment, and the intestinal tract of humans and animals.",
-            "optimal_ph": "6.0-7.0",
-            "optimal_temp": "37-45°C (98.6-113°F)",
-            "oxygen_requirements": "Obligate anaerobe"
-        },
-        {
-            "class": "vibrio_parahaemolyticus",
-            "name": "Vibrio parahaemolyticus",
-            "scientific_name": "Vibrio parahaemolyticus",
-            "gram_type": "negative",
-            "morphology": "Curved rod, 0.4-0.5 μm in diameter and 1.4-2.6 μm in length",
-            "description": "A curved, rod-shaped, gram-negative bacterium found in brackish saltwater which, when ingested, causes gastrointestinal illness in humans.",
-            "risk": "Medium",
-            "health_effects": "Causes watery diarrhea, abdominal cramping, nausea, vomiting, fever, and chills. In rare cases, can cause septicemia.",
-            "common_sources": "Coastal waters, especially in warm months, and in undercooked or raw seafood.",
-            "optimal_ph": "7.6-8.6",
-            "optimal_temp": "30-37°C (86-98.6°F)",
-            "oxygen_requirements": "Facultative anaerobe"
-        }
-    ]
     
     try:
-        # Verify input file exists and is readable
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Input image not found: {image_path}")
-        
-        # Read the image
-        print(f"Reading image from: {image_path}")
-        img = cv2.imread(image_path)
-        if img is None:
-            raise ValueError(f"Failed to read image using OpenCV: {image_path}")
+        if isinstance(image, str):
+            # Verify input file exists and is readable
+            print(f"Processing image: {image}")
+            if not os.path.exists(image):
+                raise FileNotFoundError(f"Input image not found: {image}")
+            
+            # Read the image
+            img = cv2.imread(image)
+            if img is None:
+                raise ValueError(f"Failed to read image using OpenCV: {image}")
+        else:
+            img = image
             
         # Get image dimensions
         height, width = img.shape[:2]
         print(f"Image dimensions: {width}x{height}")
         
-        # For demo purposes, we'll randomly select 2-4 microorganisms to detect
-        import random
-        num_detections = random.randint(2, 4)
-        selected_organisms = random.sample(MICROORGANISM_CLASSES, num_detections)
-        
-        detected_organisms = []
-        
-        for i, organism in enumerate(selected_organisms):
-            # Calculate random but reasonable bounding box
-            box_w = max(10, min(int(width * 0.15), width - 20))
-            box_h = max(10, min(int(height * 0.15), height - 20))
-            
-            # Position the box in a grid-like pattern
-            row = i // 2
-            col = i % 2
-            
-            x1 = max(10, int(width * (0.1 + col * 0.4)))
-            y1 = max(10, int(height * (0.1 + row * 0.4)))
-            x2 = min(width - 10, x1 + box_w)
-            y2 = min(height - 10, y1 + box_h)
-            
-            # Add some randomness to the confidence score
-            confidence = round(0.7 + random.random() * 0.25, 2)  # Between 0.7 and 0.95
-            
-            # Create the detection
-            detection = {
-                "class": organism["class"],
-                "confidence": confidence,
-                "bbox": [x1, y1, x2, y2],
-                "gram_type": organism["gram_type"],
-                "name": organism["name"],
-                "scientific_name": organism["scientific_name"],
-                "description": organism["description"],
-                "risk": organism["risk"],
-                "health_effects": organism["health_effects"],
-                "common_sources": organism["common_sources"]
-            }
-            
-            detected_organisms.append(detection)
-        
-        # Validate detections
-        if not detected_organisms:
-            raise ValueError("No organisms detected in the image")
+        from services.yolo_detection import get_detector, model_available
+
+        if model_available(Config):
+            # Run the YOLO model on CPU; concurrent jobs share batched forward passes
+            detector = get_detector(Config)
+            if tiled:
+                print(f"Running tiled inference ({Config.TILE_SIZE}px tiles, {Config.TILE_OVERLAP:.0%} overlap)")
+                raw_detections = detector.detect_tiled(img, Config.TILE_SIZE, Config.TILE_OVERLAP)
+            else:
+                raw_detections = detector.detect(img)
+
+            detected_organisms = [
+                build_organism_record(d['class'], d['confidence'], d['bbox'])
+                for d in raw_detections
+            ]
+        else:
+            print(f"Warning: model weights not found at {Config.MODEL_PATH}, using simulated detections")
+            detected_organisms = simulate_detections(width, height)
+
+            # Validate detections
+            if not detected_organisms:
+                raise ValueError("No organisms detected in the image")
             
         print(f"Detected {len(detected_organisms)} organisms")
         
@@ -610,6 +653,112 @@ def generate_water_usage_recommendations(organisms):
 def health_check():
     return jsonify({"status": "healthy", "message": "Microorganism Detection API is running"})
 
+def create_upload_detection(blob, filename, name=None, email=None, tiled=False):
+    """
+    Create the detection for a stored upload and queue it for processing
+
+    An earlier run on the same bytes, model, stain and inference mode is
+    reused instead, leaving only the results email to send.
+
+    Args:
+        blob (StoredBlob): The stored image
+        filename (str): Sanitised original filename
+        name (str): Uploader name
+        email (str): Where to send the results
+        tiled (bool): Use tiled inference
+
+    Returns:
+        tuple: (response dict, HTTP status)
+    """
+    # Create detection record
+    print("Creating detection record...")
+    from models.detection import Detection
+    from models.detection_fingerprint import DetectionFingerprint
+    from services.gram_staining import stain_version
+    from services.yolo_detection import model_version
+
+    # Same bytes, model, stain and inference mode as an earlier run: reuse its results
+    source = DetectionFingerprint.find_source(
+        blob.content_hash, model_version(Config), stain_version(Config), tiled
+    )
+    if source is not None:
+        detection = Detection(
+            filename=filename,
+            original_image_path=blob.path,
+            processed_image_path=source.processed_image_path,
+            detection_results=source.detection_results,
+            detected_organisms=source.detected_organisms,
+            water_usage_recommendations=source.water_usage_recommendations,
+            status='completed',
+            name=name,
+            email=email
+        )
+        db.session.add(detection)
+        db.session.flush()
+        from models.organism import DetectionOrganism
+        DetectionOrganism.add_for_detection(detection.id, source.parsed_organisms)
+        db.session.commit()
+        print(f"Detection record {detection.id} served from cache (detection {source.id})")
+
+        # Only the results email is left to do
+        if detection.email:
+            try:
+                from services.job_queue import get_job_queue
+                get_job_queue(current_app.config).enqueue({'detection_id': detection.id, 'notify_only': True})
+            except Exception as e:
+                print(f"Error queueing results email: {str(e)}")
+
+        return {
+            "success": True,
+            "detection_id": detection.id,
+            "status": detection.status,
+            "cached": True,
+            "source_detection_id": source.id,
+            "message": "Results served from cache"
+        }, 200
+
+    detection = Detection(
+        filename=filename,
+        original_image_path=blob.path,
+        status='pending',
+        name=name,
+        email=email
+    )
+    db.session.add(detection)
+    db.session.commit()
+    print(f"Detection record created with ID: {detection.id}")
+
+    # Hand the heavy lifting over to the detection workers
+    try:
+        from services.job_queue import get_job_queue
+        job_id = get_job_queue(current_app.config).enqueue({
+            'detection_id': detection.id,
+            'tiled': tiled,
+            'content_hash': blob.content_hash
+        })
+        print(f"Queued detection {detection.id} as job {job_id}")
+    except Exception as e:
+        print(f"Error queueing detection: {str(e)}")
+        detection.status = 'failed'
+        detection.error_message = f"Failed to queue detection: {str(e)}"
+        db.session.commit()
+        return {
+            "success": False,
+            "status": "failed",
+            "error": "Failed to queue image for processing",
+            "details": str(e),
+            "detection_id": detection.id
+        }, 503
+
+    return {
+        "success": True,
+        "detection_id": detection.id,
+        "status": detection.status,
+        "cached": False,
+        "message": "Image uploaded and queued for processing"
+    }, 202
+
+
 @app.route('/api/upload', methods=['POST'])
 def upload_image():
     print("\n=== Starting Image Upload ===")
@@ -649,23 +798,14 @@ def upload_image():
         os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
         print(f"Upload directory: {app.config['UPLOAD_FOLDER']}")
 
-        # Save original file
+        # Store the bytes once under their content hash, hashing while streaming to disk
         filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-        print(f"Saving file to: {filepath}")
-        
+        from utils.file_handler import file_extension, store_stream
         try:
-            file.save(filepath)
-            print("File saved successfully")
-            print(f"File size: {os.path.getsize(filepath)} bytes")
-            
-            # Verify the file was saved correctly
-            if not os.path.exists(filepath):
-                raise IOError("Failed to save file - file does not exist after save")
-            if os.path.getsize(filepath) == 0:
-                raise IOError("Failed to save file - file is empty")
-                
+            blob = store_stream(file.stream, app.config['UPLOAD_FOLDER'], file_extension(filename))
+            filepath = blob.path
+            print(f"File stored at: {filepath} ({blob.size} bytes, sha256 {blob.content_hash}, "
+                  f"{'new' if blob.created else 'already stored'})")
         except Exception as e:
             print(f"Error saving file: {str(e)}")
             return jsonify({
@@ -680,127 +820,12 @@ def upload_image():
         email = request.form.get('email')
         print(f"User name: {name}, email: {email}")
 
-        # Create detection record
-        print("Creating detection record...")
-        from models.detection import Detection
-        detection = Detection(
-            filename=unique_filename,
-            original_image_path=filepath,
-            status='processing',
-            name=name,
-            email=email
-        )
-        db.session.add(detection)
-        db.session.commit()
-        print(f"Detection record created with ID: {detection.id}")
-        
-        try:
-            # Apply gram staining effect
-            print("\n--- Starting Gram Staining ---")
-            processed_image_path = apply_gram_staining_effect(filepath)
-            print(f"Gram staining complete. Processed image: {processed_image_path}")
-            
-            if not os.path.exists(processed_image_path):
-                raise FileNotFoundError(f"Processed image not found at {processed_image_path}")
-                
-            detection.processed_image_path = processed_image_path
-            
-            # Detect microorganisms
-            print("\n--- Starting Microorganism Detection ---")
-            detection_results = detect_microorganisms_colab(processed_image_path)
-            print(f"Detection results: {json.dumps(detection_results, indent=2)}")
-            
-            if detection_results.get('success'):
-                print("Detection successful. Updating database...")
-                detection.detection_results = json.dumps(detection_results)
-                detection.detected_organisms = json.dumps(detection_results.get('organisms', []))
-                
-                # Generate recommendations
-                try:
-                    recommendations = generate_water_usage_recommendations(detection_results.get('organisms', []))
-                    detection.water_usage_recommendations = json.dumps(recommendations)
-                    print("Recommendations generated successfully")
-                except Exception as e:
-                    print(f"Warning: Failed to generate recommendations: {str(e)}")
-                    detection.water_usage_recommendations = json.dumps({
-                        'error': str(e),
-                        'safe_uses': [],
-                        'unsafe_uses': [],
-                        'treatment_required': ['Error generating recommendations'],
-                        'risk_level': 'unknown'
-                    })
-                
-                detection.status = 'completed'
-                print("Database updated with detection results")
-            else:
-                error_msg = detection_results.get('error', 'Unknown error during detection')
-                print(f"Detection failed: {error_msg}")
-                detection.status = 'failed'
-                detection.error_message = error_msg
-                
-        except Exception as e:
-            import traceback
-            error_trace = traceback.format_exc()
-            print(f"Error during image processing: {str(e)}\n{error_trace}")
-            detection.status = 'failed'
-            detection.error_message = str(e)
-            db.session.commit()
-            
-            return jsonify({
-                "success": False,
-                "status": "failed",
-                "error": "Error during image processing",
-                "details": str(e),
-                "detection_id": detection.id,
-                "trace": error_trace
-            }), 500
-        
-        db.session.commit()
-        print(f"\n=== Processing Complete ===")
-        print(f"Final status: {detection.status}")
-        print(f"Detection ID: {detection.id}")
+        # Tiled inference for high-resolution micrographs can be switched per request
+        tiled_param = request.form.get('tiled')
+        tiled = Config.TILED_INFERENCE if tiled_param is None else tiled_param.lower() in ['true', '1', 't', 'yes']
 
-        # Send results email if detection completed and email provided
-        # In the upload_image function, update the email sending part:
-
-        if detection.status == 'completed' and detection.email:
-            try:
-                from services.email_service import send_detection_results_email
-                
-                # Parse detection_results if it's a string
-                try:
-                    detection_results = json.loads(detection.detection_results) if detection.detection_results else {}
-                except (json.JSONDecodeError, AttributeError):
-                    detection_results = {}
-                
-                # Prepare detection results
-                results = {
-                    'organisms': json.loads(detection.detected_organisms) if detection.detected_organisms else [],
-                    'recommendations': json.loads(detection.water_usage_recommendations) if detection.water_usage_recommendations else []
-                }
-                
-                # Get processed image path safely
-                processed_image_path = detection_results.get('processed_image_path') if isinstance(detection_results, dict) else None
-                
-                # Send email with detection results
-                send_detection_results_email(
-                    recipient_email=detection.email,
-                    detection_id=str(detection.id),
-                    results=results,
-                    gram_stained_image_path=detection.processed_image_path,
-                    detected_image_path=processed_image_path
-                )
-            except Exception as e:
-                print(f"Failed to send results email: {str(e)}")
-                import traceback
-                print("Email error details:", traceback.format_exc())
-
-        return jsonify({
-            "success": True,
-            "detection_id": detection.id,
-            "status": detection.status,
-            "message": "Image uploaded and processed successfully"
-        })
+        body, status = create_upload_detection(blob, filename, name, email, tiled)
+        return jsonify(body), status
         
     except Exception as e:
         import traceback
@@ -815,10 +840,213 @@ def upload_image():
             "trace": error_trace
         }), 500
 
+# Processing errors caused by the upload itself (unreadable or invalid image);
+# anything else is treated as transient and retried by the job queue
+PERMANENT_JOB_ERRORS = (ValueError, cv2.error)
+
+def process_detection_job(detection_id, tiled=False, content_hash=None, notify_only=False):
+    """
+    Run staining, detection, recommendations and the results email for a queued detection
+
+    Drives the detection through ``pending -> processing -> completed/failed``.
+    With ``content_hash`` the completed results are fingerprinted for reuse;
+    ``notify_only`` jobs (results served from cache) just send the email.
+    Must be called inside an application context. Returns the final status.
+
+    Raises:
+        Exception: Transient failures (database, I/O, inference backend), so the
+            job queue retries the job; the detection stays ``processing``
+    """
+    from models.detection import Detection
+
+    detection = Detection.query.get(detection_id)
+    if detection is None:
+        print(f"Detection {detection_id} no longer exists, skipping")
+        return None
+
+    if notify_only:
+        if detection.status == 'completed' and detection.email:
+            send_results_email(detection)
+        return detection.status
+
+    if detection.status in ('completed', 'failed'):
+        print(f"Detection {detection_id} already {detection.status}, skipping")
+        return detection.status
+
+    detection.status = 'processing'
+    db.session.commit()
+    print(f"\n=== Processing Detection {detection.id} ===")
+
+    filepath = detection.original_image_path
+
+    from services.pipeline import ImageContext
+
+    try:
+        # Decode the upload once; every stage below works on the same array
+        context = ImageContext.from_file(filepath)
+        is_valid, message = context.validate()
+        if not is_valid:
+            raise ValueError(message)
+        print(f"Decoded image: {context.shape[1]}x{context.shape[0]}")
+
+        # Apply gram staining effect
+        print("\n--- Starting Gram Staining ---")
+        try:
+            context.stained = gram_stain_image(context.image)
+            print("Gram staining complete")
+        except Exception as e:
+            # Staining is cosmetic: carry on with the original image
+            print(f"Error in gram staining: {str(e)}")
+        
+        # Detect microorganisms
+        print("\n--- Starting Microorganism Detection ---")
+        stained = context.stained if context.stained is not None else context.image
+        detection_results = detect_microorganisms_colab(stained, tiled=tiled)
+
+        # Intermediate images are only encoded once processing is done
+        if context.stained is not None:
+            processed_image_path = context.add_output(processed_path_for(filepath), context.stained)
+            context.flush()
+        else:
+            processed_image_path = filepath
+        context.release()
+        detection.processed_image_path = processed_image_path
+        print(f"Processed image saved: {processed_image_path}")
+        print(f"Detection results: {json.dumps(detection_results, indent=2)}")
+        
+        if detection_results.get('success'):
+            print("Detection successful. Updating database...")
+            # The organism list is stored once, in detected_organisms
+            from models.detection_json import results_without_organisms
+            detection.parsed_results = results_without_organisms(detection_results)
+            detection.parsed_organisms = detection_results.get('organisms', [])
+
+            # Normalized per-organism rows for SQL-side statistics, committed with the results
+            from models.organism import DetectionOrganism
+            DetectionOrganism.add_for_detection(detection.id, detection_results.get('organisms', []))
+            
+            # Generate recommendations
+            try:
+                recommendations = generate_water_usage_recommendations(detection_results.get('organisms', []))
+                detection.parsed_recommendations = recommendations
+                print("Recommendations generated successfully")
+            except Exception as e:
+                print(f"Warning: Failed to generate recommendations: {str(e)}")
+                detection.parsed_recommendations = {
+                    'error': str(e),
+                    'safe_uses': [],
+                    'unsafe_uses': [],
+                    'treatment_required': ['Error generating recommendations'],
+                    'risk_level': 'unknown'
+                }
+            
+            detection.status = 'completed'
+            print("Database updated with detection results")
+        else:
+            error_msg = detection_results.get('error', 'Unknown error during detection')
+            print(f"Detection failed: {error_msg}")
+            detection.status = 'failed'
+            detection.error_message = error_msg
+            
+    except PERMANENT_JOB_ERRORS as e:
+        # Bad input: retrying cannot help
+        import traceback
+        error_trace = traceback.format_exc()
+        print(f"Error during image processing: {str(e)}\n{error_trace}")
+        db.session.rollback()
+        detection = Detection.query.get(detection_id)
+        detection.status = 'failed'
+        detection.error_message = str(e)
+        db.session.commit()
+        return detection.status
+    except Exception as e:
+        # Database, storage or inference backend trouble: let the queue retry with
+        # backoff; the worker marks the detection failed once attempts run out
+        print(f"Transient error processing detection {detection_id}: {str(e)}")
+        db.session.rollback()
+        raise
+    
+    db.session.commit()
+    print(f"\n=== Processing Complete ===")
+    print(f"Final status: {detection.status}")
+    print(f"Detection ID: {detection.id}")
+
+    if detection.status == 'completed' and content_hash:
+        record_fingerprint(detection, content_hash, tiled)
+
+    # Send results email if detection completed and email provided
+    if detection.status == 'completed' and detection.email:
+        send_results_email(detection)
+
+    return detection.status
+
+def record_fingerprint(detection, content_hash, tiled):
+    """Make a completed detection's results reusable for identical uploads"""
+    from models.detection_fingerprint import DetectionFingerprint
+    from services.gram_staining import stain_version
+    from services.yolo_detection import model_version
+
+    try:
+        DetectionFingerprint.record(
+            content_hash, model_version(Config), stain_version(Config), tiled, detection.id
+        )
+        db.session.commit()
+    except Exception as e:
+        # Losing a cache entry only costs a recomputation later
+        db.session.rollback()
+        print(f"Failed to record fingerprint for detection {detection.id}: {str(e)}")
+
+def send_results_email(detection):
+    """
+    Email a completed detection's results to the address it was submitted with,
+    or hold them for the next digest if the recipient gets digests
+    """
+    try:
+        from services.email_digest import hold_for_digest
+        if hold_for_digest(detection):
+            db.session.commit()
+            return
+
+        from services.email_service import send_detection_results_email
+        
+        detection_results = detection.parsed_results
+        
+        # Prepare detection results
+        results = {
+            'organisms': detection.parsed_organisms,
+            'recommendations': detection.parsed_recommendations
+        }
+        
+        # Get processed image path safely
+        processed_image_path = detection_results.get('processed_image_path') if isinstance(detection_results, dict) else None
+        
+        # Send email with detection results
+        send_detection_results_email(
+            recipient_email=detection.email,
+            detection_id=detection.id,
+            results=results,
+            gram_stained_image_path=detection.processed_image_path,
+            detected_image_path=processed_image_path
+        )
+    except Exception as e:
+        db.session.rollback()
+        print(f"Failed to send results email: {str(e)}")
+        import traceback
+        print("Email error details:", traceback.format_exc())
+
 @app.route('/api/detection/<detection_id>', methods=['GET'])
 def get_detection_result(detection_id):
     try:
         from models.detection import Detection
+        from services.response_cache import (COMPLETED_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL,
+                                             detection_cache)
+        from utils.http_cache import conditional, serialize
+        
+        # Completed detections never change: replay the serialized response without a query
+        cached = detection_cache.get(str(detection_id))
+        if cached is not None:
+            return conditional(cached, COMPLETED_CACHE_CONTROL)
+        
         detection = Detection.query.get_or_404(detection_id)
         
         result = {
@@ -831,17 +1059,25 @@ def get_detection_result(detection_id):
         }
         
         if detection.detection_results:
-            result["detection_results"] = json.loads(detection.detection_results)
+            # Organisms are stored once; nest them again for clients reading detection_results
+            detection_results = detection.parsed_results
+            if isinstance(detection_results, dict):
+                detection_results = dict(detection_results, organisms=detection.parsed_organisms)
+            result["detection_results"] = detection_results
         
         if detection.detected_organisms:
-            result["organisms"] = json.loads(detection.detected_organisms)
+            result["organisms"] = detection.parsed_organisms
         
         if detection.water_usage_recommendations:
-            rec = json.loads(detection.water_usage_recommendations)
+            rec = detection.parsed_recommendations
             result["water_recommendations"] = rec
             result["recommendations"] = rec  # alias for frontend
         
-        return jsonify(result)
+        cached = serialize(result)
+        if detection.status == 'completed':
+            detection_cache.set(str(detection.id), cached)
+            return conditional(cached, COMPLETED_CACHE_CONTROL)
+        return conditional(cached, REVALIDATE_CACHE_CONTROL)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -850,14 +1086,16 @@ def get_detection_result(detection_id):
 @app.route('/api/detections', methods=['GET'])
 def get_all_detections():
     try:
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
-        
         from models import Detection
-        detections = Detection.query.order_by(Detection.timestamp.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        from utils.json_codec import json_response
+        from utils.pagination import paginate
+        from utils.projection import parse_fields, project
+        try:
+            detections = paginate(Detection.query, Detection.timestamp, Detection.id, request.args)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
         
+        selection = parse_fields(request.args.get('fields'))
         results = []
         for detection in detections.items:
             result = {
@@ -870,42 +1108,42 @@ def get_all_detections():
             }
             
             if detection.detected_organisms:
-                try:
-                    # Parse the JSON data
-                    data = json.loads(detection.detected_organisms)
-                    
-                    # Handle different data formats
-                    if isinstance(data, dict) and 'organisms' in data:
-                        organisms = data.get('organisms', [])
-                    elif isinstance(data, list):
-                        organisms = data
-                    else:
-                        organisms = []
-                    
-                    # Ensure we have a list of organisms
-                    if not isinstance(organisms, list):
-                        organisms = []
-                    
-                    # Update the result with organism info
-                    result["organism_count"] = len(organisms)
-                    result["organism_types"] = [
-                        org.get("class") if isinstance(org, dict) else str(org)
-                        for org in organisms
-                        if (isinstance(org, dict) and org.get("class")) or org
-                    ]
-                    
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, keep default values
-                    pass
+                # Decoded once per instance; unparseable data keeps the default values
+                data = detection.parsed_organisms
+                
+                # Handle different data formats
+                if isinstance(data, dict) and 'organisms' in data:
+                    organisms = data.get('organisms', [])
+                elif isinstance(data, list):
+                    organisms = data
+                else:
+                    organisms = []
+                
+                # Ensure we have a list of organisms
+                if not isinstance(organisms, list):
+                    organisms = []
+                
+                # Update the result with organism info
+                result["organism_count"] = len(organisms)
+                result["organism_types"] = [
+                    org.get("class") if isinstance(org, dict) else str(org)
+                    for org in organisms
+                    if (isinstance(org, dict) and org.get("class")) or org
+                ]
             
-            results.append(result)
+            results.append(project(result, selection))
         
-        return jsonify({
+        response = {
             "success": True,
             "detections": results,  # Changed from "data": { "detections": results }
-            "total": detections.total,
-            "pages": detections.pages
-        })
+            "next_cursor": detections.next_cursor,
+            "has_more": detections.next_cursor is not None
+        }
+        if detections.pages is not None:
+            response["pages"] = detections.pages
+        if detections.total is not None:
+            response["total"] = detections.total
+        return json_response(response)
     
     except Exception as e:
         return jsonify({
@@ -916,26 +1154,37 @@ def get_all_detections():
 @app.route('/api/detection/<detection_id>', methods=['DELETE'])
 def delete_detection(detection_id):
     from models.detection import Detection
-    from sqlalchemy.orm import scoped_session, sessionmaker
-    
-    # Create a new session for this request
-    session = scoped_session(sessionmaker(bind=db.engine))
     
+    session = db.session
     try:
-        # Use the new session to get the detection
         detection = session.query(Detection).get(detection_id)
         if not detection:
             return jsonify({"success": False, "error": "Detection not found"}), 404
         
-        # Delete associated files
+        # Delete associated files, unless another detection still shares them
+        from sqlalchemy import or_
         for file_path in [detection.original_image_path, detection.processed_image_path]:
-            if file_path and os.path.exists(file_path):
+            shared = file_path and session.query(Detection.id).filter(
+                Detection.id != detection.id,
+                or_(Detection.original_image_path == file_path, Detection.processed_image_path == file_path)
+            ).first() is not None
+            if file_path and not shared and os.path.exists(file_path):
                 try:
                     os.remove(file_path)
                 except Exception as e:
                     print(f"Error deleting file {file_path}: {str(e)}")
+                from utils.email_attachments import remove_previews
+                remove_previews(file_path)
         
-        # Delete the detection
+        # Delete the detection and any result-reuse fingerprints or batch entries pointing at it
+        from models.detection_fingerprint import DetectionFingerprint
+        from models.organism import DetectionOrganism
+        from models.resumable_upload import ResumableUpload
+        from models.upload_batch import UploadBatchItem
+        session.query(DetectionFingerprint).filter_by(detection_id=detection.id).delete()
+        session.query(UploadBatchItem).filter_by(detection_id=detection.id).delete()
+        session.query(ResumableUpload).filter_by(detection_id=detection.id).update({'detection_id': None})
+        DetectionOrganism.delete_for_detection(detection.id, session=session)
         session.delete(detection)
         session.commit()
         
@@ -944,53 +1193,40 @@ def delete_detection(detection_id):
         session.rollback()
         print(f"Error deleting detection: {str(e)}")
         return jsonify({"success": False, "error": str(e)}), 500
-    finally:
-        # Always close the session
-        session.close()
 
 @app.route('/api/statistics', methods=['GET'])
 def get_statistics():
     try:
         from models.detection import Detection
+        from models.organism import DetectionOrganism
+        from models.statistics import OrganismStats, SystemStats
+        from services.response_cache import REVALIDATE_CACHE_CONTROL, statistics_cache
+        from utils.http_cache import conditional, serialize
         from collections import defaultdict
-        import json
-        from sqlalchemy import func
         
-        # Get all detections
-        detections = Detection.query.all()
+        cached = statistics_cache.get('app')
+        if cached is not None:
+            return conditional(cached, REVALIDATE_CACHE_CONTROL)
         
-        # Initialize counts
-        completed = 0
-        failed = 0
-        organism_statistics = defaultdict(int)
+        # Status counts from the per-day rollups
+        totals = SystemStats.totals()
+        completed = totals['completed_detections']
+        failed = totals['failed_detections']
+        total_detections = totals['total_detections']
         
-        # Process each detection
-        for detection in detections:
-            # Update status counts
-            if detection.status == 'completed':
-                completed += 1
-            elif detection.status == 'failed':
-                failed += 1
-                
-            # Parse detected organisms if available
-            if detection.detected_organisms:
-                try:
-                    organisms = json.loads(detection.detected_organisms)
-                    if isinstance(organisms, list):
-                        for org in organisms:
-                            if isinstance(org, dict):
-                                org_name = org.get('class', '').lower().replace(' ', '_')
-                                if org_name:
-                                    organism_statistics[org_name] += 1
-                except (json.JSONDecodeError, AttributeError):
-                    continue
+        # Organism counts from the per-organism rollup
+        organism_statistics = defaultdict(int)
+        for org_name, count in OrganismStats.counts().items():
+            org_name = org_name.lower().replace(' ', '_')
+            if org_name:
+                organism_statistics[org_name] += count
         
         # Calculate success rate
-        total_detections = len(detections)
         success_rate = round((completed / total_detections) * 100) if total_detections > 0 else 0
         
         # Get recent detections (last 5)
         recent_detections = Detection.query.order_by(Detection.timestamp.desc()).limit(5).all()
+        organism_counts = DetectionOrganism.counts_by_detection([d.id for d in recent_detections])
         
         # Prepare response
         response = {
@@ -1004,11 +1240,13 @@ def get_statistics():
                 "filename": d.filename,
                 "status": d.status,
                 "timestamp": d.timestamp.isoformat(),
-                "organism_count": len(json.loads(d.detected_organisms)) if d.detected_organisms else 0
+                "organism_count": organism_counts.get(d.id, 0)
             } for d in recent_detections]
         }
         
-        return jsonify(response)
+        cached = serialize(response)
+        statistics_cache.set('app', cached)
+        return conditional(cached, REVALIDATE_CACHE_CONTROL)
     
     except Exception as e:
         print(f"Error in get_statistics: {str(e)}")  # Log the error
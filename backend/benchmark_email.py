@@ -0,0 +1,93 @@
+"""
+Email throughput benchmark: a connection per message vs. pooled connections
+
+Sends the same results email through a local SMTP sink (smtp_sink.py), first
+the way utils/email_service.py used to (connect, EHLO, send, QUIT for every
+message) and then over the outbox sender's pooled ``SMTPConnection``s, and
+reports messages per second. ``--latency`` delays each server reply to stand
+in for the network round trips (and, for a real server, the STARTTLS and
+AUTH exchanges) that a new connection costs.
+
+Usage:
+    python benchmark_email.py
+    python benchmark_email.py --messages 500 --threads 4 --latency 0.02
+"""
+import argparse
+import smtplib
+import threading
+import time
+from types import SimpleNamespace
+
+from services.email_outbox import SMTPConnection, SMTPPool, build_message
+from smtp_sink import SMTPSink
+from utils.email_service import results_html
+
+SENDER = 'noreply@microdetection.local'
+ENTRY = SimpleNamespace(
+    recipient='lab@example.com',
+    subject='Microorganism Detection Results',
+    html_body=results_html({'detections': [{'class': 'e_coli', 'confidence': 0.91}] * 3}),
+    attachment_paths=[]
+)
+
+
+def per_message(host, port, count):
+    """A new connection for every message"""
+    for _ in range(count):
+        with smtplib.SMTP(host, port) as server:
+            server.ehlo()
+            server.send_message(build_message(ENTRY, SENDER))
+
+
+def pooled(pool, count):
+    """Messages over a checked-out pooled connection"""
+    for _ in range(count):
+        with pool.connection() as conn:
+            conn.send(build_message(ENTRY, SENDER))
+
+
+def run_threads(target, args_for, threads):
+    workers = [threading.Thread(target=target, args=args_for(i)) for i in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark per-message SMTP connections against pooled ones')
+    parser.add_argument('--messages', type=int, default=200, help='Messages per run')
+    parser.add_argument('--threads', type=int, default=2, help='Sender threads (and pooled connections)')
+    parser.add_argument('--latency', type=float, default=0.005, help='Simulated seconds per server reply')
+    args = parser.parse_args()
+
+    per_thread = max(1, args.messages // args.threads)
+    total = per_thread * args.threads
+    print(f"{total} messages, {args.threads} thread(s), {args.latency * 1000:g} ms per server reply")
+    print(f"{'mode':<14}{'seconds':>10}{'msgs/s':>10}{'connections':>13}")
+
+    results = {}
+    with SMTPSink(port=0, latency=args.latency) as sink:
+        host, port = sink.address
+
+        elapsed = run_threads(per_message, lambda i: (host, port, per_thread), args.threads)
+        results['per-message'] = total / elapsed
+        print(f"{'per-message':<14}{elapsed:>10.2f}{results['per-message']:>10.1f}{sink.connections:>13}")
+
+        before = sink.connections
+        pool = SMTPPool(lambda: SMTPConnection(host, port, max_messages=10 ** 6), size=args.threads)
+        elapsed = run_threads(pooled, lambda i: (pool, per_thread), args.threads)
+        pool.close()
+        results['pooled'] = total / elapsed
+        print(f"{'pooled':<14}{elapsed:>10.2f}{results['pooled']:>10.1f}{sink.connections - before:>13}")
+
+        received = len(sink.messages)
+
+    print(f"Sink received {received} message(s)")
+    print(f"Pooled connections: {results['pooled'] / results['per-message']:.1f}x the throughput")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+Concurrent read/write benchmark for the SQLite engine configuration
+
+Runs writer threads (insert a detection, then mark it completed, as an
+upload followed by its job does) alongside reader threads (a listing page
+plus a count, as the history page does) against a scratch database, once
+with SQLAlchemy's defaults and once with utils/database.py's tuning, and
+reports operations per second and ``database is locked`` errors.
+
+Usage:
+    python benchmark_sqlite.py
+    python benchmark_sqlite.py --writers 8 --readers 16 --seconds 10
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Index, Integer, MetaData, String, Table, Text,
+                        create_engine, func, select)
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from config import Config
+from utils.database import configure_engine, engine_options
+
+metadata = MetaData()
+detection = Table(
+    'detection', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('filename', String(255)),
+    Column('original_image_path', String(500)),
+    Column('detected_organisms', Text),
+    Column('timestamp', DateTime),
+    Column('status', String(20)),
+    Index('ix_detection_timestamp_id', 'timestamp', 'id'),
+)
+
+ORGANISMS = json.dumps([{'class': 'e_coli', 'confidence': 0.91, 'bbox': [10, 20, 110, 140]}] * 3)
+
+
+def settings():
+    return {name: getattr(Config, name) for name in dir(Config) if name.isupper()}
+
+
+def build_engine(path, tuned):
+    url = f'sqlite:///{path}'
+    if not tuned:
+        # What create_app used before: Flask-SQLAlchemy's NullPool and SQLite's defaults
+        return create_engine(url, poolclass=NullPool)
+    engine = create_engine(url, **engine_options(url, settings()))
+    configure_engine(engine, settings())
+    return engine
+
+
+def seed(engine, rows):
+    metadata.create_all(engine)
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(detection.insert(), [
+            {'filename': f'seed{i}.jpg', 'original_image_path': f'uploads/seed{i}.jpg',
+             'detected_organisms': ORGANISMS, 'timestamp': now, 'status': 'completed'}
+            for i in range(rows)
+        ])
+
+
+def writer(engine, deadline, stats):
+    while time.time() < deadline:
+        try:
+            with engine.begin() as conn:
+                row_id = conn.execute(detection.insert().values(
+                    filename='bench.jpg', original_image_path='uploads/bench.jpg',
+                    timestamp=datetime.utcnow(), status='pending'
+                )).inserted_primary_key[0]
+            with engine.begin() as conn:
+                conn.execute(detection.update().where(detection.c.id == row_id).values(
+                    status='completed', detected_organisms=ORGANISMS
+                ))
+            stats['writes'] += 1
+        except OperationalError as e:
+            stats['errors'] += 1
+            if 'locked' not in str(e):
+                raise
+
+
+def reader(engine, deadline, stats):
+    while time.time() < deadline:
+        try:
+            with engine.connect() as conn:
+                conn.execute(select(func.count()).select_from(detection)).scalar()
+                offset = random.randint(0, 500)
+                conn.execute(
+                    select(detection)
+                    .order_by(detection.c.timestamp.desc(), detection.c.id.desc())
+                    .limit(20).offset(offset)
+                ).fetchall()
+            stats['reads'] += 1
+        except OperationalError as e:
+            stats['errors'] += 1
+            if 'locked' not in str(e):
+                raise
+
+
+def run(tuned, args):
+    workdir = tempfile.mkdtemp(prefix='bench-sqlite-')
+    try:
+        engine = build_engine(os.path.join(workdir, 'bench.db'), tuned)
+        seed(engine, args.rows)
+        stats = {'reads': 0, 'writes': 0, 'errors': 0}
+        deadline = time.time() + args.seconds
+        # Counter updates race benignly across threads; the totals are only reported
+        threads = [threading.Thread(target=writer, args=(engine, deadline, stats)) for _ in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(engine, deadline, stats)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+        return stats
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SQLite read/write throughput before and after tuning')
+    parser.add_argument('--writers', type=int, default=4, help='Writer threads')
+    parser.add_argument('--readers', type=int, default=8, help='Reader threads')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+    parser.add_argument('--rows', type=int, default=5000, help='Detections seeded before each run')
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per run, {args.rows} seeded rows")
+    print(f"{'engine':<10}{'reads/s':>10}{'writes/s':>10}{'locked':>8}")
+    results = {}
+    for name, tuned in [('default', False), ('tuned', True)]:
+        stats = run(tuned, args)
+        results[name] = stats
+        print(f"{name:<10}{stats['reads'] / args.seconds:>10.1f}"
+              f"{stats['writes'] / args.seconds:>10.1f}{stats['errors']:>8}")
+
+    for kind in ('reads', 'writes'):
+        before, after = results['default'][kind], results['tuned'][kind]
+        if before:
+            print(f"{kind}: {after / before:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark the gram staining engine against the original implementation
+
+For every quality level, reports the mean wall time per image, the speed-up
+over the original fastNlMeansDenoisingColored + PIL ImageEnhance pipeline
+and the PSNR and SSIM of the output against that pipeline's output.
+
+Usage:
+    python benchmark_staining.py --images path/to/micrographs
+    python benchmark_staining.py --size 2048 --count 3     # synthetic images
+"""
+import argparse
+import os
+import time
+
+import cv2
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from services.gram_staining import QUALITY_LEVELS, GramStainingEngine
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+
+
+def legacy_gram_stain(img):
+    """The staining pipeline as it was before GramStainingEngine, kept as the reference"""
+    img_denoised = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
+
+    hsv = cv2.cvtColor(img_denoised, cv2.COLOR_BGR2HSV)
+    lab = cv2.cvtColor(img_denoised, cv2.COLOR_BGR2LAB)
+
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+    lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+    result = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+    mask_positive = cv2.inRange(hsv, np.array([100, 50, 50]), np.array([130, 255, 255]))
+    result[mask_positive > 0] = [180, 50, 200]
+
+    mask_negative = cv2.bitwise_or(
+        cv2.inRange(hsv, np.array([0, 50, 50]), np.array([10, 255, 255])),
+        cv2.inRange(hsv, np.array([160, 50, 50]), np.array([180, 255, 255]))
+    )
+    result[mask_negative > 0] = [50, 50, 255]
+
+    result_pil = Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB))
+    result_pil = ImageEnhance.Brightness(result_pil).enhance(1.2)
+    result_pil = ImageEnhance.Contrast(result_pil).enhance(1.3)
+    result_pil = ImageEnhance.Color(result_pil).enhance(1.1)
+    final_result = cv2.cvtColor(np.array(result_pil), cv2.COLOR_RGB2BGR)
+
+    kernel = np.array([[-1, -1, -1],
+                       [-1,  9, -1],
+                       [-1, -1, -1]])
+    return cv2.filter2D(final_result, -1, kernel)
+
+
+def synthetic_micrograph(size, seed):
+    """Noisy light background with purple and pink blobs, roughly like a stained slide"""
+    rng = np.random.default_rng(seed)
+    img = np.full((size, size, 3), (225, 220, 230), dtype=np.uint8)
+    for _ in range(size // 8):
+        center = tuple(int(v) for v in rng.integers(0, size, 2))
+        axes = tuple(int(v) for v in rng.integers(3, 12, 2))
+        color = (170, 60, 120) if rng.random() < 0.5 else (140, 120, 220)
+        cv2.ellipse(img, center, axes, float(rng.uniform(0, 180)), 0, 360, color, -1)
+    noise = rng.normal(0, 12, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+def load_images(args):
+    if args.images:
+        paths = sorted(
+            os.path.join(args.images, name) for name in os.listdir(args.images)
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+        )
+        images = [cv2.imread(path) for path in paths]
+        return [img for img in images if img is not None]
+    return [synthetic_micrograph(args.size, seed) for seed in range(args.count)]
+
+
+def ssim(a, b):
+    """Mean structural similarity (Gaussian window, sigma 1.5) over all channels"""
+    a = a.astype(np.float64)
+    b = b.astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def blur(x):
+        return cv2.GaussianBlur(x, (11, 11), 1.5)
+
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a * mu_a
+    var_b = blur(b * b) - mu_b * mu_b
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+
+def timed(func, img):
+    start = time.perf_counter()
+    output = func(img)
+    return output, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gram staining quality levels')
+    parser.add_argument('--images', help='Directory of images (defaults to synthetic images)')
+    parser.add_argument('--size', type=int, default=2048, help='Synthetic image size')
+    parser.add_argument('--count', type=int, default=3, help='Number of synthetic images')
+    args = parser.parse_args()
+
+    images = load_images(args)
+    if not images:
+        print("No images to benchmark")
+        return
+
+    print(f"Benchmarking {len(images)} image(s)")
+    references = []
+    legacy_time = 0.0
+    for img in images:
+        output, elapsed = timed(legacy_gram_stain, img)
+        references.append(output)
+        legacy_time += elapsed
+    legacy_time /= len(images)
+    print(f"{'legacy':<10} {legacy_time * 1000:9.1f} ms/image")
+
+    for quality in QUALITY_LEVELS:
+        engine = GramStainingEngine(quality)
+        total_time = 0.0
+        psnr, similarity = [], []
+        for img, reference in zip(images, references):
+            output, elapsed = timed(engine.stain, img)
+            total_time += elapsed
+            psnr.append(cv2.PSNR(reference, output))
+            similarity.append(ssim(reference, output))
+        mean_time = total_time / len(images)
+        print(f"{quality:<10} {mean_time * 1000:9.1f} ms/image  "
+              f"{legacy_time / mean_time:5.1f}x faster  PSNR {np.mean(psnr):.2f} dB  SSIM {np.mean(similarity):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,5 @@
 from app import create_app, db
 from models.detection import Detection
-import json
 from collections import defaultdict
 
 app = create_app()
@@ -31,15 +30,11 @@ with app.app_context():
     for d in all_detections:
         status_counts[d.status] += 1
         
-        if d.detected_organisms:
-            try:
-                orgs = json.loads(d.detected_organisms)
-                if isinstance(orgs, list):
-                    for org in orgs:
-                        org_name = org.get('class') if isinstance(org, dict) else str(org)
-                        organism_counts[org_name] += 1
-            except:
-                pass
+        orgs = d.parsed_organisms
+        if isinstance(orgs, list):
+            for org in orgs:
+                org_name = org.get('class') if isinstance(org, dict) else str(org)
+                organism_counts[org_name] += 1
     
     print("\nStatus counts:")
     for status, count in status_counts.items():
@@ -0,0 +1,104 @@
+"""
+Compare detections from the ONNX Runtime and PyTorch backends
+
+Runs both backends over a fixed, sorted set of images and matches boxes per
+class by IoU. Exits non-zero when a box is missing from either side or the
+matched boxes/scores drift beyond the tolerances.
+
+Usage:
+    python check_parity.py --images path/to/reference_images
+"""
+import argparse
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from config import Config
+from services.yolo_detection import YOLODetector, load_backend
+
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.tiff', '.bmp'}
+
+
+def box_iou(a, b):
+    inter_w = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    inter_h = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = inter_w * inter_h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def compare(reference, candidate, min_iou):
+    """
+    Greedily match candidate detections to reference detections of the same class
+
+    Returns:
+        tuple: (matched pairs as (iou, score_diff), unmatched reference, unmatched candidate)
+    """
+    pairs = []
+    unmatched = list(candidate)
+    missing = []
+    for ref in sorted(reference, key=lambda d: -d['confidence']):
+        best, best_iou = None, min_iou
+        for cand in unmatched:
+            if cand['class'] != ref['class']:
+                continue
+            iou = box_iou(ref['bbox'], cand['bbox'])
+            if iou >= best_iou:
+                best, best_iou = cand, iou
+        if best is None:
+            missing.append(ref)
+        else:
+            unmatched.remove(best)
+            pairs.append((best_iou, abs(best['confidence'] - ref['confidence'])))
+    return pairs, missing, unmatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check ONNX/PyTorch detector parity')
+    parser.add_argument('--images', required=True, help='Directory of reference images')
+    parser.add_argument('--min-iou', type=float, default=0.9, help='Minimum IoU for a matched box')
+    parser.add_argument('--max-score-diff', type=float, default=0.02, help='Maximum confidence difference')
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.images, name) for name in os.listdir(args.images)
+        if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {args.images}")
+
+    torch_detector = YOLODetector(load_backend(Config, backend='torch'))
+    onnx_detector = YOLODetector(load_backend(Config, backend='onnx'))
+
+    failures = 0
+    all_pairs = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"⚠️  Skipping unreadable image {path}")
+            continue
+
+        pairs, missing, extra = compare(torch_detector.detect(image), onnx_detector.detect(image), args.min_iou)
+        all_pairs.extend(pairs)
+        bad_scores = [diff for _, diff in pairs if diff > args.max_score_diff]
+        ok = not missing and not extra and not bad_scores
+        failures += 0 if ok else 1
+
+        print(f"{'✅' if ok else '❌'} {os.path.basename(path)}: {len(pairs)} matched, "
+              f"{len(missing)} missing from ONNX, {len(extra)} extra in ONNX, "
+              f"{len(bad_scores)} score drift(s)")
+
+    if all_pairs:
+        ious = np.array([iou for iou, _ in all_pairs])
+        diffs = np.array([diff for _, diff in all_pairs])
+        print(f"\nMatched boxes: {len(all_pairs)} | min IoU {ious.min():.4f} | "
+              f"max score diff {diffs.max():.4f} | mean score diff {diffs.mean():.4f}")
+
+    print(f"\n{len(paths) - failures}/{len(paths)} images in parity")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Delete resumable uploads that were abandoned part way
+
+Uploads that have not received a chunk for RESUMABLE_UPLOAD_EXPIRY_HOURS
+are removed together with their partial files. Run it from cron.
+
+Usage:
+    python cleanup_uploads.py [--hours N]
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from app import create_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=int, default=None,
+                        help='Age in hours after which an unfinished upload expires (default: RESUMABLE_UPLOAD_EXPIRY_HOURS)')
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        from models.resumable_upload import ResumableUpload
+
+        hours = args.hours if args.hours is not None else app.config['RESUMABLE_UPLOAD_EXPIRY_HOURS']
+        try:
+            removed = ResumableUpload.expire(app.config['UPLOAD_FOLDER'], datetime.utcnow() - timedelta(hours=hours))
+            print(f"✅ Removed {removed} abandoned upload(s) older than {hours}h")
+        except Exception as e:
+            print(f"❌ Error removing abandoned uploads: {str(e)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
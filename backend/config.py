@@ -15,11 +15,34 @@ class Config:
     # Database Configuration
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///microorganism_detection.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ECHO = os.environ.get('FLASK_ENV') == 'development'
+    # Logs every statement; opt-in, since it is far too chatty for a serving process
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', 'false').lower() in ['true', '1', 't', 'yes']
+
+    # Connection pool (see utils/database.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # seconds, server databases only
+
+    # SQLite tuning pragmas, applied to every new connection
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
     
     # File Upload Configuration
     UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER') or 'uploads'
     MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB
+    # Batch uploads (POST /api/uploads/batch): whole request, files per batch, and each file or archive member
+    BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))  # 512MB
+    BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 1000))
+    BATCH_MAX_FILE_SIZE = int(os.environ.get('BATCH_MAX_FILE_SIZE', MAX_CONTENT_LENGTH))
+    # Resumable chunked uploads (/api/uploads) for images too large for one request
+    RESUMABLE_UPLOAD_MAX_SIZE = int(os.environ.get('RESUMABLE_UPLOAD_MAX_SIZE', 4 * 1024 * 1024 * 1024))  # 4GB
+    UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))  # suggested to clients
+    UPLOAD_CHUNK_MAX_SIZE = int(os.environ.get('UPLOAD_CHUNK_MAX_SIZE', 64 * 1024 * 1024))
+    RESUMABLE_UPLOAD_EXPIRY_HOURS = int(os.environ.get('RESUMABLE_UPLOAD_EXPIRY_HOURS', 24))
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'tiff', 'bmp'}
     
     # JWT Configuration
@@ -30,6 +53,31 @@ class Config:
     MODEL_PATH = os.environ.get('MODEL_PATH') or 'models/microorganism_yolov7_best.pt'
     CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.5))
     IOU_THRESHOLD = float(os.environ.get('IOU_THRESHOLD', 0.45))
+    MODEL_IMG_SIZE = int(os.environ.get('MODEL_IMG_SIZE', 640))
+    DETECTOR_POOL_SIZE = int(os.environ.get('DETECTOR_POOL_SIZE', 0))  # 0 = one session per CPU core
+    # Identifies the model for result reuse; derived from the weights file when unset
+    MODEL_VERSION = os.environ.get('MODEL_VERSION')
+
+    # Inference Backend Configuration
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'auto')  # 'auto', 'onnx' or 'torch'
+    ONNX_MODEL_PATH = os.environ.get('ONNX_MODEL_PATH') or str(Path(MODEL_PATH).with_suffix('.onnx'))
+    ONNX_INTRA_OP_THREADS = int(os.environ.get('ONNX_INTRA_OP_THREADS', 0))  # 0 = cores / pool size
+    ONNX_INTER_OP_THREADS = int(os.environ.get('ONNX_INTER_OP_THREADS', 1))
+    ONNX_PROVIDERS = os.environ.get('ONNX_PROVIDERS', 'CPUExecutionProvider').split(',')
+
+    # Micro-batching of concurrent inference requests (batch size 1 disables it)
+    INFERENCE_BATCH_SIZE = int(os.environ.get('INFERENCE_BATCH_SIZE', 8))
+    INFERENCE_BATCH_WAIT_MS = float(os.environ.get('INFERENCE_BATCH_WAIT_MS', 20))
+
+    # Tiled inference for high-resolution images (default for uploads that don't set 'tiled')
+    TILED_INFERENCE = os.environ.get('TILED_INFERENCE', 'false').lower() in ['true', '1', 't']
+    TILE_SIZE = int(os.environ.get('TILE_SIZE', 640))
+    TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', 0.2))
+
+    # Digital gram staining: preset used by the detection pipeline (standard, enhanced, overlay)
+    # and denoiser quality for presets that denoise: fast, balanced or high
+    GRAM_STAIN_PRESET = os.environ.get('GRAM_STAIN_PRESET', 'standard')
+    GRAM_STAIN_QUALITY = os.environ.get('GRAM_STAIN_QUALITY', 'balanced')
     
     # Roboflow Configuration
     ROBOFLOW_API_KEY = os.environ.get('ROBOFLOW_API_KEY')
@@ -56,8 +104,29 @@ class Config:
     PROCESSED_DIR = BASE_DIR / 'processed'
     MODELS_DIR = BASE_DIR / 'models'
     LOGS_DIR = BASE_DIR / 'logs'
-    
-    
+
+    # Compression of JSON responses (brotli when installed and accepted, else gzip)
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # bytes
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+
+    # Response caching: completed detections (LRU + TTL) and the statistics summary
+    DETECTION_CACHE_SIZE = int(os.environ.get('DETECTION_CACHE_SIZE', 1024))
+    DETECTION_CACHE_TTL = int(os.environ.get('DETECTION_CACHE_TTL', 600))  # seconds
+    DETECTION_CACHE_MAX_AGE = int(os.environ.get('DETECTION_CACHE_MAX_AGE', 60))  # browser max-age, seconds
+    STATISTICS_CACHE_TTL = float(os.environ.get('STATISTICS_CACHE_TTL', 5))  # seconds
+
+    # Detection Job Queue Configuration
+    JOB_QUEUE_BACKEND = os.environ.get('JOB_QUEUE_BACKEND', 'sqlite')  # 'sqlite' or 'redis'
+    JOB_QUEUE_PATH = os.environ.get('JOB_QUEUE_PATH') or str(BASE_DIR / 'job_queue.db')
+    JOB_QUEUE_NAME = os.environ.get('JOB_QUEUE_NAME', 'detections')
+    REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    DETECTION_WORKERS = int(os.environ.get('DETECTION_WORKERS', 2))
+    DETECTION_WORKER_THREADS = int(os.environ.get('DETECTION_WORKER_THREADS', 4))
+    JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+    JOB_VISIBILITY_TIMEOUT = int(os.environ.get('JOB_VISIBILITY_TIMEOUT', 600))  # seconds
+
+
     # CORS Configuration
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
@@ -73,6 +142,24 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME', 'gauthamkrishnar6@gmail.com')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD', 'ovxr ptwu hslt fawi')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER', 'gauthamkrishnar6@gmail.com')
+    MAIL_TIMEOUT = int(os.environ.get('MAIL_TIMEOUT', 30))  # seconds
+
+    # Email outbox: sender threads (one pooled SMTP connection each) per detection worker process
+    MAIL_SENDER_THREADS = int(os.environ.get('MAIL_SENDER_THREADS', 1))
+    MAIL_BATCH_SIZE = int(os.environ.get('MAIL_BATCH_SIZE', 20))
+    MAIL_POLL_INTERVAL = float(os.environ.get('MAIL_POLL_INTERVAL', 2))  # seconds
+    MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))
+    MAIL_RETRY_BASE_DELAY = int(os.environ.get('MAIL_RETRY_BASE_DELAY', 30))  # seconds, doubled per attempt
+    MAIL_RETRY_MAX_DELAY = int(os.environ.get('MAIL_RETRY_MAX_DELAY', 3600))  # seconds
+    MAIL_VISIBILITY_TIMEOUT = int(os.environ.get('MAIL_VISIBILITY_TIMEOUT', 300))  # seconds
+    MAIL_IDLE_TIMEOUT = int(os.environ.get('MAIL_IDLE_TIMEOUT', 60))  # close pooled connections idle this long
+    MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.environ.get('MAIL_MAX_MESSAGES_PER_CONNECTION', 100))
+    DIGEST_CHECK_INTERVAL = int(os.environ.get('DIGEST_CHECK_INTERVAL', 60))  # seconds between digest passes
+
+    # Result images are attached as downscaled previews cached next to the image
+    EMAIL_PREVIEW_MAX_SIDE = int(os.environ.get('EMAIL_PREVIEW_MAX_SIDE', 1280))  # pixels
+    EMAIL_PREVIEW_FORMAT = os.environ.get('EMAIL_PREVIEW_FORMAT', 'jpeg')  # 'jpeg' or 'webp'
+    EMAIL_PREVIEW_QUALITY = int(os.environ.get('EMAIL_PREVIEW_QUALITY', 80))
     
     # Create directories if they don't exist
     def __init__(self):
@@ -108,7 +195,6 @@ class Config:
 class DevelopmentConfig(Config):
     """Development configuration"""
     DEBUG = True
-    SQLALCHEMY_ECHO = True
 
 class ProductionConfig(Config):
     """Production configuration"""
@@ -122,7 +208,9 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ECHO = False
+    # In-memory SQLite unless pointed at a scratch server database
+    SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
 
 # Configuration dictionary
@@ -130,5 +218,5 @@ config = {
     'development': DevelopmentConfig,
     'production': ProductionConfig,
     'testing': TestingConfig,
-    'default': DevelopmentConfig
+    'default': Config
 }
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Export the PyTorch detector to an ONNX graph for the ONNX Runtime backend
+
+Usage:
+    python export_model.py
+    python export_model.py --weights models/best.pt --output models/best.onnx --opset 12
+"""
+import argparse
+import os
+import shutil
+
+from config import Config
+
+
+def export_onnx(weights, output, img_size=640, opset=12, simplify=True):
+    """
+    Export ``weights`` to ONNX with a dynamic batch dimension
+
+    Returns:
+        str: Path of the exported graph
+    """
+    from ultralytics import YOLO
+
+    model = YOLO(weights)
+    exported = model.export(
+        format='onnx',
+        imgsz=img_size,
+        opset=opset,
+        simplify=simplify,
+        dynamic=True,
+        device='cpu'
+    )
+
+    if os.path.abspath(exported) != os.path.abspath(output):
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        shutil.move(exported, output)
+    return output
+
+
+def verify_onnx(path):
+    """Check the exported graph is well formed and loads in ONNX Runtime"""
+    import onnx
+    import onnxruntime as ort
+
+    onnx.checker.check_model(onnx.load(path))
+    session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+    inputs = session.get_inputs()[0]
+    print(f"Input: {inputs.name} {inputs.shape}")
+    print(f"Outputs: {[(o.name, o.shape) for o in session.get_outputs()]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the detector to ONNX')
+    parser.add_argument('--weights', default=Config.MODEL_PATH, help='PyTorch weights to export')
+    parser.add_argument('--output', default=Config.ONNX_MODEL_PATH, help='Where to write the ONNX graph')
+    parser.add_argument('--img-size', type=int, default=Config.MODEL_IMG_SIZE)
+    parser.add_argument('--opset', type=int, default=12)
+    parser.add_argument('--no-simplify', action='store_true', help='Skip onnx-simplifier')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.weights):
+        raise SystemExit(f"Weights not found: {args.weights}")
+
+    print(f"Exporting {args.weights} -> {args.output}")
+    path = export_onnx(args.weights, args.output, args.img_size, args.opset, simplify=not args.no_simplify)
+    verify_onnx(path)
+    print("✅ Export complete. Run check_parity.py to compare it against the PyTorch model.")
+
+
+if __name__ == '__main__':
+    main()
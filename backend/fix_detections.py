@@ -1,7 +1,7 @@
 # backend/fix_detections.py
 from app import create_app, db
 from models.detection import Detection
-import json
+from utils import json_codec
 
 app = create_app()
 
@@ -11,7 +11,7 @@ with app.app_context():
         if detection.detected_organisms:
             try:
                 # Try to parse the data
-                data = json.loads(detection.detected_organisms)
+                data = json_codec.loads(detection.detected_organisms)
                 # If it's already valid, skip
                 if isinstance(data, (list, dict)):
                     continue
@@ -0,0 +1,197 @@
+"""Normalized detection_organisms rows, backfilled from detected_organisms JSON
+
+Revision ID: 0001_detection_organisms
+Revises: 
+Create Date: 2026-10-17 00:00:00
+
+"""
+from datetime import datetime
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_detection_organisms'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+GRAM_TYPES = ('positive', 'negative', 'variable')
+
+detection = sa.table(
+    'detection',
+    sa.column('id', sa.Integer),
+    sa.column('detected_organisms', sa.Text),
+)
+organisms = sa.table(
+    'organisms',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+    sa.column('scientific_name', sa.String),
+    sa.column('gram_type', sa.String),
+    sa.column('description', sa.Text),
+    sa.column('created_at', sa.DateTime),
+)
+detection_organisms = sa.table(
+    'detection_organisms',
+    sa.column('detection_id', sa.Integer),
+    sa.column('organism_id', sa.Integer),
+    sa.column('confidence', sa.Float),
+    sa.column('bbox_x1', sa.Integer),
+    sa.column('bbox_y1', sa.Integer),
+    sa.column('bbox_x2', sa.Integer),
+    sa.column('bbox_y2', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+)
+
+
+def _create_tables(inspector):
+    tables = inspector.get_table_names()
+    if 'organisms' not in tables:
+        op.create_table(
+            'organisms',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('name', sa.String(100), nullable=False, unique=True),
+            sa.Column('scientific_name', sa.String(200)),
+            sa.Column('gram_type', sa.String(20)),
+            sa.Column('shape', sa.String(20)),
+            sa.Column('pathogenicity', sa.String(20)),
+            sa.Column('description', sa.Text),
+            sa.Column('treatment_notes', sa.Text),
+            sa.Column('created_at', sa.DateTime),
+        )
+    if 'detection_organisms' not in tables:
+        op.create_table(
+            'detection_organisms',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('detection_id', sa.Integer, sa.ForeignKey('detection.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('organism_id', sa.Integer, sa.ForeignKey('organisms.id', ondelete='CASCADE'), nullable=False),
+            sa.Column('confidence', sa.Float, nullable=False),
+            sa.Column('bbox_x1', sa.Integer),
+            sa.Column('bbox_y1', sa.Integer),
+            sa.Column('bbox_x2', sa.Integer),
+            sa.Column('bbox_y2', sa.Integer),
+            sa.Column('created_at', sa.DateTime),
+        )
+        op.create_index('ix_detection_organisms_detection_id', 'detection_organisms', ['detection_id'])
+
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('detection_organisms')}
+    if 'idx_detection_organisms_organism_detection' not in indexes:
+        op.create_index('idx_detection_organisms_organism_detection', 'detection_organisms',
+                        ['organism_id', 'detection_id'])
+
+
+def _parse(raw):
+    try:
+        data = json.loads(raw) if isinstance(raw, str) else raw
+    except (TypeError, ValueError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def _key(record):
+    if isinstance(record, dict):
+        return record.get('class') or record.get('name')
+    return str(record) if record else None
+
+
+def _organism_ids(bind, records, cache):
+    """Resolve (and create) organisms for a batch, remembering ids across batches"""
+    missing = {}
+    for record in records:
+        name = _key(record)
+        if name and name not in cache and name not in missing:
+            missing[name] = record if isinstance(record, dict) else {}
+    if not missing:
+        return
+
+    existing = bind.execute(
+        sa.select(organisms.c.name, organisms.c.id).where(organisms.c.name.in_(list(missing)))
+    ).fetchall()
+    cache.update((name, organism_id) for name, organism_id in existing)
+
+    new_rows = [
+        {
+            'name': name,
+            'scientific_name': record.get('scientific_name'),
+            'gram_type': record.get('gram_type') if record.get('gram_type') in GRAM_TYPES else None,
+            'description': record.get('description'),
+            'created_at': datetime.utcnow(),
+        }
+        for name, record in missing.items() if name not in cache
+    ]
+    if new_rows:
+        bind.execute(organisms.insert(), new_rows)
+        created = bind.execute(
+            sa.select(organisms.c.name, organisms.c.id)
+            .where(organisms.c.name.in_([row['name'] for row in new_rows]))
+        ).fetchall()
+        cache.update((name, organism_id) for name, organism_id in created)
+
+
+def _backfill(bind):
+    """Walk detections in id order, BATCH_SIZE at a time, inserting rows for any not yet normalized"""
+    already_done = sa.select(detection_organisms.c.detection_id)
+    organism_ids = {}
+    last_id = None
+    total = 0
+
+    while True:
+        query = (
+            sa.select(detection.c.id, detection.c.detected_organisms)
+            .where(detection.c.detected_organisms.isnot(None))
+            .where(detection.c.id.notin_(already_done))
+            .order_by(detection.c.id)
+            .limit(BATCH_SIZE)
+        )
+        if last_id is not None:
+            query = query.where(detection.c.id > last_id)
+        batch = bind.execute(query).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1][0]
+
+        parsed = [(detection_id, _parse(raw)) for detection_id, raw in batch]
+        _organism_ids(bind, [record for _, records in parsed for record in records], organism_ids)
+
+        rows = []
+        now = datetime.utcnow()
+        for detection_id, records in parsed:
+            for record in records:
+                name = _key(record)
+                if not name:
+                    continue
+                record = record if isinstance(record, dict) else {}
+                bbox = record.get('bbox') or [None] * 4
+                if isinstance(bbox, dict):
+                    bbox = [bbox.get('x1'), bbox.get('y1'), bbox.get('x2'), bbox.get('y2')]
+                rows.append({
+                    'detection_id': detection_id,
+                    'organism_id': organism_ids[name],
+                    'confidence': float(record.get('confidence') or 0),
+                    'bbox_x1': bbox[0],
+                    'bbox_y1': bbox[1],
+                    'bbox_x2': bbox[2],
+                    'bbox_y2': bbox[3],
+                    'created_at': now,
+                })
+        if rows:
+            bind.execute(detection_organisms.insert(), rows)
+        total += len(rows)
+
+    print(f"Backfilled {total} detection_organisms rows")
+
+
+def upgrade():
+    bind = op.get_bind()
+    _create_tables(sa.inspect(bind))
+    _backfill(bind)
+
+
+def downgrade():
+    op.drop_index('idx_detection_organisms_organism_detection', table_name='detection_organisms')
+    op.drop_table('detection_organisms')
+    op.drop_table('organisms')
@@ -0,0 +1,52 @@
+"""Statistics rollup tables maintained by the application
+
+Revision ID: 0002_statistics_rollups
+Revises: 0001_detection_organisms
+Create Date: 2026-10-17 00:00:00
+
+Populate them afterwards with ``python rebuild_stats.py``.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_statistics_rollups'
+down_revision = '0001_detection_organisms'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+
+    if 'system_stats' not in tables:
+        op.create_table(
+            'system_stats',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('date', sa.Date, nullable=False, unique=True),
+            sa.Column('total_detections', sa.Integer, nullable=False, server_default='0'),
+            sa.Column('successful_detections', sa.Integer, nullable=False, server_default='0'),
+            sa.Column('failed_detections', sa.Integer, nullable=False, server_default='0'),
+            sa.Column('average_processing_time', sa.Float),
+            sa.Column('most_detected_organism', sa.Text),
+            sa.Column('created_at', sa.DateTime),
+        )
+
+    if 'organism_stats' not in tables:
+        op.create_table(
+            'organism_stats',
+            sa.Column('organism_id', sa.Integer, sa.ForeignKey('organisms.id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('detection_count', sa.Integer, nullable=False, server_default='0'),
+        )
+
+    # Databases initialised from database/schema.sql carry triggers that would double count
+    if bind.dialect.name == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS update_stats_on_detection_insert')
+        op.execute('DROP TRIGGER IF EXISTS update_stats_on_detection_update')
+
+
+def downgrade():
+    op.drop_table('organism_stats')
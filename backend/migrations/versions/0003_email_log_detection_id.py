@@ -0,0 +1,46 @@
+"""Integer email_log.detection_id and a (detection_id, sent_at) index
+
+Revision ID: 0003_email_log_detection_id
+Revises: 0002_statistics_rollups
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_email_log_detection_id'
+down_revision = '0002_statistics_rollups'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_email_log_detection_id_sent_at'
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    # Ids were stored stringified; anything that isn't a number can't point at a detection
+    if bind.dialect.name == 'postgresql':
+        op.execute("UPDATE email_log SET detection_id = NULL WHERE detection_id !~ '^[0-9]+$'")
+    else:
+        op.execute("UPDATE email_log SET detection_id = NULL WHERE detection_id = '' OR detection_id GLOB '*[^0-9]*'")
+
+    indexes = {index['name'] for index in sa.inspect(bind).get_indexes('email_log')}
+    with op.batch_alter_table('email_log') as batch_op:
+        if INDEX_NAME in indexes:
+            batch_op.drop_index(INDEX_NAME)
+        batch_op.alter_column(
+            'detection_id',
+            existing_type=sa.String(),
+            type_=sa.Integer(),
+            postgresql_using='detection_id::integer'
+        )
+        batch_op.create_index(INDEX_NAME, ['detection_id', 'sent_at'])
+
+
+def downgrade():
+    with op.batch_alter_table('email_log') as batch_op:
+        batch_op.drop_index(INDEX_NAME)
+        batch_op.alter_column('detection_id', existing_type=sa.Integer(), type_=sa.String(50))
@@ -0,0 +1,28 @@
+"""Composite (timestamp, id) index for keyset pagination of detections
+
+Revision ID: 0004_detection_timestamp_id
+Revises: 0003_email_log_detection_id
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004_detection_timestamp_id'
+down_revision = '0003_email_log_detection_id'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_detection_timestamp_id'
+
+
+def upgrade():
+    indexes = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('detection')}
+    if INDEX_NAME not in indexes:
+        op.create_index(INDEX_NAME, 'detection', ['timestamp', 'id'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='detection')
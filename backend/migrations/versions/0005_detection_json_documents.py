@@ -0,0 +1,121 @@
+"""Compact detection JSON documents, drop the nested organism copy, JSONB on PostgreSQL
+
+Revision ID: 0005_detection_json_documents
+Revises: 0004_detection_timestamp_id
+Create Date: 2026-10-17 00:00:00
+
+"""
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '0005_detection_json_documents'
+down_revision = '0004_detection_timestamp_id'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+JSON_COLUMNS = ('detection_results', 'detected_organisms', 'water_usage_recommendations')
+
+detection = sa.table(
+    'detection',
+    sa.column('id', sa.Integer),
+    *(sa.column(name, sa.Text) for name in JSON_COLUMNS),
+)
+
+
+def _parse(raw):
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def _dump(value):
+    return None if value is None else json.dumps(value, separators=(',', ':'))
+
+
+def _flatten(row):
+    """
+    Stored form after this revision: organisms only in detected_organisms, compact JSON
+
+    Unparseable documents can't become JSONB: organisms reset to [] (as
+    fix_detections.py does), the other columns to NULL.
+    """
+    results = _parse(row.detection_results)
+    organisms = _parse(row.detected_organisms)
+    if isinstance(results, dict) and 'organisms' in results:
+        nested = results.pop('organisms')
+        if organisms is None:
+            organisms = nested
+    if organisms is None and row.detected_organisms:
+        organisms = []
+    return {
+        'detection_results': _dump(results),
+        'detected_organisms': _dump(organisms),
+        'water_usage_recommendations': _dump(_parse(row.water_usage_recommendations)),
+    }
+
+
+def _nest(row):
+    """Stored form before this revision: organisms repeated inside detection_results"""
+    results = _parse(row.detection_results)
+    if isinstance(results, dict):
+        results['organisms'] = _parse(row.detected_organisms) or []
+        return {'detection_results': json.dumps(results)}
+    return {'detection_results': row.detection_results}
+
+
+def _rewrite(bind, transform):
+    """Walk detections in id order, BATCH_SIZE at a time, updating rows whose documents change"""
+    last_id = 0
+    changed = 0
+    while True:
+        batch = bind.execute(
+            sa.select(detection)
+            .where(detection.c.id > last_id)
+            .order_by(detection.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        updates = []
+        for row in batch:
+            values = transform(row)
+            if any(values[name] != getattr(row, name) for name in values):
+                updates.append(dict(values, row_id=row.id))
+        if updates:
+            columns = [name for name in JSON_COLUMNS if name in updates[0]]
+            bind.execute(
+                detection.update()
+                .where(detection.c.id == sa.bindparam('row_id'))
+                .values({name: sa.bindparam(name) for name in columns}),
+                updates
+            )
+        changed += len(updates)
+    print(f"Rewrote JSON documents of {changed} detections")
+
+
+def upgrade():
+    bind = op.get_bind()
+    _rewrite(bind, _flatten)
+    if bind.dialect.name == 'postgresql':
+        for name in JSON_COLUMNS:
+            op.alter_column('detection', name, type_=postgresql.JSONB(),
+                            postgresql_using=f'{name}::jsonb')
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for name in JSON_COLUMNS:
+            op.alter_column('detection', name, type_=sa.Text(), postgresql_using=f'{name}::text')
+    _rewrite(bind, _nest)
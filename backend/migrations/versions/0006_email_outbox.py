@@ -0,0 +1,48 @@
+"""email_outbox table for emails sent by the background sender
+
+Revision ID: 0006_email_outbox
+Revises: 0005_detection_json_documents
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006_email_outbox'
+down_revision = '0005_detection_json_documents'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all may already have made it
+    if 'email_outbox' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('recipient', sa.String(200), nullable=False),
+        sa.Column('subject', sa.String(255), nullable=False),
+        sa.Column('html_body', sa.Text, nullable=False),
+        sa.Column('attachments', sa.Text),
+        sa.Column('detection_id', sa.Integer, sa.ForeignKey('detection.id', ondelete='SET NULL')),
+        sa.Column('email_log_id', sa.Integer, sa.ForeignKey('email_log.id', ondelete='SET NULL')),
+        sa.Column('status', sa.String(20), nullable=False, server_default='pending'),
+        sa.Column('attempts', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime, nullable=False),
+        sa.Column('claimed_at', sa.DateTime),
+        sa.Column('last_error', sa.Text),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('sent_at', sa.DateTime),
+    )
+    op.create_index('ix_email_outbox_status_next_attempt_at', 'email_outbox', ['status', 'next_attempt_at'])
+    op.create_index('ix_email_outbox_detection_id', 'email_outbox', ['detection_id'])
+
+
+def downgrade():
+    op.drop_index('ix_email_outbox_detection_id', table_name='email_outbox')
+    op.drop_index('ix_email_outbox_status_next_attempt_at', table_name='email_outbox')
+    op.drop_table('email_outbox')
@@ -0,0 +1,46 @@
+"""email_preferences table, email_outbox.email_log_ids and an email_log (status, recipient) index
+
+Revision ID: 0007_email_digests
+Revises: 0006_email_outbox
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007_email_digests'
+down_revision = '0006_email_outbox'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_email_log_status_recipient'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'email_preferences' not in inspector.get_table_names():
+        op.create_table(
+            'email_preferences',
+            sa.Column('id', sa.Integer, primary_key=True),
+            sa.Column('recipient', sa.String(200), nullable=False, unique=True),
+            sa.Column('mode', sa.String(20), nullable=False, server_default='immediate'),
+            sa.Column('last_digest_at', sa.DateTime),
+            sa.Column('updated_at', sa.DateTime),
+        )
+
+    if 'email_log_ids' not in {column['name'] for column in inspector.get_columns('email_outbox')}:
+        with op.batch_alter_table('email_outbox') as batch_op:
+            batch_op.add_column(sa.Column('email_log_ids', sa.Text))
+
+    if INDEX_NAME not in {index['name'] for index in inspector.get_indexes('email_log')}:
+        op.create_index(INDEX_NAME, 'email_log', ['status', 'recipient'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='email_log')
+    with op.batch_alter_table('email_outbox') as batch_op:
+        batch_op.drop_column('email_log_ids')
+    op.drop_table('email_preferences')
@@ -0,0 +1,51 @@
+"""upload_batches and upload_batch_items tables for batch uploads
+
+Revision ID: 0008_upload_batches
+Revises: 0007_email_digests
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008_upload_batches'
+down_revision = '0007_email_digests'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # create_all may already have made them
+    if 'upload_batches' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'upload_batches',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('name', sa.String(100)),
+        sa.Column('email', sa.String(200)),
+        sa.Column('tiled', sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.Column('total', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('skipped', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime),
+    )
+    op.create_table(
+        'upload_batch_items',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('batch_id', sa.String(32), sa.ForeignKey('upload_batches.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('detection_id', sa.Integer, sa.ForeignKey('detection.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('position', sa.Integer, nullable=False),
+        sa.Column('filename', sa.String(255)),
+        sa.Column('content_hash', sa.String(64)),
+    )
+    op.create_index('ix_upload_batch_items_batch_id', 'upload_batch_items', ['batch_id'])
+    op.create_index('ix_upload_batch_items_detection_id', 'upload_batch_items', ['detection_id'])
+
+
+def downgrade():
+    op.drop_index('ix_upload_batch_items_detection_id', table_name='upload_batch_items')
+    op.drop_index('ix_upload_batch_items_batch_id', table_name='upload_batch_items')
+    op.drop_table('upload_batch_items')
+    op.drop_table('upload_batches')
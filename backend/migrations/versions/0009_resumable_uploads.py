@@ -0,0 +1,48 @@
+"""resumable_uploads table for chunked uploads
+
+Revision ID: 0009_resumable_uploads
+Revises: 0008_upload_batches
+Create Date: 2026-10-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009_resumable_uploads'
+down_revision = '0008_upload_batches'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'ix_resumable_uploads_status_updated_at'
+
+
+def upgrade():
+    # create_all may already have made it
+    if 'resumable_uploads' in sa.inspect(op.get_bind()).get_table_names():
+        return
+
+    op.create_table(
+        'resumable_uploads',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('filename', sa.String(255), nullable=False),
+        sa.Column('size', sa.BigInteger, nullable=False),
+        sa.Column('received', sa.BigInteger, nullable=False, server_default='0'),
+        sa.Column('expected_sha256', sa.String(64)),
+        sa.Column('content_hash', sa.String(64)),
+        sa.Column('name', sa.String(100)),
+        sa.Column('email', sa.String(200)),
+        sa.Column('tiled', sa.Boolean, nullable=False, server_default=sa.false()),
+        sa.Column('status', sa.String(20), nullable=False, server_default='uploading'),
+        sa.Column('error_message', sa.Text),
+        sa.Column('detection_id', sa.Integer, sa.ForeignKey('detection.id', ondelete='SET NULL')),
+        sa.Column('created_at', sa.DateTime),
+        sa.Column('updated_at', sa.DateTime),
+    )
+    op.create_index(INDEX_NAME, 'resumable_uploads', ['status', 'updated_at'])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name='resumable_uploads')
+    op.drop_table('resumable_uploads')
@@ -0,0 +1,36 @@
+"""
+Database models
+
+``db`` is the app's Flask-SQLAlchemy instance; app.py binds it in
+``create_app``. ``Detection`` and ``EmailLog`` are importable from here;
+the other models live in their own modules under ``models``.
+"""
+from datetime import datetime
+
+from flask_sqlalchemy import SQLAlchemy
+
+db = SQLAlchemy()
+
+
+class EmailLog(db.Model):
+    """One email about a detection: queued, sent, failed or held for a digest"""
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(200), nullable=False)
+    detection_id = db.Column(db.Integer)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # queued, sent, failed or digest_pending
+    status = db.Column(db.String(20), nullable=False)
+    result_summary = db.Column(db.Text)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'recipient': self.recipient,
+            'detection_id': self.detection_id,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'status': self.status,
+            'result_summary': self.result_summary
+        }
+
+
+from models.detection import Detection  # noqa: E402,F401 - re-exported
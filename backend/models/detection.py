@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from models import db
+from models.detection_json import JSONDocument, JSONText
+
+
+class Detection(db.Model):
+    """
+    One uploaded image and its detection results
+
+    ``status`` moves pending -> processing -> completed or failed. The JSON
+    document columns are read and written as text; ``parsed_*`` decode them
+    (``detected_organisms`` is a list of organism dicts, the other two dicts).
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    original_image_path = db.Column(db.String(500), nullable=False)
+    processed_image_path = db.Column(db.String(500))
+    detection_results = db.Column(JSONText)
+    detected_organisms = db.Column(JSONText)
+    water_usage_recommendations = db.Column(JSONText)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    # active_history: the statistics hook needs the old status even when the row was expired
+    status = db.column_property(db.Column(db.String(20), nullable=False, default='pending'), active_history=True)
+    error_message = db.Column(db.Text)
+    name = db.Column(db.String(100))
+    email = db.Column(db.String(200))
+
+    parsed_results = JSONDocument('detection_results', dict)
+    parsed_organisms = JSONDocument('detected_organisms', list)
+    parsed_recommendations = JSONDocument('water_usage_recommendations', dict)
+
+    def to_dict(self):
+        organisms = self.parsed_organisms
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'status': self.status,
+            'error_message': self.error_message,
+            'original_image_path': self.original_image_path,
+            'processed_image_path': self.processed_image_path,
+            'detected_organisms': organisms,
+            'organisms': organisms,  # alias for frontend
+            'detections': organisms,  # read by the results email template
+            'organism_count': len(organisms),
+            'recommendations': self.parsed_recommendations,
+            'name': self.name,
+            'email': self.email
+        }
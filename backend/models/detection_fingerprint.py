@@ -0,0 +1,99 @@
+from datetime import datetime
+
+from models import db
+
+
+class DetectionFingerprint(db.Model):
+    """
+    Points an (image content, model, staining) combination at the detection holding its results
+
+    Re-submitting the same image under the same model version, staining
+    and inference mode reuses that detection's results instead of running
+    staining and detection again. ``stain_preset`` holds
+    ``services.gram_staining.stain_version``: the preset, plus ``:quality``
+    for presets whose output depends on it.
+    """
+    __tablename__ = 'detection_fingerprints'
+    __table_args__ = (
+        db.UniqueConstraint('content_hash', 'model_version', 'stain_preset', 'tiled',
+                            name='uq_detection_fingerprint'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    model_version = db.Column(db.String(128), nullable=False)
+    stain_preset = db.Column(db.String(32), nullable=False)
+    tiled = db.Column(db.Boolean, nullable=False, default=False)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def find_source(cls, content_hash, model_version, stain_preset, tiled):
+        """Completed detection whose results can be reused, or None"""
+        from models.detection import Detection
+
+        return (
+            Detection.query
+            .join(cls, cls.detection_id == Detection.id)
+            .filter(
+                cls.content_hash == content_hash,
+                cls.model_version == model_version,
+                cls.stain_preset == stain_preset,
+                cls.tiled == bool(tiled),
+                Detection.status == 'completed',
+            )
+            .first()
+        )
+
+    @classmethod
+    def find_sources(cls, content_hashes, model_version, stain_preset, tiled):
+        """``find_source`` for many hashes in one query; returns hash -> Detection"""
+        from models.detection import Detection
+
+        if not content_hashes:
+            return {}
+        rows = (
+            db.session.query(cls.content_hash, Detection)
+            .join(Detection, cls.detection_id == Detection.id)
+            .filter(
+                cls.content_hash.in_(list(set(content_hashes))),
+                cls.model_version == model_version,
+                cls.stain_preset == stain_preset,
+                cls.tiled == bool(tiled),
+                Detection.status == 'completed',
+            )
+            .all()
+        )
+        return dict(rows)
+
+    @classmethod
+    def record(cls, content_hash, model_version, stain_preset, tiled, detection_id):
+        """Point the fingerprint at ``detection_id`` (adds to the session, caller commits)"""
+        fingerprint = cls.query.filter_by(
+            content_hash=content_hash,
+            model_version=model_version,
+            stain_preset=stain_preset,
+            tiled=bool(tiled),
+        ).first()
+        if fingerprint is None:
+            fingerprint = cls(
+                content_hash=content_hash,
+                model_version=model_version,
+                stain_preset=stain_preset,
+                tiled=bool(tiled),
+            )
+            db.session.add(fingerprint)
+        fingerprint.detection_id = detection_id
+        return fingerprint
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'content_hash': self.content_hash,
+            'model_version': self.model_version,
+            'stain_preset': self.stain_preset,
+            'tiled': self.tiled,
+            'detection_id': self.detection_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
@@ -0,0 +1,76 @@
+"""
+JSON document columns of ``detection`` (used by models/detection.py)
+
+``detection_results``, ``detected_organisms`` and ``water_usage_recommendations``
+use ``JSONText``: JSONB on PostgreSQL, TEXT elsewhere, exchanged with Python
+as JSON text either way so existing readers of the raw attributes keep
+working. Decoding goes through ``parsed_results``, ``parsed_organisms`` and
+``parsed_recommendations`` (``JSONDocument``), which decode on first access
+and cache the value on the instance until the raw column changes.
+
+``detection_results`` no longer repeats the organism list; ``detected_organisms``
+is the single copy. Existing rows are rewritten by migration 0005.
+"""
+from sqlalchemy import Text, cast
+from sqlalchemy.types import TypeDecorator, UserDefinedType
+
+from utils import json_codec
+
+
+class _JSONB(UserDefinedType):
+    """JSONB that passes JSON text through untouched (psycopg2 casts text literals on write)"""
+    cache_ok = True
+
+    def get_col_spec(self, **kw):
+        return 'JSONB'
+
+
+class JSONText(TypeDecorator):
+    """JSON document stored natively where supported and read back as text"""
+    impl = Text
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(_JSONB())
+        return dialect.type_descriptor(Text())
+
+    def column_expression(self, column):
+        # Keeps psycopg2 from decoding JSONB; a no-op cast on TEXT columns
+        return cast(column, Text)
+
+
+class JSONDocument:
+    """
+    Decoded view of a JSON text attribute, memoized per instance
+
+    The decoded value is shared between reads, so treat it as read-only and
+    assign a new value to change it. Assigning serializes into the raw column.
+    """
+
+    def __init__(self, column, default):
+        self.column = column
+        self.default = default
+        self.cache_key = f'_{column}_decoded'
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        raw = getattr(instance, self.column)
+        cached = instance.__dict__.get(self.cache_key)
+        if cached is not None and cached[0] is raw:
+            return cached[1]
+        value = json_codec.loads_or(raw, self.default())
+        instance.__dict__[self.cache_key] = (raw, value)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.column, None if value is None else json_codec.dumps(value))
+
+
+def results_without_organisms(detection_results):
+    """``detection_results`` as stored: everything except the organism list, kept in detected_organisms"""
+    if not isinstance(detection_results, dict):
+        return detection_results
+    return {key: value for key, value in detection_results.items() if key != 'organisms'}
+
@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta
+
+from models import EmailLog, db
+from utils.json_codec import dumps, loads_or
+
+
+class EmailOutbox(db.Model):
+    """
+    An email waiting to be sent by the outbox sender (services/email_outbox.py)
+
+    Rows move ``pending -> sending -> sent``; a failed attempt puts the row
+    back to ``pending`` with a later ``next_attempt_at`` until it runs out of
+    attempts and ends up ``failed``. Each row carries the EmailLog entry it
+    keeps up to date, so the history page shows queued/retrying/sent/failed;
+    a digest carries the entries of every detection it covers.
+    """
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(200), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    attachments = db.Column(db.Text)  # JSON list of file paths
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection.id', ondelete='SET NULL'), index=True)
+    email_log_id = db.Column(db.Integer, db.ForeignKey('email_log.id', ondelete='SET NULL'))
+    email_log_ids = db.Column(db.Text)  # JSON list, when the email covers several EmailLog entries
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    @classmethod
+    def enqueue(cls, recipient, subject, html_body, detection_id=None, attachments=None, summary=None,
+                email_log_ids=None):
+        """
+        Queue an email and its EmailLog entry (adds to the session, caller commits)
+
+        Args:
+            recipient (str): Recipient address
+            subject (str): Subject line
+            html_body (str): HTML body
+            detection_id (int, optional): Detection the email is about
+            attachments (list, optional): Paths of files to attach
+            summary (str, optional): EmailLog result summary
+            email_log_ids (list, optional): Ids of existing EmailLog entries to
+                track instead of creating one (a digest's per-detection entries)
+
+        Returns:
+            EmailOutbox: The queued entry
+        """
+        now = datetime.utcnow()
+        if not email_log_ids:
+            log = EmailLog(
+                recipient=recipient,
+                detection_id=detection_id,
+                sent_at=now,
+                status='queued',
+                result_summary=summary
+            )
+            db.session.add(log)
+            db.session.flush()
+            email_log_ids = [log.id]
+
+        entry = cls(
+            recipient=recipient,
+            subject=subject,
+            html_body=html_body,
+            attachments=dumps(list(attachments)) if attachments else None,
+            detection_id=detection_id,
+            email_log_id=email_log_ids[0],
+            email_log_ids=dumps(list(email_log_ids)) if len(email_log_ids) > 1 else None,
+            status='pending',
+            attempts=0,
+            next_attempt_at=now,
+            created_at=now
+        )
+        db.session.add(entry)
+        db.session.info['email_enqueued'] = True
+        return entry
+
+    @classmethod
+    def claim_due(cls, limit, visibility_timeout):
+        """
+        Claim up to ``limit`` entries that are due for an attempt, and commit
+
+        Entries left ``sending`` for longer than ``visibility_timeout``
+        seconds (their sender died mid-attempt) are claimed again. A claim
+        bumps ``attempts`` with a compare-and-set on its previous value, so
+        concurrent senders never get the same entry.
+
+        Returns:
+            list: Claimed EmailOutbox entries
+        """
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=visibility_timeout)
+        candidates = (
+            db.session.query(cls.id, cls.attempts)
+            .filter(db.or_(
+                db.and_(cls.status == 'pending', cls.next_attempt_at <= now),
+                db.and_(cls.status == 'sending', cls.claimed_at < stale),
+            ))
+            .order_by(cls.next_attempt_at, cls.id)
+            .limit(limit)
+            .all()
+        )
+
+        claimed_ids = []
+        for entry_id, attempts in candidates:
+            result = db.session.execute(
+                cls.__table__.update()
+                .where(cls.id == entry_id, cls.attempts == attempts)
+                .values(status='sending', claimed_at=now, attempts=attempts + 1)
+            )
+            if result.rowcount == 1:
+                claimed_ids.append(entry_id)
+        db.session.commit()
+
+        if not claimed_ids:
+            return []
+        return cls.query.filter(cls.id.in_(claimed_ids)).order_by(cls.id).all()
+
+    @property
+    def attachment_paths(self):
+        return loads_or(self.attachments, [])
+
+    def mark_sent(self):
+        """Record a delivered email (caller commits)"""
+        now = datetime.utcnow()
+        self.status = 'sent'
+        self.sent_at = now
+        self.last_error = None
+        self._update_log('sent', now)
+
+    def mark_failed(self, error, retry_delay=None):
+        """
+        Record a failed attempt (caller commits)
+
+        Args:
+            error (str): What went wrong
+            retry_delay (float, optional): Seconds until the next attempt;
+                None gives up on the entry
+        """
+        self.last_error = error[:2000]
+        if retry_delay is None:
+            self.status = 'failed'
+            self._update_log('failed', datetime.utcnow(), error[:500])
+        else:
+            self.status = 'pending'
+            self.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay)
+            self._update_log('retrying')
+
+    @property
+    def log_ids(self):
+        """Ids of the EmailLog entries this email keeps up to date"""
+        ids = loads_or(self.email_log_ids, None)
+        if ids:
+            return ids
+        return [self.email_log_id] if self.email_log_id is not None else []
+
+    def _update_log(self, status, sent_at=None, summary=None):
+        ids = self.log_ids
+        if not ids:
+            return
+        values = {'status': status}
+        if sent_at is not None:
+            values['sent_at'] = sent_at
+        if summary is not None:
+            values['result_summary'] = summary
+        EmailLog.query.filter(EmailLog.id.in_(ids)).update(values, synchronize_session=False)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'detection_id': self.detection_id,
+            'email_log_id': self.email_log_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
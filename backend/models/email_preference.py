@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from models import db
+
+EMAIL_MODES = ('immediate', 'hourly', 'daily')
+
+
+def normalize_recipient(email):
+    return (email or '').strip().lower()
+
+
+class EmailPreference(db.Model):
+    """
+    How a recipient wants their results: one email per detection, or a digest
+
+    Recipients without a row get ``immediate`` emails. In ``hourly`` and
+    ``daily`` mode completed detections wait as ``digest_pending`` EmailLog
+    entries until services/email_digest.py sends them as one summary once
+    ``last_digest_at`` is an hour/a day old.
+    """
+    __tablename__ = 'email_preferences'
+
+    id = db.Column(db.Integer, primary_key=True)
+    recipient = db.Column(db.String(200), nullable=False, unique=True)
+    mode = db.Column(db.String(20), nullable=False, default='immediate')
+    last_digest_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def mode_for(cls, email):
+        """Delivery mode of ``email`` ('immediate' unless set otherwise)"""
+        mode = (
+            db.session.query(cls.mode)
+            .filter(cls.recipient == normalize_recipient(email))
+            .scalar()
+        )
+        return mode or 'immediate'
+
+    @classmethod
+    def set_mode(cls, email, mode):
+        """
+        Set the delivery mode of ``email`` (adds to the session, caller commits)
+
+        Switching into a digest mode starts the first window now, so the
+        first digest goes out one window later.
+
+        Raises:
+            ValueError: If ``mode`` isn't one of EMAIL_MODES
+        """
+        if mode not in EMAIL_MODES:
+            raise ValueError(f"Unknown email mode '{mode}', expected one of {', '.join(EMAIL_MODES)}")
+        recipient = normalize_recipient(email)
+        preference = cls.query.filter_by(recipient=recipient).first()
+        if preference is None:
+            preference = cls(recipient=recipient)
+            db.session.add(preference)
+        if preference.mode != mode:
+            preference.last_digest_at = datetime.utcnow()
+        preference.mode = mode
+        return preference
+
+    def to_dict(self):
+        return {
+            'email': self.recipient,
+            'mode': self.mode,
+            'last_digest_at': self.last_digest_at.isoformat() if self.last_digest_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
@@ -0,0 +1,19 @@
+"""
+Indexes on tables whose models are declared elsewhere
+
+Importing this module before ``db.create_all()`` adds them to new
+databases; existing databases get them from the matching migration.
+"""
+from models import EmailLog, db
+from models.detection import Detection
+
+# Latest email per detection: WHERE detection_id IN (...) GROUP BY detection_id / MAX(sent_at)
+email_log_detection_sent_at = db.Index(
+    'ix_email_log_detection_id_sent_at', EmailLog.detection_id, EmailLog.sent_at
+)
+
+# Digest builder: WHERE status = 'digest_pending', joined to the recipient's preference
+email_log_status_recipient = db.Index('ix_email_log_status_recipient', EmailLog.status, EmailLog.recipient)
+
+# Keyset pagination: ORDER BY timestamp DESC, id DESC seeking past a (timestamp, id) cursor
+detection_timestamp_id = db.Index('ix_detection_timestamp_id', Detection.timestamp, Detection.id)
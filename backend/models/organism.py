@@ -0,0 +1,204 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from models import db
+from utils.database import bulk_insert
+
+GRAM_TYPES = ('positive', 'negative', 'variable')
+
+
+class Organism(db.Model):
+    """Reference row per organism class (``organisms`` in database/schema.sql)"""
+    __tablename__ = 'organisms'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)  # model class, e.g. 'e_coli'
+    scientific_name = db.Column(db.String(200))
+    gram_type = db.Column(db.String(20))
+    shape = db.Column(db.String(20))
+    pathogenicity = db.Column(db.String(20))
+    description = db.Column(db.Text)
+    treatment_notes = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def ids_for(cls, records):
+        """
+        Map each organism class in ``records`` to its id, creating missing rows
+
+        Args:
+            records (list): Organism dicts as stored in ``detected_organisms``
+
+        Returns:
+            dict: class name -> organism id
+        """
+        reference = {}
+        for record in records:
+            name = organism_key(record)
+            if name and name not in reference:
+                reference[name] = record if isinstance(record, dict) else {}
+        if not reference:
+            return {}
+
+        ids = dict(
+            db.session.query(cls.name, cls.id).filter(cls.name.in_(list(reference))).all()
+        )
+        missing = [name for name in reference if name not in ids]
+        if missing:
+            for name in missing:
+                record = reference[name]
+                gram_type = record.get('gram_type')
+                try:
+                    # Savepoint per row: another worker may create the same organism first
+                    with db.session.begin_nested():
+                        db.session.add(cls(
+                            name=name,
+                            scientific_name=record.get('scientific_name'),
+                            gram_type=gram_type if gram_type in GRAM_TYPES else None,
+                            description=record.get('description')
+                        ))
+                except IntegrityError:
+                    pass
+            ids.update(
+                db.session.query(cls.name, cls.id).filter(cls.name.in_(missing)).all()
+            )
+        return ids
+
+
+class DetectionOrganism(db.Model):
+    """One detected organism instance (``detection_organisms`` in database/schema.sql)"""
+    __tablename__ = 'detection_organisms'
+    __table_args__ = (
+        # Covers "count per organism" GROUP BYs without touching the table
+        db.Index('idx_detection_organisms_organism_detection', 'organism_id', 'detection_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+    organism_id = db.Column(db.Integer, db.ForeignKey('organisms.id', ondelete='CASCADE'), nullable=False)
+    confidence = db.Column(db.Float, nullable=False)
+    bbox_x1 = db.Column(db.Integer)
+    bbox_y1 = db.Column(db.Integer)
+    bbox_x2 = db.Column(db.Integer)
+    bbox_y2 = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def rows_for(cls, detection_id, records, organism_ids):
+        """Plain insert parameters for one detection's organism records"""
+        rows = []
+        now = datetime.utcnow()
+        for record in records:
+            name = organism_key(record)
+            if not name:
+                continue
+            bbox = (record.get('bbox') if isinstance(record, dict) else None) or [None] * 4
+            if isinstance(bbox, dict):
+                bbox = [bbox.get('x1'), bbox.get('y1'), bbox.get('x2'), bbox.get('y2')]
+            confidence = record.get('confidence', 0) if isinstance(record, dict) else 0
+            rows.append({
+                'detection_id': detection_id,
+                'organism_id': organism_ids[name],
+                'confidence': float(confidence or 0),
+                'bbox_x1': bbox[0],
+                'bbox_y1': bbox[1],
+                'bbox_x2': bbox[2],
+                'bbox_y2': bbox[3],
+                'created_at': now
+            })
+        return rows
+
+    @classmethod
+    def add_for_detection(cls, detection_id, records):
+        """
+        Insert a detection's organisms in bulk in the current transaction
+
+        Returns:
+            int: Number of rows inserted
+        """
+        return cls.add_for_detections({detection_id: records})
+
+    @classmethod
+    def add_for_detections(cls, records_by_detection):
+        """
+        Insert the organisms of several detections with one bulk insert
+
+        Args:
+            records_by_detection (dict): detection id -> organism records
+
+        Returns:
+            int: Number of rows inserted
+        """
+        organism_ids = Organism.ids_for([
+            record for records in records_by_detection.values() for record in (records or [])
+        ])
+        rows = []
+        for detection_id, records in records_by_detection.items():
+            rows.extend(cls.rows_for(detection_id, records or [], organism_ids))
+        if rows:
+            bulk_insert(db.session.connection(), cls.__table__, rows)
+            _adjust_organism_stats(db.session, Counter(row['organism_id'] for row in rows), 1)
+        return len(rows)
+
+    @classmethod
+    def delete_for_detection(cls, detection_id, session=None):
+        """Delete a detection's organism rows and take them out of the rollup"""
+        session = session or db.session
+        counts = Counter(dict(
+            session.query(cls.organism_id, func.count())
+            .filter(cls.detection_id == detection_id)
+            .group_by(cls.organism_id)
+            .all()
+        ))
+        session.query(cls).filter_by(detection_id=detection_id).delete(synchronize_session=False)
+        _adjust_organism_stats(session, counts, -1)
+
+    @classmethod
+    def counts_by_organism(cls, status=None):
+        """
+        Organism name -> number of detected instances, via one indexed GROUP BY
+
+        Args:
+            status (str): Only count detections with this status (all when None)
+        """
+        from models.detection import Detection
+
+        query = (
+            db.session.query(Organism.name, func.count())
+            .join(cls, cls.organism_id == Organism.id)
+        )
+        if status is not None:
+            query = query.join(Detection, Detection.id == cls.detection_id).filter(Detection.status == status)
+        return dict(query.group_by(Organism.name).all())
+
+    @classmethod
+    def counts_by_detection(cls, detection_ids):
+        """Detection id -> number of detected organisms, for the given detections only"""
+        if not detection_ids:
+            return {}
+        return dict(
+            db.session.query(cls.detection_id, func.count())
+            .filter(cls.detection_id.in_(list(detection_ids)))
+            .group_by(cls.detection_id)
+            .all()
+        )
+
+
+def _adjust_organism_stats(session, counts, sign):
+    from models.statistics import OrganismStats, increment
+
+    connection = session.connection()
+    for organism_id, count in counts.items():
+        increment(connection, OrganismStats.__table__, {'organism_id': organism_id},
+                  {'detection_count': sign * count})
+
+
+def organism_key(record):
+    """Class name a ``detected_organisms`` entry is counted under (dicts or bare strings)"""
+    if isinstance(record, dict):
+        return record.get('class') or record.get('name')
+    return str(record) if record else None
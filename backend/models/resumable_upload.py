@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime
+
+from models import db
+
+
+class ResumableUpload(db.Model):
+    """
+    A large image uploaded in chunks through ``/api/uploads``
+
+    ``received`` is the number of bytes acknowledged to the client. It only
+    moves forward after a chunk is on disk, so it is always where an
+    interrupted upload resumes.
+    """
+    __tablename__ = 'resumable_uploads'
+    __table_args__ = (
+        db.Index('ix_resumable_uploads_status_updated_at', 'status', 'updated_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    # SHA-256 the client announced, checked at finalize
+    expected_sha256 = db.Column(db.String(64))
+    content_hash = db.Column(db.String(64))
+    name = db.Column(db.String(100))
+    email = db.Column(db.String(200))
+    tiled = db.Column(db.Boolean, nullable=False, default=False)
+    # uploading, completed or failed
+    status = db.Column(db.String(20), nullable=False, default='uploading')
+    error_message = db.Column(db.Text)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection.id', ondelete='SET NULL'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'upload_id': self.id,
+            'filename': self.filename,
+            'size': self.size,
+            'offset': self.received,
+            'status': self.status,
+            'error_message': self.error_message,
+            'detection_id': self.detection_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    @classmethod
+    def expire(cls, upload_folder, older_than):
+        """
+        Delete uploads that have not received a chunk since ``older_than``
+
+        Their partial files go too. Commits.
+
+        Returns:
+            int: Number of uploads deleted
+        """
+        from utils.file_handler import partial_path, remove_partial
+
+        stale = cls.query.filter(cls.status != 'completed', cls.updated_at < older_than).all()
+        for upload in stale:
+            remove_partial(partial_path(upload_folder, upload.id))
+            db.session.delete(upload)
+        db.session.commit()
+        return len(stale)
@@ -0,0 +1,271 @@
+"""
+Incrementally maintained statistics rollups
+
+``system_stats`` holds per-day detection counters and ``organism_stats``
+per-organism instance counters. Both are updated in the same transaction as
+the rows they summarise:
+
+- Detection inserts, status transitions and deletes are picked up by an
+  ``after_flush`` hook on every ORM session.
+- detection_organisms rows are written with bulk Core inserts, so
+  ``DetectionOrganism`` adjusts ``organism_stats`` itself.
+
+Days are bucketed on the detection's creation timestamp, so a status change
+moves the count between columns of the same day. ``rebuild_rollups`` and
+``check_rollups`` recompute everything from the raw rows.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import and_, case, event, func, inspect
+from sqlalchemy.orm import Session
+
+from models import db
+from utils.database import bulk_insert
+
+
+class SystemStats(db.Model):
+    """Detection counters per day (``system_stats`` in database/schema.sql)"""
+    __tablename__ = 'system_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    date = db.Column(db.Date, nullable=False, unique=True)
+    total_detections = db.Column(db.Integer, nullable=False, default=0)
+    successful_detections = db.Column(db.Integer, nullable=False, default=0)
+    failed_detections = db.Column(db.Integer, nullable=False, default=0)
+    average_processing_time = db.Column(db.Float)
+    most_detected_organism = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    @classmethod
+    def totals(cls):
+        """
+        Returns:
+            dict: total_detections, completed_detections and failed_detections across all days
+        """
+        total, completed, failed = db.session.query(
+            func.coalesce(func.sum(cls.total_detections), 0),
+            func.coalesce(func.sum(cls.successful_detections), 0),
+            func.coalesce(func.sum(cls.failed_detections), 0),
+        ).one()
+        return {
+            'total_detections': int(total),
+            'completed_detections': int(completed),
+            'failed_detections': int(failed),
+        }
+
+
+class OrganismStats(db.Model):
+    """Number of detected instances per organism"""
+    __tablename__ = 'organism_stats'
+
+    organism_id = db.Column(db.Integer, db.ForeignKey('organisms.id', ondelete='CASCADE'), primary_key=True)
+    detection_count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def counts(cls):
+        """Organism name -> detected instances, read straight from the rollup"""
+        from models.organism import Organism
+
+        return dict(
+            db.session.query(Organism.name, cls.detection_count)
+            .join(cls, cls.organism_id == Organism.id)
+            .filter(cls.detection_count > 0)
+            .all()
+        )
+
+
+def increment(connection, table, keys, deltas):
+    """
+    Add ``deltas`` to the counters of the row identified by ``keys``, creating it if needed
+
+    Uses a single INSERT ... ON CONFLICT DO UPDATE on SQLite and PostgreSQL,
+    and UPDATE-then-INSERT elsewhere.
+    """
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        insert = None
+
+    if insert is not None:
+        stmt = insert(table).values(**keys, **deltas)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + delta for column, delta in deltas.items()}
+        )
+        connection.execute(stmt)
+        return
+
+    match = and_(*(table.c[column] == value for column, value in keys.items()))
+    result = connection.execute(
+        table.update().where(match).values({
+            table.c[column]: table.c[column] + delta for column, delta in deltas.items()
+        })
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(**keys, **deltas))
+
+
+def _status_deltas(status, sign, include_total):
+    return {
+        'total_detections': sign if include_total else 0,
+        'successful_detections': sign if status == 'completed' else 0,
+        'failed_detections': sign if status == 'failed' else 0,
+    }
+
+
+def _day(detection):
+    return (detection.timestamp or datetime.utcnow()).date()
+
+
+@event.listens_for(Session, 'after_flush')
+def _update_detection_rollups(session, flush_context):
+    """Fold this flush's Detection inserts, status changes and deletes into system_stats"""
+    from models.detection import Detection
+
+    changes = defaultdict(lambda: defaultdict(int))
+
+    def apply(day, deltas):
+        for column, delta in deltas.items():
+            changes[day][column] += delta
+
+    for obj in session.new:
+        if isinstance(obj, Detection):
+            apply(_day(obj), _status_deltas(obj.status, 1, True))
+
+    for obj in session.dirty:
+        if isinstance(obj, Detection):
+            # Detection.status keeps active history, so the previous value is always known
+            history = inspect(obj).attrs.status.history
+            if history.deleted and history.added:
+                apply(_day(obj), _status_deltas(history.deleted[0], -1, False))
+                apply(_day(obj), _status_deltas(history.added[0], 1, False))
+
+    for obj in session.deleted:
+        if isinstance(obj, Detection):
+            history = inspect(obj).attrs.status.history
+            status = history.deleted[0] if history.deleted else obj.status
+            apply(_day(obj), _status_deltas(status, -1, True))
+
+    if changes:
+        connection = session.connection()
+        for day, deltas in changes.items():
+            increment(connection, SystemStats.__table__, {'date': day}, deltas)
+
+
+def record_inserted(connection, rows):
+    """
+    Fold detections inserted with Core (bypassing the flush hook) into system_stats
+
+    Args:
+        connection: Connection of the inserting transaction
+        rows (list): The inserted rows, with ``timestamp`` and ``status``
+    """
+    changes = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        day = (row.get('timestamp') or datetime.utcnow()).date()
+        for column, delta in _status_deltas(row.get('status'), 1, True).items():
+            changes[day][column] += delta
+    for day, deltas in changes.items():
+        increment(connection, SystemStats.__table__, {'date': day}, deltas)
+
+
+def rebuild_rollups(session=None):
+    """
+    Recompute system_stats and organism_stats from detection and detection_organisms
+
+    Runs in the caller's transaction; the caller commits.
+    """
+    session = session or db.session
+    expected_days, expected_organisms = _expected(session)
+
+    session.query(SystemStats).delete()
+    session.query(OrganismStats).delete()
+    connection = session.connection()
+    bulk_insert(connection, SystemStats.__table__, [
+        dict(date=day, **counters) for day, counters in expected_days.items()
+    ])
+    bulk_insert(connection, OrganismStats.__table__, [
+        {'organism_id': organism_id, 'detection_count': count}
+        for organism_id, count in expected_organisms.items()
+    ])
+    return len(expected_days), len(expected_organisms)
+
+
+def check_rollups(session=None):
+    """
+    Compare the rollups with aggregates over the raw rows
+
+    Returns:
+        list: Human-readable mismatches (empty when consistent)
+    """
+    session = session or db.session
+    expected_days, expected_organisms = _expected(session)
+    mismatches = []
+
+    stored_days = {
+        row.date: {
+            'total_detections': row.total_detections,
+            'successful_detections': row.successful_detections,
+            'failed_detections': row.failed_detections,
+        }
+        for row in session.query(SystemStats).all()
+    }
+    empty = _status_deltas(None, 0, True)
+    for day in sorted(set(expected_days) | set(stored_days)):
+        expected = expected_days.get(day, empty)
+        stored = stored_days.get(day, empty)
+        for column in expected:
+            if expected[column] != stored[column]:
+                mismatches.append(f"system_stats {day} {column}: stored {stored[column]}, actual {expected[column]}")
+
+    stored_organisms = dict(session.query(OrganismStats.organism_id, OrganismStats.detection_count).all())
+    for organism_id in sorted(set(expected_organisms) | set(stored_organisms)):
+        expected = expected_organisms.get(organism_id, 0)
+        stored = stored_organisms.get(organism_id, 0)
+        if expected != stored:
+            mismatches.append(f"organism_stats {organism_id}: stored {stored}, actual {expected}")
+
+    return mismatches
+
+
+def _expected(session):
+    """Per-day and per-organism counters computed with GROUP BY over the raw tables"""
+    from models.detection import Detection
+    from models.organism import DetectionOrganism
+
+    day = func.date(Detection.timestamp)
+    rows = session.query(
+        day,
+        func.count(),
+        func.sum(case((Detection.status == 'completed', 1), else_=0)),
+        func.sum(case((Detection.status == 'failed', 1), else_=0)),
+    ).group_by(day).all()
+
+    days = {}
+    for value, total, completed, failed in rows:
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = date.fromisoformat(value)
+        elif isinstance(value, datetime):
+            value = value.date()
+        days[value] = {
+            'total_detections': int(total or 0),
+            'successful_detections': int(completed or 0),
+            'failed_detections': int(failed or 0),
+        }
+
+    organisms = dict(
+        session.query(DetectionOrganism.organism_id, func.count())
+        .group_by(DetectionOrganism.organism_id)
+        .all()
+    )
+    return days, organisms
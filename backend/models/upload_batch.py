@@ -0,0 +1,90 @@
+import uuid
+from datetime import datetime
+
+from sqlalchemy import func
+
+from models import db
+
+
+class UploadBatch(db.Model):
+    """
+    A set of images uploaded together through ``POST /api/uploads/batch``
+
+    Its detections are listed in ``upload_batch_items``, so the progress and
+    results of the whole batch can be read back with a couple of grouped
+    queries.
+    """
+    __tablename__ = 'upload_batches'
+
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    name = db.Column(db.String(100))
+    email = db.Column(db.String(200))
+    tiled = db.Column(db.Boolean, nullable=False, default=False)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def status_counts(self):
+        """Detection status -> number of this batch's detections, in one query"""
+        from models.detection import Detection
+
+        return dict(
+            db.session.query(Detection.status, func.count())
+            .join(UploadBatchItem, UploadBatchItem.detection_id == Detection.id)
+            .filter(UploadBatchItem.batch_id == self.id)
+            .group_by(Detection.status)
+            .all()
+        )
+
+    def items(self):
+        """
+        (position, filename, detection_id, status, error_message) per file, in upload order
+        """
+        from models.detection import Detection
+
+        return (
+            db.session.query(
+                UploadBatchItem.position,
+                UploadBatchItem.filename,
+                Detection.id,
+                Detection.status,
+                Detection.error_message
+            )
+            .join(Detection, Detection.id == UploadBatchItem.detection_id)
+            .filter(UploadBatchItem.batch_id == self.id)
+            .order_by(UploadBatchItem.position)
+            .all()
+        )
+
+    def to_dict(self, counts=None):
+        counts = self.status_counts() if counts is None else counts
+        # Detections deleted since the upload no longer count towards the batch
+        total = sum(counts.values())
+        finished = counts.get('completed', 0) + counts.get('failed', 0)
+        return {
+            'batch_id': self.id,
+            'name': self.name,
+            'email': self.email,
+            'total': total,
+            'uploaded': self.total,
+            'skipped': self.skipped,
+            'counts': counts,
+            'finished': finished,
+            'progress': round(finished / total, 4) if total else 1.0,
+            'done': finished >= total,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class UploadBatchItem(db.Model):
+    """One file of an upload batch and the detection created for it"""
+    __tablename__ = 'upload_batch_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), db.ForeignKey('upload_batches.id', ondelete='CASCADE'),
+                         nullable=False, index=True)
+    detection_id = db.Column(db.Integer, db.ForeignKey('detection.id', ondelete='CASCADE'),
+                             nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255))
+    content_hash = db.Column(db.String(64))
@@ -0,0 +1,37 @@
+"""
+Rebuild or verify the statistics rollups (system_stats, organism_stats)
+
+Usage:
+    python rebuild_stats.py            # recompute the rollups from raw rows
+    python rebuild_stats.py --check    # compare rollups with raw rows, exit 1 on mismatch
+"""
+import argparse
+import sys
+
+from app import create_app, db
+from models.statistics import check_rollups, rebuild_rollups
+
+parser = argparse.ArgumentParser(description='Rebuild or check the statistics rollups')
+parser.add_argument('--check', action='store_true', help='Only compare rollups with the raw rows')
+args = parser.parse_args()
+
+app = create_app()
+
+with app.app_context():
+    if args.check:
+        mismatches = check_rollups()
+        if mismatches:
+            print(f"❌ {len(mismatches)} rollup mismatch(es):")
+            for mismatch in mismatches:
+                print(f"  {mismatch}")
+            sys.exit(1)
+        print("✅ Rollups match the raw rows")
+    else:
+        try:
+            days, organisms = rebuild_rollups()
+            db.session.commit()
+            print(f"✅ Rebuilt rollups: {days} day(s), {organisms} organism(s)")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding rollups: {str(e)}")
+            sys.exit(1)
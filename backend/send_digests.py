@@ -0,0 +1,24 @@
+"""
+Queue the digest emails that are due (one pass)
+
+The detection workers already do this every DIGEST_CHECK_INTERVAL seconds;
+this script is for running it by hand or from cron. The outbox sender
+delivers the queued digests.
+
+Usage:
+    python send_digests.py
+"""
+import sys
+
+from app import create_app
+from services.email_digest import build_digests
+
+app = create_app()
+
+with app.app_context():
+    try:
+        queued = build_digests()
+        print(f"✅ Queued {queued} digest email(s)")
+    except Exception as e:
+        print(f"❌ Error building digests: {str(e)}")
+        sys.exit(1)
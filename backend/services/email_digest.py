@@ -0,0 +1,201 @@
+"""
+Digest emails for recipients in hourly or daily mode
+
+Completed detections of a digest-mode recipient are recorded as
+``digest_pending`` EmailLog entries instead of being emailed one by one
+(``hold_for_digest``). Once a recipient's window is over, ``build_digests``
+turns all of their pending entries into a single outbox email with a table
+of the detections, and the outbox sender moves every one of those entries to
+sent (or failed).
+
+``build_digests`` reads everything it needs with one grouped query over the
+email log, detections and their organisms, whatever the number of
+detections. The detection workers run it periodically (``DigestScheduler``);
+``python send_digests.py`` does a single pass, e.g. from cron.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from sqlalchemy import distinct, func, literal_column, or_
+
+logger = logging.getLogger(__name__)
+
+# Window length of each digest mode
+DIGEST_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+
+DASHBOARD_URL = 'http://localhost:3000/detections'
+
+
+def hold_for_digest(detection):
+    """
+    Record ``detection`` for its recipient's next digest if they get digests
+
+    Adds to the session; the caller commits.
+
+    Returns:
+        bool: True if held, False if the recipient gets immediate emails
+    """
+    from models import EmailLog, db
+    from models.email_preference import EmailPreference, normalize_recipient
+
+    if EmailPreference.mode_for(detection.email) not in DIGEST_INTERVALS:
+        return False
+    db.session.add(EmailLog(
+        recipient=normalize_recipient(detection.email),
+        detection_id=detection.id,
+        sent_at=datetime.utcnow(),
+        status='digest_pending',
+        result_summary=f"Held for digest with {len(detection.parsed_organisms)} organisms"
+    ))
+    return True
+
+
+def _distinct_names(dialect):
+    """Aggregate of the distinct organism names in a group"""
+    from models.organism import Organism
+
+    if dialect == 'postgresql':
+        return func.string_agg(distinct(Organism.name), literal_column("', '"))
+    return func.group_concat(distinct(Organism.name))
+
+
+def pending_rows(now):
+    """
+    Every pending digest entry whose recipient's window is over, in one query
+
+    Recipients who went back to immediate mode get theirs flushed right away.
+
+    Returns:
+        list: (email_log_id, recipient, detection_id, filename, timestamp,
+        organism_count, organism_names) rows ordered by recipient
+    """
+    from models import EmailLog, db
+    from models.detection import Detection
+    from models.email_preference import EmailPreference
+    from models.organism import DetectionOrganism, Organism
+
+    due = [EmailPreference.mode.notin_(list(DIGEST_INTERVALS))]
+    for mode, interval in DIGEST_INTERVALS.items():
+        due.append((EmailPreference.mode == mode) & or_(
+            EmailPreference.last_digest_at.is_(None),
+            EmailPreference.last_digest_at <= now - interval
+        ))
+
+    return (
+        db.session.query(
+            EmailLog.id,
+            EmailLog.recipient,
+            Detection.id,
+            Detection.filename,
+            Detection.timestamp,
+            func.count(DetectionOrganism.id),
+            _distinct_names(db.engine.dialect.name)
+        )
+        .join(Detection, Detection.id == EmailLog.detection_id)
+        .join(EmailPreference, EmailPreference.recipient == EmailLog.recipient)
+        .outerjoin(DetectionOrganism, DetectionOrganism.detection_id == Detection.id)
+        .outerjoin(Organism, Organism.id == DetectionOrganism.organism_id)
+        .filter(EmailLog.status == 'digest_pending', or_(*due))
+        .group_by(EmailLog.id, EmailLog.recipient, Detection.id, Detection.filename, Detection.timestamp)
+        .order_by(EmailLog.recipient, Detection.timestamp, Detection.id)
+        .all()
+    )
+
+
+def build_digests(now=None):
+    """
+    Queue one digest email per recipient whose window is over, and commit
+
+    Starts the next window of every due recipient, including those with
+    nothing to send.
+
+    Returns:
+        int: Number of digest emails queued
+    """
+    from models import EmailLog, db
+    from models.email_outbox import EmailOutbox
+    from models.email_preference import EmailPreference
+    from utils.email_templates import render
+
+    now = now or datetime.utcnow()
+    queued = 0
+    try:
+        rows = pending_rows(now)
+        for recipient, group in groupby(rows, key=lambda row: row[1]):
+            group = list(group)
+            detections = [
+                {
+                    'id': detection_id,
+                    'filename': filename,
+                    'timestamp': timestamp,
+                    'organism_count': organism_count,
+                    'organisms': ', '.join(sorted({name.strip() for name in (names or '').split(',') if name.strip()})),
+                    'url': f"{DASHBOARD_URL}/{detection_id}",
+                }
+                for _, _, detection_id, filename, timestamp, organism_count, names in group
+            ]
+            # Compare-and-set, so a concurrent pass can't send the same detections again
+            log_ids = [row[0] for row in group]
+            claimed = (
+                EmailLog.query
+                .filter(EmailLog.id.in_(log_ids), EmailLog.status == 'digest_pending')
+                .update({'status': 'queued'}, synchronize_session=False)
+            )
+            if claimed != len(log_ids):
+                raise RuntimeError(f"Digest entries for {recipient} were claimed by another digest pass")
+            EmailOutbox.enqueue(
+                recipient=recipient,
+                subject=f"Microorganism Detection Digest - {len(detections)} result(s)",
+                html_body=render('digest.html', detections=detections),
+                email_log_ids=log_ids
+            )
+            queued += 1
+
+        for mode, interval in DIGEST_INTERVALS.items():
+            EmailPreference.query.filter(
+                EmailPreference.mode == mode,
+                or_(EmailPreference.last_digest_at.is_(None), EmailPreference.last_digest_at <= now - interval)
+            ).update({'last_digest_at': now}, synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    if queued:
+        logger.info(f"Queued {queued} digest email(s) covering {len(rows)} detection(s)")
+    return queued
+
+
+class DigestScheduler:
+    """Thread that runs ``build_digests`` every ``interval`` seconds"""
+
+    def __init__(self, app, interval=60):
+        self.app = app
+        self.interval = interval
+        self._thread = None
+
+    def start(self, stop_event):
+        self._thread = threading.Thread(target=self.run, args=(stop_event,), name='digest-scheduler', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self, stop_event):
+        from models import db
+
+        while not stop_event.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    build_digests()
+                except Exception as e:
+                    logger.exception(f"Digest pass failed: {str(e)}")
+                finally:
+                    db.session.remove()
@@ -0,0 +1,330 @@
+"""
+Background sender for the email outbox
+
+Emails are queued as ``EmailOutbox`` rows in the request or job that
+produces them and sent here, off the request path. Sender threads share a
+pool of SMTP connections that stay open between messages: the TCP connect,
+STARTTLS handshake and login are paid once per connection instead of once
+per email. A connection that has dropped is reopened and the message tried
+again; messages that still fail are retried with exponential backoff.
+
+Run by the detection workers (``worker.py --mail-senders``).
+"""
+import logging
+import mimetypes
+import os
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+logger = logging.getLogger(__name__)
+
+# Set whenever a session commits new outbox entries, so an in-process sender
+# starts on them right away instead of at its next poll
+_wakeup = threading.Event()
+
+# Failures worth retrying on a fresh connection right away
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class SMTPConnection:
+    """
+    A reusable SMTP session
+
+    Opened (connect, STARTTLS, login) on first use and kept open for later
+    messages. A connection idle for a while is checked with NOOP before use,
+    and one that has served ``max_messages`` messages is reopened, since
+    servers commonly cap messages per session.
+    """
+
+    NOOP_AFTER = 5  # seconds idle before a NOOP check
+
+    def __init__(self, host, port, use_tls=False, username=None, password=None,
+                 timeout=30, max_messages=100):
+        self.host = host
+        self.port = port
+        self.use_tls = use_tls
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self._smtp = None
+        self._sent = 0
+        self._last_used = 0.0
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['MAIL_SERVER'],
+            config['MAIL_PORT'],
+            use_tls=config.get('MAIL_USE_TLS', False),
+            username=config.get('MAIL_USERNAME'),
+            password=config.get('MAIL_PASSWORD'),
+            timeout=config.get('MAIL_TIMEOUT', 30),
+            max_messages=config.get('MAIL_MAX_MESSAGES_PER_CONNECTION', 100)
+        )
+
+    def open(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_tls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+        self._sent = 0
+        self._last_used = time.monotonic()
+
+    def close(self):
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except Exception:
+            self._smtp.close()
+        self._smtp = None
+
+    def idle_for(self):
+        return time.monotonic() - self._last_used if self._smtp is not None else 0.0
+
+    def _healthy(self):
+        if self._sent >= self.max_messages:
+            return False
+        if self.idle_for() < self.NOOP_AFTER:
+            return True
+        try:
+            return self._smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def send(self, message):
+        """
+        Send ``message``, reconnecting once if the connection has gone away
+
+        Raises:
+            smtplib.SMTPException, OSError: If the message couldn't be sent
+        """
+        if self._smtp is not None and not self._healthy():
+            self.close()
+        if self._smtp is None:
+            self.open()
+        try:
+            self._smtp.send_message(message)
+        except CONNECTION_ERRORS:
+            # Dropped by the server (idle timeout, restart): one retry on a new connection
+            self._smtp.close()
+            self._smtp = None
+            self.open()
+            self._smtp.send_message(message)
+        self._sent += 1
+        self._last_used = time.monotonic()
+
+
+class SMTPPool:
+    """Up to ``size`` SMTP connections shared by sender threads"""
+
+    def __init__(self, factory, size=1, idle_timeout=60):
+        self.factory = factory
+        self.size = max(1, size)
+        self.idle_timeout = idle_timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(self.size)
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; it goes back to the pool afterwards"""
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+            # Servers drop idle sessions anyway; close them ourselves first
+            if conn.idle_for() > self.idle_timeout:
+                conn.close()
+            try:
+                yield conn
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # The server rejected the message; the session itself is still usable
+                raise
+            except Exception:
+                conn.close()
+                raise
+            finally:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def build_message(entry, sender):
+    """
+    MIME message for an outbox entry
+
+    Attachments that no longer exist on disk are left out.
+    """
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = entry.recipient
+    msg['Subject'] = entry.subject
+    msg.attach(MIMEText(entry.html_body, 'html'))
+
+    for path in entry.attachment_paths:
+        if not path or not os.path.exists(path):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        mime_type, _ = mimetypes.guess_type(path)
+        if mime_type and mime_type.startswith('image/'):
+            part = MIMEImage(data, _subtype=mime_type.split('/', 1)[1], name=os.path.basename(path))
+        else:
+            part = MIMEApplication(data, name=os.path.basename(path))
+        part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(path))
+        msg.attach(part)
+    return msg
+
+
+def retry_delay(attempts, config):
+    """Exponential backoff after ``attempts`` attempts, or None once they're used up"""
+    if attempts >= config.get('MAIL_MAX_ATTEMPTS', 5):
+        return None
+    base = config.get('MAIL_RETRY_BASE_DELAY', 30)
+    return min(config.get('MAIL_RETRY_MAX_DELAY', 3600), base * 2 ** (attempts - 1))
+
+
+def is_permanent(error):
+    """5xx replies (unknown mailbox, rejected message) won't succeed on a retry"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(code, int) and code >= 500
+
+
+class OutboxSender:
+    """
+    Threads that claim due outbox entries and send them over pooled connections
+
+    Args:
+        app: Flask application (for the database and MAIL_* settings)
+        threads (int): Sender threads, which is also the number of SMTP connections
+    """
+
+    def __init__(self, app, threads=1):
+        self.app = app
+        self.config = app.config
+        self.threads = max(1, threads)
+        self.pool = SMTPPool(
+            lambda: SMTPConnection.from_config(self.config),
+            size=self.threads,
+            idle_timeout=self.config.get('MAIL_IDLE_TIMEOUT', 60)
+        )
+        self._workers = []
+
+    def start(self, stop_event):
+        """Start the sender threads; they exit once ``stop_event`` is set"""
+        self._workers = [
+            threading.Thread(target=self.run, args=(stop_event,), name=f"mail-sender-{i}", daemon=True)
+            for i in range(self.threads)
+        ]
+        for worker in self._workers:
+            worker.start()
+        return self._workers
+
+    def join(self):
+        for worker in self._workers:
+            worker.join()
+        self.pool.close()
+
+    def run(self, stop_event):
+        """Send due entries until ``stop_event`` is set"""
+        poll_interval = self.config.get('MAIL_POLL_INTERVAL', 2)
+        while not stop_event.is_set():
+            try:
+                sent = self.send_due()
+            except Exception as e:
+                logger.exception(f"Outbox pass failed: {str(e)}")
+                sent = 0
+            if sent == 0:
+                _wakeup.wait(poll_interval)
+                _wakeup.clear()
+
+    def send_due(self):
+        """
+        Claim one batch of due entries and send it
+
+        Returns:
+            int: Number of entries attempted
+        """
+        from models import db
+        from models.email_outbox import EmailOutbox
+
+        with self.app.app_context():
+            try:
+                entries = EmailOutbox.claim_due(
+                    self.config.get('MAIL_BATCH_SIZE', 20),
+                    self.config.get('MAIL_VISIBILITY_TIMEOUT', 300)
+                )
+                for entry in entries:
+                    self.deliver(entry)
+                    db.session.commit()
+                return len(entries)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    def deliver(self, entry):
+        """Send one claimed entry and record the outcome on it (caller commits)"""
+        sender = self.config.get('MAIL_DEFAULT_SENDER')
+        try:
+            message = build_message(entry, sender)
+            with self.pool.connection() as conn:
+                conn.send(message)
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e)}"
+            delay = None if is_permanent(e) else retry_delay(entry.attempts, self.config)
+            entry.mark_failed(error, delay)
+            if delay is None:
+                logger.error(f"Email {entry.id} to {entry.recipient} failed for good: {error}")
+            else:
+                logger.warning(f"Email {entry.id} to {entry.recipient} failed (attempt {entry.attempts}), "
+                               f"retrying in {delay}s: {error}")
+            return False
+        entry.mark_sent()
+        logger.info(f"Email {entry.id} sent to {entry.recipient}")
+        return True
+
+
+def _install_wakeup_hook():
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(Session, 'after_commit')
+    def _wake_sender(session):
+        if session.info.pop('email_enqueued', False):
+            _wakeup.set()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _discard_wakeup(session):
+        session.info.pop('email_enqueued', None)
+
+
+_install_wakeup_hook()
@@ -1,20 +1,36 @@
 import cv2
 import numpy as np
-from PIL import Image, ImageEnhance
+from PIL import Image
 import os
 from pathlib import Path
 
+from config import Config
+from services.gram_staining import get_staining_engine
+from services.preprocessing import letterbox_into
+
 class ImageProcessor:
     """
     Image processing service for microorganism detection
     Handles digital gram staining and image enhancement
     """
     
-    def __init__(self):
+    def __init__(self, staining_quality=None):
         self.supported_formats = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp'}
+        self.staining_engine = get_staining_engine('enhanced', staining_quality or Config.GRAM_STAIN_QUALITY)
+    
+    def _load(self, image):
+        """Accept either a path or an already decoded BGR array, so callers holding an array don't re-read the file"""
+        if isinstance(image, np.ndarray):
+            return image
+        return cv2.imread(str(image))
     
     def validate_image(self, image_path):
-        """Validate if image can be processed"""
+        """Validate if image can be processed (accepts a path or a decoded array)"""
+        if isinstance(image_path, np.ndarray):
+            if image_path.ndim != 3 or image_path.size == 0:
+                return False, "Cannot read image file"
+            return True, "Valid image"
+        
         if not os.path.exists(image_path):
             return False, "Image file not found"
         
@@ -34,85 +50,29 @@ class ImageProcessor:
         Apply digital gram staining effect to enhance bacterial visibility
         
         Args:
-            image_path (str): Path to input image
-            output_path (str): Path to save processed image
+            image_path (str | numpy.ndarray): Path to input image, or a decoded BGR array
+            output_path (str): Path to save processed image (required for arrays)
             
         Returns:
             str: Path to processed image or None if failed
         """
         try:
             # Read the image
-            img = cv2.imread(image_path)
+            img = self._load(image_path)
             if img is None:
                 raise ValueError("Could not read image")
             
             # Create output path if not provided
+            if output_path is None and isinstance(image_path, np.ndarray):
+                raise ValueError("output_path is required when passing an image array")
             if output_path is None:
                 base_name = Path(image_path).stem
                 output_dir = Path(image_path).parent / 'processed'
                 output_dir.mkdir(exist_ok=True)
                 output_path = output_dir / f"gram_stained_{base_name}.png"
             
-            # Step 1: Noise reduction
-            img_denoised = cv2.fastNlMeansDenoisingColored(img, None, 10, 10, 7, 21)
-            
-            # Step 2: Convert to different color spaces for processing
-            hsv = cv2.cvtColor(img_denoised, cv2.COLOR_BGR2HSV)
-            lab = cv2.cvtColor(img_denoised, cv2.COLOR_BGR2LAB)
-            
-            # Step 3: Enhance contrast using CLAHE
-            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-            lab[:, :, 0] = clahe.apply(lab[:, :, 0])
-            enhanced = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
-            
-            # Step 4: Apply color enhancement to simulate gram staining
-            result = enhanced.copy()
-            
-            # Enhance purple/blue regions (gram-positive bacteria)
-            # Create mask for blue/purple regions
-            lower_blue = np.array([100, 50, 50])
-            upper_blue = np.array([130, 255, 255])
-            mask_positive = cv2.inRange(hsv, lower_blue, upper_blue)
-            
-            # Apply purple color to gram-positive regions
-            result[mask_positive > 0] = [180, 50, 200]  # Purple color
-            
-            # Enhance red/pink regions (gram-negative bacteria)
-            lower_red1 = np.array([0, 50, 50])
-            upper_red1 = np.array([10, 255, 255])
-            lower_red2 = np.array([160, 50, 50])
-            upper_red2 = np.array([180, 255, 255])
-            
-            mask_negative1 = cv2.inRange(hsv, lower_red1, upper_red1)
-            mask_negative2 = cv2.inRange(hsv, lower_red2, upper_red2)
-            mask_negative = cv2.bitwise_or(mask_negative1, mask_negative2)
-            
-            # Apply red color to gram-negative regions
-            result[mask_negative > 0] = [50, 50, 255]  # Red color
-            
-            # Step 5: Enhance overall brightness and contrast
-            result_pil = Image.fromarray(cv2.cvtColor(result, cv2.COLOR_BGR2RGB))
-            
-            # Enhance brightness
-            brightness_enhancer = ImageEnhance.Brightness(result_pil)
-            result_pil = brightness_enhancer.enhance(1.2)
-            
-            # Enhance contrast
-            contrast_enhancer = ImageEnhance.Contrast(result_pil)
-            result_pil = contrast_enhancer.enhance(1.3)
-            
-            # Enhance color saturation
-            color_enhancer = ImageEnhance.Color(result_pil)
-            result_pil = color_enhancer.enhance(1.1)
-            
-            # Convert back to OpenCV format and save
-            final_result = cv2.cvtColor(np.array(result_pil), cv2.COLOR_RGB2BGR)
-            
-            # Apply final sharpening
-            kernel = np.array([[-1, -1, -1],
-                              [-1,  9, -1],
-                              [-1, -1, -1]])
-            final_result = cv2.filter2D(final_result, -1, kernel)
+            # Denoise, recolor, tone and sharpen without leaving OpenCV/NumPy
+            final_result = self.staining_engine.stain(img)
             
             # Save the processed image
             cv2.imwrite(str(output_path), final_result)
@@ -172,13 +132,13 @@ class ImageProcessor:
         Extract basic features from the image for analysis
         
         Args:
-            image_path (str): Path to image
+            image_path (str | numpy.ndarray): Path to image, or a decoded BGR array
             
         Returns:
             dict: Image features
         """
         try:
-            img = cv2.imread(image_path)
+            img = self._load(image_path)
             if img is None:
                 return None
             
@@ -214,39 +174,34 @@ class ImageProcessor:
         except:
             return 0
     
-    def preprocess_for_detection(self, image_path, target_size=(640, 640)):
+    def preprocess_for_detection(self, image_path, target_size=(640, 640), return_meta=False):
         """
         Preprocess image for YOLOv7 detection
         
+        The image is letterboxed (aspect ratio kept, padded to a square) as
+        YOLO expects, rather than stretched to the target size.
+        
         Args:
-            image_path (str): Path to input image
-            target_size (tuple): Target size for the model
+            image_path (str | numpy.ndarray): Path to input image, or a decoded BGR array
+            target_size (tuple): Target size for the model (square)
+            return_meta (bool): Also return the LetterboxMeta used to map boxes back
             
         Returns:
-            numpy.ndarray: Preprocessed image array
+            numpy.ndarray: Preprocessed (1, 3, H, W) image array, or (array, meta) if return_meta
         """
         try:
             # Read image
-            img = cv2.imread(image_path)
+            img = self._load(image_path)
             if img is None:
                 return None
             
-            # Convert BGR to RGB
-            img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            
-            # Resize to target size
-            img_resized = cv2.resize(img_rgb, target_size)
-            
-            # Normalize to [0, 1]
-            img_normalized = img_resized.astype(np.float32) / 255.0
-            
-            # Convert to CHW format (channels, height, width)
-            img_chw = np.transpose(img_normalized, (2, 0, 1))
-            
-            # Add batch dimension
-            img_batch = np.expand_dims(img_chw, axis=0)
+            # Caller keeps the result, so letterbox into a fresh array rather than the shared buffer
+            size = target_size[0]
+            img_batch = np.empty((1, 3, size, size), dtype=np.float32)
+            canvas = np.empty((size, size, 3), dtype=np.uint8)
+            meta = letterbox_into(img, img_batch[0], canvas)
             
-            return img_batch
+            return (img_batch, meta) if return_meta else img_batch
             
         except Exception as e:
             print(f"Error in preprocessing: {str(e)}")
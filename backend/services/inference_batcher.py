@@ -0,0 +1,115 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+from services.preprocessing import input_buffer, letterbox, letterbox_batch
+from services.yolo_detection import crop_tile, format_records, merge_tile_detections, plan_tiles, to_records
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Dynamic micro-batching in front of a detector pool
+
+    Requests arriving within ``max_wait_ms`` of the first one in a batch (or
+    until ``max_batch_size`` is reached) are stacked into a single
+    (N, 3, S, S) tensor, run through one forward pass and split back out to
+    each caller. Batches are run on the pool's sessions, so up to
+    ``pool.size`` batches are in flight at once.
+    """
+
+    def __init__(self, pool, max_batch_size=8, max_wait_ms=20):
+        self.pool = pool
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+
+        self._requests = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=pool.size, thread_name_prefix='inference')
+        self._collector = None
+        self._lock = threading.Lock()
+        self._names = None
+        self._img_size = None
+        self._iou_threshold = None
+
+    def _start(self):
+        with self._lock:
+            if self._collector is None:
+                with self.pool.acquire() as detector:
+                    self._names = detector.names
+                    self._img_size = detector.img_size
+                    self._iou_threshold = detector.backend.iou_threshold
+                self._collector = threading.Thread(target=self._collect, name='batch-collector', daemon=True)
+                self._collector.start()
+
+    def warm_up(self):
+        self._start()
+
+    def submit(self, tensor):
+        """
+        Queue one preprocessed (1, 3, S, S) tensor for inference
+
+        The tensor is read when its batch runs, so the caller must not reuse
+        its buffer until the future resolves.
+
+        Returns:
+            Future: Resolves to the (K, 6) detections for this tensor
+        """
+        self._start()
+        future = Future()
+        self._requests.put((tensor, future))
+        return future
+
+    def detect(self, image):
+        """Same contract as ``YOLODetector.detect``, but shares forward passes with concurrent callers"""
+        self._start()
+        tensor, meta = letterbox(image, self._img_size)
+        detections = self.submit(tensor).result()
+        return to_records(detections, meta, self._names)
+
+    def detect_tiled(self, image, tile_size=None, overlap=0.2):
+        """Tiles are submitted individually so they batch with each other and with concurrent requests"""
+        self._start()
+        tiles = plan_tiles(image.shape[0], image.shape[1], tile_size or self._img_size, overlap)
+        batch, metas = letterbox_batch([crop_tile(image, tile) for tile in tiles], self._img_size)
+        futures = [self.submit(batch[i:i + 1]) for i in range(len(tiles))]
+        detections = merge_tile_detections(
+            [future.result() for future in futures], tiles, metas, self._iou_threshold
+        )
+        return format_records(detections, self._names)
+
+    def _collect(self):
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        futures = [future for _, future in batch]
+        try:
+            # Stack into this inference thread's reusable buffer instead of a fresh array
+            tensors = input_buffer(self._img_size).get(len(batch))
+            np.concatenate([tensor for tensor, _ in batch], axis=0, out=tensors)
+            with self.pool.acquire() as detector:
+                outputs = detector.backend.infer(tensors)
+            for future, detections in zip(futures, outputs):
+                future.set_result(detections)
+        except Exception as e:
+            logger.exception(f"Batch of {len(batch)} failed: {str(e)}")
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,311 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A unit of work pulled from a job queue"""
+
+    def __init__(self, job_id, payload, attempts=0, raw=None):
+        self.id = job_id
+        self.payload = payload
+        self.attempts = attempts
+        self.raw = raw
+
+    def __repr__(self):
+        return f"<Job {self.id} attempts={self.attempts}>"
+
+
+class JobQueue:
+    """
+    Interface shared by the job queue backends
+
+    A job is claimed by ``dequeue`` and must then be either ``ack``-ed once it
+    has been processed or ``fail``-ed so it can be retried. Jobs that are claimed
+    but never acknowledged (e.g. the worker crashed) are re-delivered.
+    """
+
+    def __init__(self, max_attempts=3, visibility_timeout=600):
+        self.max_attempts = max_attempts
+        self.visibility_timeout = visibility_timeout
+
+    def enqueue(self, payload):
+        raise NotImplementedError
+
+    def enqueue_many(self, payloads):
+        """Enqueue several jobs; returns their ids in order"""
+        return [self.enqueue(payload) for payload in payloads]
+
+    def dequeue(self, timeout=None):
+        raise NotImplementedError
+
+    def ack(self, job):
+        raise NotImplementedError
+
+    def fail(self, job, error=None):
+        raise NotImplementedError
+
+    def size(self):
+        raise NotImplementedError
+
+    def _retry_delay(self, attempts):
+        """Exponential backoff between retries, capped at one minute"""
+        return min(60, 2 ** attempts)
+
+
+class SQLiteJobQueue(JobQueue):
+    """
+    Persistent local queue backed by a SQLite file
+
+    Runs without any external service, so it is the default backend. Several
+    worker processes can share the same file; claims are made inside an
+    ``IMMEDIATE`` transaction so a job is handed to exactly one worker.
+    """
+
+    POLL_INTERVAL = 0.5
+
+    def __init__(self, path, name='detections', **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.name = name
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                queue TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued'
+                    CHECK (status IN ('queued', 'claimed', 'dead')),
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                claimed_at REAL,
+                created_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_jobs_queue_status_available "
+            "ON jobs(queue, status, available_at)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly where needed
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, payload):
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO jobs (id, queue, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, self.name, json.dumps(payload), now, now)
+        )
+        return job_id
+
+    def enqueue_many(self, payloads):
+        """Enqueue several jobs in a single transaction"""
+        now = time.time()
+        rows = [(str(uuid.uuid4()), self.name, json.dumps(payload), now, now) for payload in payloads]
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                "INSERT INTO jobs (id, queue, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return [row[0] for row in rows]
+
+    def _claim(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Re-deliver jobs whose worker died before acknowledging them
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', available_at = ? "
+                "WHERE queue = ? AND status = 'claimed' AND claimed_at < ?",
+                (now, self.name, now - self.visibility_timeout)
+            )
+            row = conn.execute(
+                "SELECT id, payload, attempts FROM jobs "
+                "WHERE queue = ? AND status = 'queued' AND available_at <= ? "
+                "ORDER BY available_at LIMIT 1",
+                (self.name, now)
+            ).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'claimed', claimed_at = ?, attempts = attempts + 1 WHERE id = ?",
+                (now, row[0])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return Job(row[0], json.loads(row[1]), attempts=row[2] + 1)
+
+    def dequeue(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            job = self._claim()
+            if job is not None:
+                return job
+            if deadline is not None and time.time() >= deadline:
+                return None
+            time.sleep(self.POLL_INTERVAL)
+
+    def ack(self, job):
+        self._connect().execute("DELETE FROM jobs WHERE id = ?", (job.id,))
+
+    def fail(self, job, error=None):
+        if job.attempts >= self.max_attempts:
+            self._connect().execute(
+                "UPDATE jobs SET status = 'dead', last_error = ? WHERE id = ?",
+                (error, job.id)
+            )
+            logger.error(f"Job {job.id} exhausted {job.attempts} attempts: {error}")
+            return False
+        self._connect().execute(
+            "UPDATE jobs SET status = 'queued', available_at = ?, last_error = ? WHERE id = ?",
+            (time.time() + self._retry_delay(job.attempts), error, job.id)
+        )
+        return True
+
+    def size(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE queue = ? AND status IN ('queued', 'claimed')",
+            (self.name,)
+        ).fetchone()
+        return row[0]
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Queue backed by Redis lists, for the ``redis`` service in docker-compose
+
+    Each consumer atomically moves a job from the pending list into its own
+    processing list, so jobs held by a worker that died are recovered when a
+    worker with the same ``consumer_id`` starts again.
+    """
+
+    def __init__(self, url, name='detections', consumer_id=None, **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.name = name
+        self.consumer_id = consumer_id or f"{os.getpid()}"
+        self.pending_key = f"queue:{name}:pending"
+        self.delayed_key = f"queue:{name}:delayed"
+        self.dead_key = f"queue:{name}:dead"
+        self.processing_key = f"queue:{name}:processing:{self.consumer_id}"
+        self.recover()
+
+    def recover(self):
+        """Push jobs left in this consumer's processing list back onto the queue"""
+        while self.redis.rpoplpush(self.processing_key, self.pending_key) is not None:
+            pass
+
+    def _promote_delayed(self):
+        now = time.time()
+        for raw in self.redis.zrangebyscore(self.delayed_key, 0, now):
+            if self.redis.zrem(self.delayed_key, raw):
+                self.redis.lpush(self.pending_key, raw)
+
+    def enqueue(self, payload):
+        job_id = str(uuid.uuid4())
+        self.redis.lpush(self.pending_key, json.dumps({'id': job_id, 'payload': payload, 'attempts': 0}))
+        return job_id
+
+    def enqueue_many(self, payloads):
+        """Enqueue several jobs in one round trip"""
+        jobs = [{'id': str(uuid.uuid4()), 'payload': payload, 'attempts': 0} for payload in payloads]
+        if jobs:
+            self.redis.lpush(self.pending_key, *[json.dumps(job) for job in jobs])
+        return [job['id'] for job in jobs]
+
+    def dequeue(self, timeout=None):
+        self._promote_delayed()
+        # BRPOPLPUSH takes whole seconds and blocks forever on 0, so round short waits up
+        seconds = 0 if timeout is None else max(1, math.ceil(timeout))
+        raw = self.redis.brpoplpush(self.pending_key, self.processing_key, timeout=seconds)
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return Job(data['id'], data['payload'], attempts=data.get('attempts', 0) + 1, raw=raw)
+
+    def ack(self, job):
+        self.redis.lrem(self.processing_key, 1, job.raw)
+
+    def fail(self, job, error=None):
+        data = {'id': job.id, 'payload': job.payload, 'attempts': job.attempts, 'last_error': error}
+        pipe = self.redis.pipeline()
+        pipe.lrem(self.processing_key, 1, job.raw)
+        if job.attempts >= self.max_attempts:
+            pipe.lpush(self.dead_key, json.dumps(data))
+            pipe.execute()
+            logger.error(f"Job {job.id} exhausted {job.attempts} attempts: {error}")
+            return False
+        pipe.zadd(self.delayed_key, {json.dumps(data): time.time() + self._retry_delay(job.attempts)})
+        pipe.execute()
+        return True
+
+    def size(self):
+        return self.redis.llen(self.pending_key) + self.redis.zcard(self.delayed_key)
+
+
+_queue = None
+_queue_pid = None
+
+
+def get_job_queue(config, consumer_id=None):
+    """
+    Return the job queue configured in ``config`` (a Flask config or Config class)
+
+    The instance is cached per process so forked workers never share a
+    connection with their parent.
+    """
+    global _queue, _queue_pid
+
+    if _queue is not None and _queue_pid == os.getpid():
+        return _queue
+
+    get = config.get if isinstance(config, dict) else lambda key, default=None: getattr(config, key, default)
+    backend = (get('JOB_QUEUE_BACKEND') or 'sqlite').lower()
+    options = {
+        'name': get('JOB_QUEUE_NAME', 'detections'),
+        'max_attempts': get('JOB_MAX_ATTEMPTS', 3),
+        'visibility_timeout': get('JOB_VISIBILITY_TIMEOUT', 600),
+    }
+
+    if backend == 'redis':
+        _queue = RedisJobQueue(get('REDIS_URL'), consumer_id=consumer_id, **options)
+    elif backend == 'sqlite':
+        _queue = SQLiteJobQueue(get('JOB_QUEUE_PATH'), **options)
+    else:
+        raise ValueError(f"Unknown job queue backend: {backend}")
+
+    _queue_pid = os.getpid()
+    return _queue
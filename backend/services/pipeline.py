@@ -0,0 +1,78 @@
+import os
+
+import cv2
+
+
+class ImageContext:
+    """
+    One upload's image, decoded once and shared by every processing stage
+
+    Validation, staining and detection all read the in-memory array instead
+    of re-reading files. The file is decoded straight from disk, so only the
+    decoded array is held, never the encoded bytes as well. Derived images
+    are queued with ``add_output`` and only encoded to disk by ``flush`` at
+    the end.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.filename = os.path.basename(path)
+        self._image = None
+        self.stained = None
+        self._outputs = []
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(path)
+
+    @property
+    def image(self):
+        """BGR array, decoded on first access"""
+        if self._image is None:
+            image = cv2.imread(self.path, cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError(f"Could not decode image {self.filename}")
+            self._image = image
+        return self._image
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def validate(self):
+        """
+        Returns:
+            tuple: (is_valid, message), same contract as ImageProcessor.validate_image
+        """
+        try:
+            if os.path.getsize(self.path) == 0:
+                return False, "Image file is empty"
+        except OSError:
+            return False, f"Image file not found: {self.filename}"
+        try:
+            self.image
+            return True, "Valid image"
+        except ValueError as e:
+            return False, str(e)
+
+    def add_output(self, path, image):
+        """Queue a derived image to be written by ``flush``"""
+        self._outputs.append((path, image))
+        return path
+
+    def flush(self):
+        """Encode and write all queued outputs; returns the written paths"""
+        written = []
+        for path, image in self._outputs:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if not cv2.imwrite(path, image):
+                raise IOError(f"Failed to write {path}")
+            written.append(path)
+        self._outputs = []
+        return written
+
+    def release(self):
+        """Drop the decoded arrays once processing is finished"""
+        self._image = None
+        self.stained = None
+        self._outputs = []
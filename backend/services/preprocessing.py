@@ -0,0 +1,129 @@
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# Grey used by YOLO for letterbox padding
+PAD_VALUE = 114
+
+_INV_255 = np.float32(1.0 / 255.0)
+
+LetterboxMeta = namedtuple('LetterboxMeta', ['scale', 'pad_x', 'pad_y', 'width', 'height'])
+LetterboxMeta.__doc__ = """
+How an image was placed in the model input: ``input = original * scale + pad``.
+``width``/``height`` are the original image dimensions.
+"""
+
+
+class InputBuffer:
+    """
+    Reusable (N, 3, S, S) float32 model input buffer plus a uint8 letterbox canvas
+
+    Grows up to ``max_capacity`` slots and then stays allocated, so
+    steady-state preprocessing allocates nothing per image. Larger requests
+    (e.g. all tiles of a big micrograph) get a temporary array that is freed
+    once the caller drops it, instead of pinning hundreds of megabytes per
+    thread for the life of the process.
+    """
+
+    def __init__(self, img_size, capacity=1, max_capacity=None):
+        self.img_size = img_size
+        self.max_capacity = max(capacity, max_capacity or capacity)
+        self.canvas = np.empty((img_size, img_size, 3), dtype=np.uint8)
+        self.tensor = np.empty((capacity, 3, img_size, img_size), dtype=np.float32)
+
+    def get(self, count):
+        """Return ``count`` slots: a view of the reused buffer, or a temporary array past ``max_capacity``"""
+        if count > self.max_capacity:
+            return np.empty((count, 3, self.img_size, self.img_size), dtype=np.float32)
+        if count > self.tensor.shape[0]:
+            self.tensor = np.empty((count, 3, self.img_size, self.img_size), dtype=np.float32)
+        return self.tensor[:count]
+
+
+_local = threading.local()
+
+
+def input_buffer(img_size):
+    """The calling thread's input buffer for ``img_size``"""
+    buffers = getattr(_local, 'buffers', None)
+    if buffers is None:
+        buffers = _local.buffers = {}
+    buffer = buffers.get(img_size)
+    if buffer is None:
+        from config import Config
+        buffer = buffers[img_size] = InputBuffer(img_size, max_capacity=Config.INFERENCE_BATCH_SIZE)
+    return buffer
+
+
+def letterbox_into(image, out, canvas):
+    """
+    Letterbox a BGR image into a (3, S, S) float32 RGB slot
+
+    The image is resized once, keeping its aspect ratio, straight into the
+    padded ``canvas``; the colour swap, HWC to CHW transpose and [0, 1]
+    scaling are then written channel by channel into ``out``.
+
+    Args:
+        image (numpy.ndarray): BGR uint8 image of any size
+        out (numpy.ndarray): (3, S, S) float32 destination
+        canvas (numpy.ndarray): (S, S, 3) uint8 scratch space
+
+    Returns:
+        LetterboxMeta: Scale and padding needed to map boxes back to ``image``
+    """
+    size = out.shape[-1]
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_w = min(size, max(1, int(round(width * scale))))
+    new_h = min(size, max(1, int(round(height * scale))))
+    pad_x = (size - new_w) // 2
+    pad_y = (size - new_h) // 2
+
+    canvas.fill(PAD_VALUE)
+    roi = canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w]
+    interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR
+    resized = cv2.resize(image, (new_w, new_h), dst=roi, interpolation=interpolation)
+    if resized is not roi:
+        roi[...] = resized
+
+    # BGR -> RGB while converting, so no intermediate RGB copy is needed
+    for channel in range(3):
+        np.multiply(canvas[:, :, 2 - channel], _INV_255, out=out[channel])
+
+    return LetterboxMeta(scale, pad_x, pad_y, width, height)
+
+
+def letterbox(image, img_size=640):
+    """
+    Letterbox a single image into the calling thread's reusable buffer
+
+    Returns:
+        tuple: ((1, 3, S, S) float32 view, LetterboxMeta). The view is
+        overwritten by the next call on this thread; copy it to keep it.
+    """
+    buffer = input_buffer(img_size)
+    tensor = buffer.get(1)
+    meta = letterbox_into(image, tensor[0], buffer.canvas)
+    return tensor, meta
+
+
+def letterbox_batch(images, img_size=640):
+    """
+    Letterbox several images into consecutive slots of the thread's buffer
+
+    Returns:
+        tuple: ((N, 3, S, S) float32 view, list of LetterboxMeta)
+    """
+    buffer = input_buffer(img_size)
+    tensor = buffer.get(len(images))
+    metas = [letterbox_into(image, tensor[i], buffer.canvas) for i, image in enumerate(images)]
+    return tensor, metas
+
+
+def unletterbox_boxes(boxes, meta):
+    """Map (K, 4) x1, y1, x2, y2 boxes from model input space back onto the original image in place"""
+    boxes[:, [0, 2]] = ((boxes[:, [0, 2]] - meta.pad_x) / meta.scale).clip(0, meta.width)
+    boxes[:, [1, 3]] = ((boxes[:, [1, 3]] - meta.pad_y) / meta.scale).clip(0, meta.height)
+    return boxes
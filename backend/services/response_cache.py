@@ -0,0 +1,54 @@
+"""
+Response caches for the detection and statistics endpoints
+
+``detection_cache`` holds serialized responses of completed detections, which
+don't change once written; ``statistics_cache`` holds the statistics response
+for a few seconds. Committing a session that inserted, updated or deleted a
+Detection drops the affected detection entries and the statistics entries.
+
+Caches are per process: writes made by detection workers reach API
+processes through the TTLs.
+"""
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import Config
+from utils.http_cache import TTLCache
+
+detection_cache = TTLCache(Config.DETECTION_CACHE_SIZE, Config.DETECTION_CACHE_TTL)
+statistics_cache = TTLCache(8, Config.STATISTICS_CACHE_TTL)
+
+# Cache-Control for completed detections, and for everything that can still change
+COMPLETED_CACHE_CONTROL = f'private, max-age={Config.DETECTION_CACHE_MAX_AGE}'
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_detection_writes(session, flush_context):
+    from models.detection import Detection
+
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Detection):
+            session.info.setdefault('written_detection_ids', set()).add(obj.id)
+
+
+def mark_written(session, detection_ids):
+    """Invalidate like the flush hook does, for detections written with Core statements"""
+    session.info.setdefault('written_detection_ids', set()).update(detection_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    detection_ids = session.info.pop('written_detection_ids', None)
+    if detection_ids is None:
+        return
+    statistics_cache.clear()
+    for detection_id in detection_ids:
+        detection_cache.pop(str(detection_id))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('written_detection_ids', None)
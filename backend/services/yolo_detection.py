@@ -0,0 +1,511 @@
+import ast
+import hashlib
+import os
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from config import Config
+from services.preprocessing import letterbox, letterbox_batch, unletterbox_boxes
+
+logger = logging.getLogger(__name__)
+
+
+def non_max_suppression(boxes, scores, iou_threshold):
+    """
+    Greedy non-maximum suppression
+
+    Args:
+        boxes (numpy.ndarray): (N, 4) boxes as x1, y1, x2, y2
+        scores (numpy.ndarray): (N,) confidence scores
+        iou_threshold (float): Overlap above which the lower-scoring box is dropped
+
+    Returns:
+        numpy.ndarray: Indices of the kept boxes, highest score first
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def batched_nms(detections, iou_threshold):
+    """
+    Class-aware NMS over an (N, 6) array of x1, y1, x2, y2, confidence, class
+
+    Boxes of different classes are shifted apart so they never suppress each other.
+    """
+    if len(detections) == 0:
+        return detections
+    offsets = detections[:, 5:6] * (detections[:, :4].max() + 1)
+    keep = non_max_suppression(detections[:, :4] + offsets, detections[:, 4], iou_threshold)
+    return detections[keep]
+
+
+def decode_predictions(output, num_classes, conf_threshold, iou_threshold):
+    """
+    Turn one image's raw YOLO head output into final detections
+
+    Handles both the YOLOv8 layout (4 + classes, anchors) and the YOLOv5/v7
+    layout (anchors, 5 + classes) with an objectness column.
+
+    Returns:
+        numpy.ndarray: (K, 6) array of x1, y1, x2, y2, confidence, class
+    """
+    pred = output
+    if pred.shape[0] in (4 + num_classes, 5 + num_classes) and pred.shape[0] < pred.shape[1]:
+        pred = pred.T
+
+    if pred.shape[1] == 5 + num_classes:
+        class_scores = pred[:, 5:] * pred[:, 4:5]
+    else:
+        class_scores = pred[:, 4:4 + num_classes]
+
+    class_ids = class_scores.argmax(axis=1)
+    confidences = class_scores[np.arange(len(class_scores)), class_ids]
+    mask = confidences >= conf_threshold
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    cx, cy, w, h = pred[mask, 0], pred[mask, 1], pred[mask, 2], pred[mask, 3]
+    detections = np.stack([
+        cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2,
+        confidences[mask], class_ids[mask].astype(np.float32)
+    ], axis=1)
+
+    return batched_nms(detections, iou_threshold)
+
+
+class TorchBackend:
+    """
+    PyTorch inference through ultralytics
+
+    Only used when no exported ONNX graph is available, since importing
+    torch alone costs seconds and a lot of memory.
+    """
+
+    name = 'torch'
+
+    def __init__(self, model_path, conf_threshold, iou_threshold, img_size, num_threads=None):
+        import torch
+        from ultralytics import YOLO
+
+        if num_threads:
+            torch.set_num_threads(num_threads)
+
+        self.torch = torch
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.img_size = img_size
+
+    def infer(self, batch):
+        """
+        Args:
+            batch (numpy.ndarray): (N, 3, S, S) float32 RGB in [0, 1]
+
+        Returns:
+            list: (K, 6) detection arrays in input-tensor coordinates, one per image
+        """
+        results = self.model.predict(
+            self.torch.from_numpy(batch),
+            conf=self.conf_threshold,
+            iou=self.iou_threshold,
+            imgsz=self.img_size,
+            device='cpu',
+            verbose=False
+        )
+        outputs = []
+        for result in results:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                outputs.append(np.zeros((0, 6), dtype=np.float32))
+                continue
+            outputs.append(np.concatenate([
+                boxes.xyxy.cpu().numpy(),
+                boxes.conf.cpu().numpy()[:, None],
+                boxes.cls.cpu().numpy()[:, None]
+            ], axis=1).astype(np.float32))
+        return outputs
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime inference on CPU
+
+    Thread counts are set explicitly: intra-op threads parallelise a single
+    operator, inter-op threads run independent graph branches. Other execution
+    providers (e.g. ``OpenVINOExecutionProvider``) can be listed in ``providers``.
+    """
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path, conf_threshold, iou_threshold, img_size,
+                 intra_op_threads=0, inter_op_threads=1, providers=None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+
+        available = ort.get_available_providers()
+        providers = [p for p in (providers or ['CPUExecutionProvider']) if p in available] or ['CPUExecutionProvider']
+
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        self.names = self._read_names()
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.img_size = img_size
+
+    def _read_names(self):
+        """Class names are stored in the graph metadata by the ultralytics exporter"""
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        names = metadata.get('names')
+        if not names:
+            raise ValueError("ONNX model has no class names in its metadata; re-export it with export_model.py")
+        names = ast.literal_eval(names)
+        return names if isinstance(names, dict) else dict(enumerate(names))
+
+    def infer(self, batch):
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return [
+            decode_predictions(output[i], len(self.names), self.conf_threshold, self.iou_threshold)
+            for i in range(output.shape[0])
+        ]
+
+
+def resolve_backend_name(config=Config):
+    """Pick the inference backend: ONNX when an exported graph exists, PyTorch otherwise"""
+    backend = (config.INFERENCE_BACKEND or 'auto').lower()
+    if backend == 'auto':
+        return 'onnx' if os.path.exists(config.ONNX_MODEL_PATH) else 'torch'
+    if backend not in ('onnx', 'torch'):
+        raise ValueError(f"Unknown inference backend: {backend}")
+    return backend
+
+
+def load_backend(config=Config, backend=None, num_threads=None):
+    """Create an inference backend from configuration"""
+    backend = backend or resolve_backend_name(config)
+
+    if backend == 'onnx':
+        return OnnxBackend(
+            config.ONNX_MODEL_PATH,
+            config.CONFIDENCE_THRESHOLD,
+            config.IOU_THRESHOLD,
+            config.MODEL_IMG_SIZE,
+            intra_op_threads=config.ONNX_INTRA_OP_THREADS or num_threads or 0,
+            inter_op_threads=config.ONNX_INTER_OP_THREADS,
+            providers=config.ONNX_PROVIDERS
+        )
+
+    return TorchBackend(
+        config.MODEL_PATH,
+        config.CONFIDENCE_THRESHOLD,
+        config.IOU_THRESHOLD,
+        config.MODEL_IMG_SIZE,
+        num_threads=num_threads
+    )
+
+
+class YOLODetector:
+    """
+    CPU YOLO inference session
+
+    Keeps one loaded backend resident so repeated calls only pay for the
+    forward pass. Pre- and post-processing are shared by all backends.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.names = backend.names
+        self.img_size = backend.img_size
+        self._warm_up()
+
+    def _warm_up(self):
+        """Run one dummy inference so the first real request is not slowed by lazy initialisation"""
+        self.backend.infer(np.zeros((1, 3, self.img_size, self.img_size), dtype=np.float32))
+
+    def detect(self, image):
+        """
+        Detect microorganisms in an image
+
+        Args:
+            image (numpy.ndarray): BGR image as returned by cv2.imread
+
+        Returns:
+            list: One dict per detection with ``class``, ``confidence`` and ``bbox`` ([x1, y1, x2, y2] in pixels)
+        """
+        tensor, meta = letterbox(image, self.img_size)
+        detections = self.backend.infer(tensor)[0]
+        return to_records(detections, meta, self.names)
+
+    def detect_tiled(self, image, tile_size=None, overlap=0.2):
+        """
+        Detect on overlapping full-resolution tiles run through the model as one batch
+
+        Images no larger than a tile take a single pass, exactly like ``detect``.
+        """
+        tiles = plan_tiles(image.shape[0], image.shape[1], tile_size or self.img_size, overlap)
+        batch, metas = letterbox_batch([crop_tile(image, tile) for tile in tiles], self.img_size)
+        detections = merge_tile_detections(
+            self.backend.infer(batch), tiles, metas, self.backend.iou_threshold
+        )
+        return format_records(detections, self.names)
+
+
+def rescale_detections(detections, meta, offset=(0, 0)):
+    """
+    Map (K, 6) detections from letterboxed model input space back to the image described by ``meta``
+
+    ``offset`` shifts the boxes afterwards, e.g. from tile to full-image coordinates.
+    """
+    rescaled = detections.astype(np.float32, copy=True)
+    unletterbox_boxes(rescaled[:, :4], meta)
+    rescaled[:, [0, 2]] += offset[0]
+    rescaled[:, [1, 3]] += offset[1]
+    return rescaled
+
+
+def format_records(detections, names):
+    """
+    Returns:
+        list: One dict per detection with ``class``, ``confidence`` and ``bbox`` ([x1, y1, x2, y2] in pixels)
+    """
+    return [
+        {
+            'class': names[int(class_id)],
+            'confidence': round(float(confidence), 4),
+            'bbox': [int(round(v)) for v in box]
+        }
+        for box, confidence, class_id in zip(detections[:, :4], detections[:, 4], detections[:, 5])
+    ]
+
+
+def to_records(detections, meta, names):
+    """Map model-space detections back to the original image and format them"""
+    return format_records(rescale_detections(detections, meta), names)
+
+
+def _tile_starts(length, tile_size, stride):
+    if length <= tile_size:
+        return [0]
+    count = int(np.ceil((length - tile_size) / stride)) + 1
+    # Spread the tiles evenly so the last one ends exactly on the image border
+    return [int(round(i * (length - tile_size) / (count - 1))) for i in range(count)]
+
+
+def plan_tiles(height, width, tile_size=640, overlap=0.2):
+    """
+    Split an image into the fewest overlapping tiles that cover it
+
+    Args:
+        height (int): Image height in pixels
+        width (int): Image width in pixels
+        tile_size (int): Tile edge length in pixels
+        overlap (float): Minimum fraction of a tile shared with its neighbour
+
+    Returns:
+        list: (x1, y1, x2, y2) tile rectangles; a single full-image tile for small images
+    """
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in _tile_starts(height, tile_size, stride)
+        for x in _tile_starts(width, tile_size, stride)
+    ]
+
+
+def crop_tile(image, tile):
+    x1, y1, x2, y2 = tile
+    return image[y1:y2, x1:x2]
+
+
+def merge_tile_detections(outputs, tiles, metas, iou_threshold):
+    """
+    Shift per-tile detections into full-image coordinates and merge them
+
+    A global class-aware NMS pass removes the duplicates found by
+    neighbouring tiles across the overlap.
+    """
+    parts = [
+        rescale_detections(detections, meta, offset=(tile[0], tile[1]))
+        for detections, tile, meta in zip(outputs, tiles, metas)
+    ]
+    merged = np.concatenate(parts, axis=0) if parts else np.zeros((0, 6), dtype=np.float32)
+    return batched_nms(merged, iou_threshold)
+
+
+class DetectorPool:
+    """
+    Pool of pre-loaded detector sessions shared by the threads of one process
+
+    Sessions are created on demand up to ``size`` and are never torn down, so
+    concurrent uploads each get a warm model instead of reloading weights.
+    """
+
+    def __init__(self, factory, size):
+        self.factory = factory
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()  # LIFO reuses the session with the warmest caches
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def warm_up(self):
+        """Load the first session eagerly (e.g. at worker start-up)"""
+        with self.acquire():
+            pass
+
+    @contextmanager
+    def acquire(self, timeout=None):
+        detector = self._checkout(timeout)
+        try:
+            yield detector
+        finally:
+            self._idle.put(detector)
+
+    def _checkout(self, timeout):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        return self._idle.get(timeout=timeout)
+
+    def detect(self, image):
+        with self.acquire() as detector:
+            return detector.detect(image)
+
+    def detect_tiled(self, image, tile_size=None, overlap=0.2):
+        with self.acquire() as detector:
+            return detector.detect_tiled(image, tile_size, overlap)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def model_available(config=Config):
+    """True when either an exported ONNX graph or the PyTorch weights exist"""
+    return any(path and os.path.exists(path) for path in (config.ONNX_MODEL_PATH, config.MODEL_PATH))
+
+
+_model_digests = {}
+
+
+def _file_digest(path):
+    """SHA-256 of a model file, recomputed only when its size or mtime changes"""
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+    digest = _model_digests.get(key)
+    if digest is None:
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(chunk)
+        digest = _model_digests[key] = sha.hexdigest()
+    return digest
+
+
+def model_version(config=Config):
+    """
+    Identifier of everything that shapes detection output: backend, weights and thresholds
+
+    Used to decide whether stored results for an image can be reused.
+    ``MODEL_VERSION`` overrides the weights digest when set.
+    """
+    if not model_available(config):
+        return 'simulated'
+
+    backend = resolve_backend_name(config)
+    weights = config.MODEL_VERSION
+    if not weights:
+        path = config.ONNX_MODEL_PATH if backend == 'onnx' else config.MODEL_PATH
+        weights = _file_digest(path)[:16]
+    return f"{backend}:{weights}:{config.MODEL_IMG_SIZE}:{config.CONFIDENCE_THRESHOLD}:{config.IOU_THRESHOLD}"
+
+
+def get_detector_pool(config=Config):
+    """Return this process's detector pool, creating it on first use"""
+    global _pool, _pool_pid
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            size = config.DETECTOR_POOL_SIZE or os.cpu_count() or 1
+
+            # Split the cores between sessions instead of letting each one claim all of them
+            threads_per_session = max(1, (os.cpu_count() or 1) // size)
+
+            def factory():
+                backend = load_backend(config, num_threads=threads_per_session)
+                logger.info(f"Loaded {backend.name} detector session")
+                return YOLODetector(backend)
+
+            _pool = DetectorPool(factory, size)
+            _pool_pid = os.getpid()
+
+    return _pool
+
+
+_batcher = None
+_batcher_pid = None
+
+
+def get_detector(config=Config):
+    """
+    Return the detector uploads should call in this process
+
+    A ``MicroBatcher`` over the pool when batching is enabled
+    (``INFERENCE_BATCH_SIZE`` > 1), otherwise the pool itself.
+    """
+    global _batcher, _batcher_pid
+
+    pool = get_detector_pool(config)
+    if config.INFERENCE_BATCH_SIZE <= 1:
+        return pool
+
+    with _pool_lock:
+        if _batcher is None or _batcher_pid != os.getpid():
+            from services.inference_batcher import MicroBatcher
+            _batcher = MicroBatcher(pool, config.INFERENCE_BATCH_SIZE, config.INFERENCE_BATCH_WAIT_MS)
+            _batcher_pid = os.getpid()
+
+    return _batcher
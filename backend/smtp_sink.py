@@ -0,0 +1,176 @@
+"""
+Local SMTP stand-in for testing outgoing email
+
+Accepts every message and keeps it (optionally printing it) instead of
+delivering it. Needs nothing beyond the standard library. ``--latency``
+delays every reply to mimic the round trips to a real mail server, and
+``--drop-after`` hangs up on a client after that many messages, the way
+servers cap messages per session, to exercise reconnects. ``rejections``
+(in-process only) answers RCPT for chosen addresses with an error reply,
+e.g. ``{'full@example.com': '452 Mailbox full'}``, to exercise retries.
+
+Point the app at it with MAIL_SERVER=localhost, MAIL_PORT=1025,
+MAIL_USE_TLS=false and an empty MAIL_USERNAME.
+
+Usage:
+    python smtp_sink.py
+    python smtp_sink.py --port 1025 --latency 0.05 --drop-after 20 --print
+"""
+import argparse
+import socketserver
+import threading
+import time
+from email import message_from_bytes, policy
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """One SMTP session: enough of RFC 5321 for smtplib's client"""
+
+    def reply(self, line):
+        if self.server.sink.latency:
+            time.sleep(self.server.sink.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        sink.connected()
+        sent = 0
+        sender, recipients = None, []
+        self.reply('220 smtp-sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b"250-smtp-sink\r\n250-8BITMIME\r\n")
+                self.reply('250 SMTPUTF8')
+            elif verb == 'HELO':
+                self.reply('250 smtp-sink')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip(), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command[8:].strip()
+                rejection = sink.rejections.get(recipient.strip('<>'))
+                if rejection:
+                    self.reply(rejection)
+                    continue
+                recipients.append(recipient)
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b'.\r\n':
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                sink.received(sender, recipients, b''.join(data))
+                sent += 1
+                sender, recipients = None, []
+                self.reply('250 OK: queued')
+                if sink.drop_after and sent >= sink.drop_after:
+                    return
+            elif verb in ('RSET', 'NOOP'):
+                sender, recipients = (None, []) if verb == 'RSET' else (sender, recipients)
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """
+    In-process SMTP server that records the messages it receives
+
+    Args:
+        host (str): Interface to listen on
+        port (int): Port; 0 picks a free one
+        latency (float): Seconds to wait before every reply
+        drop_after (int): Hang up after this many messages per connection (0 = never)
+        echo (bool): Print each message as it arrives
+        rejections (dict): Recipient address -> SMTP error reply to RCPT
+    """
+
+    def __init__(self, host='127.0.0.1', port=1025, latency=0.0, drop_after=0, echo=False, rejections=None):
+        self.latency = latency
+        self.drop_after = drop_after
+        self.echo = echo
+        self.rejections = dict(rejections or {})
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def received(self, sender, recipients, data):
+        message = message_from_bytes(data, policy=policy.default)
+        with self._lock:
+            self.messages.append(message)
+        if self.echo:
+            print(f"--- {sender} -> {', '.join(recipients)}: {message['Subject']} ({len(data)} bytes)")
+
+    def serve_forever(self):
+        """Serve from the calling thread until interrupted"""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def start(self):
+        """Serve from a background thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a local SMTP server that keeps messages instead of sending them')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=1025)
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before every reply')
+    parser.add_argument('--drop-after', type=int, default=0, help='Hang up after this many messages per connection')
+    parser.add_argument('--print', dest='echo', action='store_true', help='Print each received message')
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.latency, args.drop_after, echo=args.echo)
+    print(f"SMTP sink listening on {args.host}:{sink.address[1]}")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Received {len(sink.messages)} message(s) over {sink.connections} connection(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Response compression negotiated through Accept-Encoding
+
+JSON responses of at least ``COMPRESS_MIN_SIZE`` bytes are sent with Brotli
+when the client accepts it and the ``brotli`` package is installed, gzip
+otherwise. Streamed responses (exports, files) are left alone.
+
+A compressed body is a different representation, so its ETag is marked weak
+(as nginx does); weak comparison still matches it in If-None-Match, so 304s
+keep working.
+"""
+import gzip
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {'application/json'}
+
+
+def _accepted(accept_encoding, coding):
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return params.replace(' ', '').lower() not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def choose_encoding(accept_encoding):
+    """'br', 'gzip' or None for an Accept-Encoding header value"""
+    if not accept_encoding:
+        return None
+    if brotli is not None and _accepted(accept_encoding, 'br'):
+        return 'br'
+    if _accepted(accept_encoding, 'gzip'):
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding, settings):
+    if encoding == 'br':
+        return brotli.compress(body, quality=settings.get('COMPRESS_BROTLI_QUALITY', 5))
+    return gzip.compress(body, compresslevel=settings.get('COMPRESS_GZIP_LEVEL', 6))
+
+
+def init_app(app):
+    """Compress eligible responses of ``app`` in an after_request hook"""
+
+    @app.after_request
+    def compress_response(response):
+        from flask import request
+
+        response.vary.add('Accept-Encoding')
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers):
+            return response
+
+        body = response.get_data()
+        if len(body) < app.config.get('COMPRESS_MIN_SIZE', 1024):
+            return response
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        response.set_data(compress(body, encoding, app.config))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+    return app
@@ -0,0 +1,204 @@
+"""
+Engine configuration for the application database
+
+SQLite's defaults (rollback journal, ``synchronous=FULL``, a 2 MB page cache
+and Flask-SQLAlchemy's NullPool opening a new connection per checkout) make
+concurrent uploads block each other and surface ``database is locked``.
+``engine_options`` returns pool settings for ``SQLALCHEMY_ENGINE_OPTIONS`` and
+``configure_engine`` applies the tuning pragmas on every new DBAPI connection:
+
+- ``journal_mode=WAL``: readers no longer block on the single writer
+- ``synchronous=NORMAL``: fsync at checkpoints instead of every commit,
+  which is still crash-safe in WAL mode
+- ``mmap_size`` / ``cache_size``: keep hot pages in memory
+- ``busy_timeout``: wait for the write lock instead of failing right away
+
+On PostgreSQL, psycopg2 batches executemany() into multi-row statements and
+``bulk_insert`` switches large batches to ``COPY ... FROM STDIN``.
+``insert_returning_ids`` bulk-inserts rows whose new ids the caller needs.
+"""
+import csv
+import io
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+# Batches at least this large are written with COPY on PostgreSQL
+COPY_THRESHOLD = 500
+
+# Bound parameters per multi-row INSERT on SQLite (older builds cap them at 999)
+SQLITE_MAX_VARIABLES = 999
+
+
+def normalize_url(uri):
+    """Accept the legacy ``postgres://`` scheme that SQLAlchemy 1.4 no longer does"""
+    if uri.startswith('postgres://'):
+        return 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(uri, settings):
+    """
+    Keyword arguments for ``create_engine`` / ``SQLALCHEMY_ENGINE_OPTIONS``
+
+    Args:
+        uri (str): Database URL
+        settings (dict): App config (``DB_POOL_*`` and ``SQLITE_*`` keys)
+
+    Returns:
+        dict: Engine options
+    """
+    if is_memory_sqlite(uri):
+        # Flask-SQLAlchemy pins in-memory databases to one shared connection
+        return {}
+
+    options = {
+        'pool_size': settings.get('DB_POOL_SIZE', 10),
+        'max_overflow': settings.get('DB_MAX_OVERFLOW', 20),
+        'pool_timeout': settings.get('DB_POOL_TIMEOUT', 30),
+    }
+    if is_sqlite(uri):
+        options['poolclass'] = QueuePool
+        options['connect_args'] = {
+            # Pooled connections are handed to whichever request thread checks them out
+            'check_same_thread': False,
+            'timeout': settings.get('SQLITE_BUSY_TIMEOUT_MS', 5000) / 1000.0,
+        }
+    else:
+        options['pool_pre_ping'] = True
+        options['pool_recycle'] = settings.get('DB_POOL_RECYCLE', 1800)
+    if make_url(uri).get_driver_name() == 'psycopg2':
+        # executemany() INSERTs become multi-row VALUES, UPDATEs are sent in batches
+        options['executemany_mode'] = 'values_plus_batch'
+        options['executemany_values_page_size'] = 1000
+        options['executemany_batch_page_size'] = 500
+    return options
+
+
+def sqlite_pragmas(settings):
+    """Ordered (pragma, value) pairs applied to each new SQLite connection"""
+    return [
+        ('journal_mode', settings.get('SQLITE_JOURNAL_MODE', 'WAL')),
+        ('synchronous', settings.get('SQLITE_SYNCHRONOUS', 'NORMAL')),
+        ('busy_timeout', int(settings.get('SQLITE_BUSY_TIMEOUT_MS', 5000))),
+        # Negative cache_size is in KiB rather than pages
+        ('cache_size', -int(settings.get('SQLITE_CACHE_SIZE_KB', 65536))),
+        ('mmap_size', int(settings.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))),
+        ('temp_store', 'MEMORY'),
+    ]
+
+
+def configure_engine(engine, settings):
+    """
+    Apply the SQLite pragmas to every connection ``engine`` opens
+
+    Must run before the engine's first connection; a no-op for other databases.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+    pragmas = sqlite_pragmas(settings)
+
+    @event.listens_for(engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+
+def bulk_insert(connection, table, rows):
+    """
+    Insert ``rows`` (dicts with the same keys) into ``table`` in the current transaction
+
+    Large batches on PostgreSQL/psycopg2 are streamed with COPY; everything
+    else is one executemany() INSERT.
+
+    Args:
+        connection: SQLAlchemy Connection, e.g. ``db.session.connection()``
+        table: Table to insert into
+        rows (list): Column name -> value dicts
+
+    Returns:
+        int: Number of rows inserted
+    """
+    if not rows:
+        return 0
+    if (connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+            and len(rows) >= COPY_THRESHOLD):
+        _copy_rows(connection, table, rows)
+    else:
+        connection.execute(table.insert(), rows)
+    return len(rows)
+
+
+def _copy_rows(connection, table, rows):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # An unquoted \N marks NULL, so empty strings stay empty strings
+    for row in rows:
+        writer.writerow([r'\N' if row[column] is None else row[column] for column in columns])
+    buffer.seek(0)
+
+    quoted = ', '.join(connection.dialect.identifier_preparer.quote(column) for column in columns)
+    name = connection.dialect.identifier_preparer.format_table(table)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(f"COPY {name} ({quoted}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+    finally:
+        cursor.close()
+
+
+def insert_returning_ids(connection, table, rows):
+    """
+    Insert ``rows`` in bulk and return the new primary keys, in row order
+
+    PostgreSQL: ids are drawn from the table's sequence up front in one
+    query, then the rows go in with ``bulk_insert``. SQLite: multi-row
+    INSERTs, each assigning consecutive rowids ending at ``lastrowid``
+    (the statement holds the write lock). Elsewhere: one INSERT per row.
+
+    Args:
+        connection: SQLAlchemy Connection, e.g. ``db.session.connection()``
+        table: Table with a single integer primary key
+        rows (list): Column name -> value dicts with the same keys
+
+    Returns:
+        list: Primary keys of the inserted rows
+    """
+    if not rows:
+        return []
+    pk = list(table.primary_key.columns)[0]
+    dialect = connection.dialect.name
+
+    if dialect == 'postgresql':
+        name = connection.dialect.identifier_preparer.format_table(table)
+        ids = connection.exec_driver_sql(
+            f"SELECT nextval(pg_get_serial_sequence('{name}', '{pk.name}')) FROM generate_series(1, {len(rows)})"
+        ).scalars().all()
+        bulk_insert(connection, table, [dict(row, **{pk.name: row_id}) for row, row_id in zip(rows, ids)])
+        return ids
+
+    if dialect == 'sqlite':
+        per_statement = max(1, SQLITE_MAX_VARIABLES // len(rows[0]))
+        ids = []
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            last = connection.execute(table.insert().values(chunk)).lastrowid
+            ids.extend(range(last - len(chunk) + 1, last + 1))
+        return ids
+
+    return [connection.execute(table.insert().values(row)).inserted_primary_key[0] for row in rows]
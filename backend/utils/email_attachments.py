@@ -0,0 +1,117 @@
+"""
+Size-capped image attachments for emails
+
+Result images are full-resolution PNGs of several megabytes. Emails attach a
+downscaled JPEG (or WebP) preview instead, written once next to the source
+image as ``<name>.email.jpg`` and reused for every recipient until the
+source changes.
+"""
+import logging
+import os
+import threading
+
+import cv2
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_FORMATS = {
+    'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+    'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+}
+
+# Striped: a fixed set of locks shared by hash, so memory doesn't grow with the number of images
+LOCK_STRIPES = 64
+_locks = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+def _lock_for(path):
+    return _locks[hash(path) % LOCK_STRIPES]
+
+
+def preview_path(image_path, fmt=None):
+    """Where the preview of ``image_path`` is cached"""
+    extension = PREVIEW_FORMATS[fmt or Config.EMAIL_PREVIEW_FORMAT][0]
+    return f"{os.path.splitext(image_path)[0]}.email{extension}"
+
+
+def _is_fresh(target, source):
+    try:
+        return os.path.getmtime(target) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def _smaller(target, source):
+    """The preview, unless the source was already smaller than it"""
+    return source if os.path.getsize(source) <= os.path.getsize(target) else target
+
+
+def email_preview(image_path, max_side=None, fmt=None, quality=None):
+    """
+    Path of a downscaled preview of ``image_path`` to attach to emails
+
+    The preview is made on first use and cached next to the image.
+
+    Args:
+        image_path (str): Source image
+        max_side (int, optional): Longest side of the preview in pixels
+        fmt (str, optional): 'jpeg' or 'webp'
+        quality (int, optional): Encoder quality, 0-100
+
+    Returns:
+        str: Path of the file to attach (the source itself if it was already
+        smaller), or None if ``image_path`` doesn't exist or can't be decoded
+    """
+    if not image_path or not os.path.exists(image_path):
+        return None
+    fmt = fmt or Config.EMAIL_PREVIEW_FORMAT
+    max_side = max_side or Config.EMAIL_PREVIEW_MAX_SIDE
+    quality = quality or Config.EMAIL_PREVIEW_QUALITY
+
+    target = preview_path(image_path, fmt)
+    if _is_fresh(target, image_path):
+        return _smaller(target, image_path)
+
+    # Senders preparing the same detection in parallel encode it once
+    with _lock_for(target):
+        if _is_fresh(target, image_path):
+            return _smaller(target, image_path)
+
+        image = cv2.imread(image_path, cv2.IMREAD_COLOR)
+        if image is None:
+            logger.warning(f"Could not decode {image_path} for an email preview")
+            return None
+        height, width = image.shape[:2]
+        scale = max_side / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+
+        extension, quality_flag = PREVIEW_FORMATS[fmt]
+        ok, encoded = cv2.imencode(extension, image, [quality_flag, int(quality)])
+        if not ok:
+            logger.warning(f"Could not encode an email preview of {image_path}")
+            return None
+
+        # Write-then-rename so another process never attaches a half-written file
+        temp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(encoded.tobytes())
+        os.replace(temp_path, target)
+
+    return _smaller(target, image_path)
+
+
+def remove_previews(image_path):
+    """Delete the cached previews of ``image_path``"""
+    if not image_path:
+        return
+    for fmt in PREVIEW_FORMATS:
+        path = preview_path(image_path, fmt)
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Could not delete email preview {path}: {str(e)}")
@@ -6,9 +6,54 @@ from email.mime.image import MIMEImage
 from flask import current_app, render_template
 from pathlib import Path
 
+def results_html(detection_data):
+    """HTML body listing the detections in ``detection_data``"""
+    from utils.email_templates import render
+
+    return render('results_summary.html', detections=detection_data.get('detections', []))
+
+
+def queue_detection_results(recipient_email, detection_data, image_path=None, detection_id=None, summary=None):
+    """
+    Queue detection results in the email outbox (commits)
+
+    The outbox sender (services/email_outbox.py) delivers the email and keeps
+    its EmailLog entry up to date.
+
+    Args:
+        recipient_email (str): Email address of the recipient
+        detection_data (dict): Dictionary containing detection results
+        image_path (str, optional): Path to the processed image with detections
+        detection_id (int, optional): Detection the results belong to
+        summary (str, optional): EmailLog result summary
+
+    Returns:
+        EmailOutbox: The queued entry
+    """
+    from models import db
+    from models.email_outbox import EmailOutbox
+    from utils.email_attachments import email_preview
+
+    # Every recipient of a detection gets the same cached preview
+    preview = email_preview(image_path)
+    entry = EmailOutbox.enqueue(
+        recipient=recipient_email,
+        subject='Microorganism Detection Results',
+        html_body=results_html(detection_data),
+        detection_id=detection_id,
+        attachments=[preview] if preview else None,
+        summary=summary
+    )
+    db.session.commit()
+    return entry
+
+
 def send_detection_results(recipient_email, detection_data, image_path=None):
     """
-    Send detection results via email
+    Send detection results via email right away, on a new SMTP connection
+
+    Meant for checking the mail settings; the API queues results with
+    ``queue_detection_results`` instead.
     
     Args:
         recipient_email (str): Email address of the recipient
@@ -21,33 +66,19 @@ def send_detection_results(recipient_email, detection_data, image_path=None):
     msg['To'] = recipient_email
     msg['Subject'] = 'Microorganism Detection Results'
     
-    # Format detection results
-    results_text = ""
-    for i, detection in enumerate(detection_data.get('detections', []), 1):
-        results_text += f"{i}. {detection.get('class')} - {detection.get('confidence', 0) * 100:.2f}% confidence\n"
-    
     # Create HTML content
-        count = len(detection_data.get('detections', []))
-        html = f"""
-        <html>
-            <body>
-                <h2>Microorganism Detection Results</h2>
-                <p>Here are the results of your microorganism detection:</p>
-                <pre>{results_text}</pre>
-                <p>Total detections: {count}</p>
-                <p>Thank you for using our service!</p>
-            </body>
-        </html>
-        """
+    html = results_html(detection_data)
     
     # Attach HTML content
     msg.attach(MIMEText(html, 'html'))
     
-    # Attach image if provided
-    if image_path and os.path.exists(image_path):
-        with open(image_path, 'rb') as img:
+    # Attach a downscaled preview of the image if provided
+    from utils.email_attachments import email_preview
+    preview = email_preview(image_path)
+    if preview:
+        with open(preview, 'rb') as img:
             img_data = img.read()
-            image = MIMEImage(img_data, name=os.path.basename(image_path))
+            image = MIMEImage(img_data, name=os.path.basename(preview))
             msg.attach(image)
     
     # Send the email
@@ -0,0 +1,33 @@
+"""
+Email bodies rendered from the Jinja templates in templates/email/
+
+Templates are compiled on first use and kept by the environment, so each
+send only runs the compiled template. Works without an application context,
+which the outbox sender and the benchmarks don't always have.
+"""
+from pathlib import Path
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / 'templates' / 'email'
+
+_env = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_DIR)),
+    autoescape=select_autoescape(['html']),
+    auto_reload=False,
+    cache_size=-1
+)
+
+
+def render(name, **context):
+    """
+    Render ``templates/email/<name>``
+
+    Args:
+        name (str): Template file name, e.g. 'detection_results.html'
+        **context: Template variables
+
+    Returns:
+        str: Rendered body
+    """
+    return _env.get_template(name).render(**context)
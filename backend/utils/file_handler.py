@@ -0,0 +1,235 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CHUNK_SIZE = 1024 * 1024  # 1MB
+
+StoredBlob = namedtuple('StoredBlob', ['content_hash', 'path', 'size', 'created'])
+StoredBlob.__doc__ = """Result of storing an upload; ``created`` is False when the bytes were already stored"""
+
+
+def blob_path(root, content_hash, extension=''):
+    """
+    Where a blob with ``content_hash`` lives: ``<root>/blobs/ab/cd/abcd...<extension>``
+
+    Two levels of sharding keep any one directory small even with millions of uploads.
+    """
+    return os.path.join(root, 'blobs', content_hash[:2], content_hash[2:4], f"{content_hash}{extension}")
+
+
+def file_extension(filename):
+    """Lower-cased extension including the dot, or '' when there is none"""
+    return os.path.splitext(filename or '')[1].lower()
+
+
+def store_stream(stream, root, extension=''):
+    """
+    Stream an upload to content-addressed storage, hashing it on the way
+
+    Bytes go to a temporary file next to the blob store while a SHA-256 is
+    computed over the same chunks, so the upload is read exactly once. The
+    temporary file is then atomically moved to its hash-sharded path, or
+    discarded if that blob already exists.
+
+    Args:
+        stream: File-like object with ``read(size)`` (e.g. ``FileStorage.stream``)
+        root (str): Storage root, normally the upload folder
+        extension (str): Extension to keep on the stored blob, e.g. '.png'
+
+    Returns:
+        StoredBlob: Hash, path, size and whether a new blob was written
+    """
+    tmp_dir = os.path.join(root, 'blobs', 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+
+        if size == 0:
+            raise IOError("Failed to save file - file is empty")
+
+        return _move_to_store(tmp_path, root, digest.hexdigest(), size, extension)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _move_to_store(tmp_path, root, content_hash, size, extension):
+    """Move a fully written file to its hash-sharded path, or drop it if that blob exists"""
+    path = blob_path(root, content_hash, extension)
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return StoredBlob(content_hash, path, size, False)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return StoredBlob(content_hash, path, size, True)
+
+
+# Resumable uploads
+#
+# A resumable upload is written to ``<root>/blobs/partial/<upload_id>`` one
+# chunk at a time. Each chunk is appended at the offset the server last
+# acknowledged and fsynced before it is acknowledged, so a dropped
+# connection never costs more than the chunk in flight. The SHA-256 is
+# carried along in memory from chunk to chunk; a process that did not see
+# the earlier chunks (restart, another worker) rebuilds it from the bytes on
+# disk once, then continues incrementally.
+
+_digests = OrderedDict()
+_digests_guard = threading.Lock()
+MAX_CACHED_DIGESTS = 256
+
+
+def partial_path(root, upload_id):
+    """Where the bytes of resumable upload ``upload_id`` are collected"""
+    return os.path.join(root, 'blobs', 'partial', upload_id)
+
+
+def create_partial(root, upload_id):
+    """Create the empty partial file of a new resumable upload"""
+    path = partial_path(root, upload_id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'xb').close()
+    _remember_digest(path, 0, hashlib.sha256())
+    return path
+
+
+def remove_partial(path):
+    """Delete a partial upload and forget its hash state"""
+    with _digests_guard:
+        _digests.pop(path, None)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@contextmanager
+def locked_partial(path):
+    """
+    Open a partial upload for writing, holding an exclusive lock while it is open
+
+    The lock is advisory (``flock``) and also serialises writers in other
+    worker processes; on platforms without ``fcntl`` only the file is opened.
+
+    Raises:
+        FileNotFoundError: If the upload has no partial file
+    """
+    with open(path, 'r+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        yield f
+
+
+def _remember_digest(path, offset, digest):
+    with _digests_guard:
+        _digests[path] = (offset, digest)
+        _digests.move_to_end(path)
+        while len(_digests) > MAX_CACHED_DIGESTS:
+            _digests.popitem(last=False)
+
+
+def _digest_at(f, path, offset):
+    """SHA-256 state over the first ``offset`` bytes of the partial upload"""
+    with _digests_guard:
+        cached = _digests.pop(path, None)
+    if cached is not None and cached[0] == offset:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    f.seek(0)
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            raise IOError(f"Partial upload is shorter than the acknowledged {offset} bytes")
+        digest.update(chunk)
+        remaining -= len(chunk)
+    return digest
+
+
+def append_chunk(f, path, offset, stream, max_bytes):
+    """
+    Write a chunk at ``offset`` of a locked partial upload, hashing it on the way
+
+    Anything past ``offset`` (the remains of an interrupted chunk) is
+    discarded first. The chunk is on disk when this returns.
+
+    Args:
+        f: File object from ``locked_partial``
+        path (str): Path of the partial upload
+        offset (int): Bytes acknowledged so far
+        stream: File-like object with ``read(size)`` holding the chunk
+        max_bytes (int): Most bytes the chunk may have
+
+    Returns:
+        int: Number of bytes written
+
+    Raises:
+        ValueError: If the chunk is longer than ``max_bytes``
+    """
+    digest = _digest_at(f, path, offset)
+    f.seek(offset)
+    f.truncate()
+    written = 0
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        written += len(chunk)
+        if written > max_bytes:
+            raise ValueError(f"Chunk is larger than {max_bytes} bytes")
+        digest.update(chunk)
+        f.write(chunk)
+    f.flush()
+    os.fsync(f.fileno())
+    _remember_digest(path, offset + written, digest)
+    return written
+
+
+def partial_digest(f, path, size):
+    """Hex SHA-256 of a complete partial upload of ``size`` bytes"""
+    digest = _digest_at(f, path, size)
+    _remember_digest(path, size, digest)
+    return digest.hexdigest()
+
+
+def store_partial(path, root, content_hash, size, extension=''):
+    """
+    Add a complete, verified partial upload to content-addressed storage
+
+    The blob is a hard link to the partial file, which stays in place until
+    ``remove_partial`` once the upload is recorded as complete; a concurrent
+    finalize waiting on the lock then still finds it.
+
+    Returns:
+        StoredBlob: Hash, path, size and whether a new blob was written
+    """
+    blob = blob_path(root, content_hash, extension)
+    if os.path.exists(blob):
+        return StoredBlob(content_hash, blob, size, False)
+
+    os.makedirs(os.path.dirname(blob), exist_ok=True)
+    try:
+        os.link(path, blob)
+    except FileExistsError:
+        return StoredBlob(content_hash, blob, size, False)
+    return StoredBlob(content_hash, blob, size, True)
@@ -0,0 +1,85 @@
+"""
+Conditional GET and in-process response caching
+
+JSON responses are serialized once into a ``CachedResponse`` (body bytes plus
+a strong ETag over them), which can be kept in a ``TTLCache`` and replayed
+without touching the database. ``conditional`` answers ``If-None-Match``
+with 304 Not Modified.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import Response, request
+
+from utils.json_codec import dump_bytes
+
+CachedResponse = namedtuple('CachedResponse', ['body', 'etag'])
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after being stored"""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Cached value, or None when missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def serialize(payload):
+    """
+    Returns:
+        CachedResponse: ``payload`` as JSON bytes with a strong ETag over them
+    """
+    body = dump_bytes(payload)
+    return CachedResponse(body, hashlib.sha1(body).hexdigest())
+
+
+def conditional(cached, cache_control):
+    """
+    JSON response for ``cached``, or 304 Not Modified when the client's
+    ``If-None-Match`` already names its ETag
+
+    Args:
+        cached (CachedResponse): Serialized body and ETag
+        cache_control (str): Cache-Control header value
+    """
+    response = Response(cached.body, mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
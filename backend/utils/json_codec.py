@@ -0,0 +1,54 @@
+"""
+JSON encoding for stored documents and API responses
+
+Uses orjson when it is installed (several times faster than the standard
+library in both directions) and falls back to ``json`` otherwise. Either way
+the output is compact text.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def dumps(value):
+    """Serialize ``value`` to compact JSON text"""
+    return dump_bytes(value).decode()
+
+
+def dump_bytes(value):
+    """Serialize ``value`` to compact UTF-8 JSON"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def loads(text):
+    """
+    Parse JSON text (str or bytes)
+
+    Raises:
+        ValueError: If ``text`` isn't valid JSON
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def json_response(payload, status=200):
+    """``jsonify`` replacement that encodes with orjson when available"""
+    from flask import Response
+
+    return Response(dump_bytes(payload), status=status, mimetype='application/json')
+
+
+def loads_or(text, default):
+    """Parse ``text``, returning ``default`` when it is empty or not valid JSON"""
+    if not text:
+        return default
+    try:
+        return loads(text)
+    except (TypeError, ValueError):
+        return default
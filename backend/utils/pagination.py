@@ -0,0 +1,101 @@
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# Upper bound on ``per_page`` for both paging modes
+MAX_PER_PAGE = 100
+
+Page = namedtuple('Page', ['items', 'next_cursor', 'total', 'page', 'pages'])
+Page.__doc__ = """
+One page of results. ``page``/``pages`` are only set for offset paging and
+``total`` only when it was computed (always for offset paging, on request
+for cursor paging).
+"""
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor pointing just past the row with this (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple: (timestamp, id)
+
+    Raises:
+        ValueError: If the cursor wasn't produced by ``encode_cursor``
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return (datetime.fromisoformat(timestamp) if timestamp else None), row_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset_page(query, timestamp_column, id_column, cursor, limit):
+    """
+    Newest-first page starting after ``cursor``, keyed on (timestamp, id)
+
+    Seeks straight to the cursor position through the (timestamp, id) index,
+    so every page costs the same however deep it is.
+
+    Returns:
+        tuple: (items, next_cursor or None when there are no more rows)
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id)
+        ))
+
+    items = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return items, next_cursor
+
+
+def paginate(query, timestamp_column, id_column, args):
+    """
+    Page ``query`` newest-first according to request ``args``
+
+    Passing ``cursor`` (empty for the first page) selects keyset paging, with
+    ``include_total=true`` to also count the matching rows. Otherwise the
+    classic ``page``/``per_page`` offset paging is used, which always counts.
+    ``per_page`` is clamped to 1..MAX_PER_PAGE.
+
+    Args:
+        query: Flask-SQLAlchemy query without ordering
+        timestamp_column: Column the listing is sorted by
+        id_column: Unique tie-breaker column
+        args: ``request.args``
+
+    Returns:
+        Page
+    """
+    per_page = min(MAX_PER_PAGE, max(1, args.get('per_page', 10, type=int)))
+
+    if 'cursor' in args:
+        items, next_cursor = keyset_page(query, timestamp_column, id_column, args.get('cursor') or None, per_page)
+        include_total = args.get('include_total', 'false').lower() in ['true', '1', 't', 'yes']
+        total = query.order_by(None).count() if include_total else None
+        return Page(items, next_cursor, total, None, None)
+
+    page = max(1, args.get('page', 1, type=int))
+    result = query.order_by(timestamp_column.desc(), id_column.desc()).paginate(
+        page=page, per_page=per_page, error_out=False
+    )
+    next_cursor = None
+    if result.has_next and result.items:
+        last = result.items[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return Page(result.items, next_cursor, result.total, result.page, result.pages)
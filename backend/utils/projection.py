@@ -0,0 +1,46 @@
+"""
+``fields=`` projection for JSON listings
+
+``fields=id,filename,status,detected_organisms.class,detected_organisms.confidence``
+keeps those top-level keys, and inside ``detected_organisms`` (a dict or a
+list of dicts) only ``class`` and ``confidence``, leaving out verbose
+organism metadata such as descriptions and health effects.
+"""
+
+
+def parse_fields(value):
+    """
+    Parse a comma-separated ``fields`` value into a nested selection
+
+    Returns:
+        dict: key -> nested selection, or None to keep the whole value;
+        None when ``value`` is empty (no projection)
+    """
+    if not value:
+        return None
+    selection = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.') if part.strip()]
+        if not parts:
+            continue
+        node = selection
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                # Already selected whole; a sub-field doesn't narrow it
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return selection or None
+
+
+def project(value, selection):
+    """Apply a ``parse_fields`` selection to a dict, or to each item of a list"""
+    if selection is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, selection) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: project(value[key], sub) for key, sub in selection.items() if key in value}
@@ -0,0 +1,166 @@
+"""
+Detection worker pool
+
+Pulls queued detections off the job queue and processes them outside the
+request cycle, and sends queued emails from the outbox. The first worker
+process also builds hourly/daily digest emails. Run alongside the API server:
+
+    python worker.py                # DETECTION_WORKERS processes
+    python worker.py --workers 4
+    python worker.py --mail-senders 0   # leave emails to other workers
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger('detection_worker')
+
+
+def _consume(app, queue, stop_event):
+    """Process jobs until ``stop_event`` is set"""
+    from app import db, process_detection_job
+
+    while not stop_event.is_set():
+        job = queue.dequeue(timeout=5)
+        if job is None:
+            continue
+
+        detection_id = job.payload.get('detection_id')
+        logger.info(f"Job {job.id}: processing detection {detection_id} (attempt {job.attempts})")
+        with app.app_context():
+            try:
+                process_detection_job(
+                    detection_id,
+                    tiled=bool(job.payload.get('tiled')),
+                    content_hash=job.payload.get('content_hash'),
+                    notify_only=bool(job.payload.get('notify_only'))
+                )
+                queue.ack(job)
+            except Exception as e:
+                logger.exception(f"Job {job.id} failed: {str(e)}")
+                db.session.rollback()
+                if not queue.fail(job, str(e)):
+                    _mark_failed(detection_id, str(e))
+            finally:
+                db.session.remove()
+
+
+def _mark_failed(detection_id, error):
+    """Record a detection as failed once its job has run out of retries"""
+    from app import db
+    from models.detection import Detection
+
+    try:
+        detection = Detection.query.get(detection_id)
+        if detection is not None and detection.status not in ('completed', 'failed'):
+            detection.status = 'failed'
+            detection.error_message = error
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Could not mark detection {detection_id} as failed: {str(e)}")
+
+
+def run_worker(worker_id, threads, mail_senders=0):
+    """Entry point of a single worker process"""
+    logging.basicConfig(level=logging.INFO, format=f'%(asctime)s [worker-{worker_id}] %(levelname)s %(message)s')
+
+    # Imported here so every process builds its own app, engine and model state
+    from app import app
+    from services.job_queue import get_job_queue
+
+    queue = get_job_queue(app.config, consumer_id=f"worker-{worker_id}")
+
+    # Load the model before taking jobs so the first upload doesn't pay for it
+    from services.yolo_detection import get_detector, model_available
+    if model_available(Config):
+        get_detector(Config).warm_up()
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    logger.info(f"Worker {worker_id} started (pid {os.getpid()}, {threads} thread(s), {mail_senders} mail sender(s))")
+    consumers = [
+        threading.Thread(target=_consume, args=(app, queue, stop_event), name=f"consumer-{i}", daemon=True)
+        for i in range(threads)
+    ]
+    for consumer in consumers:
+        consumer.start()
+
+    sender = None
+    if mail_senders > 0:
+        from services.email_outbox import OutboxSender
+        sender = OutboxSender(app, threads=mail_senders)
+        sender.start(stop_event)
+
+    # One digest scheduler across the pool, so a window's digest is built once
+    scheduler = None
+    if worker_id == 0:
+        from services.email_digest import DigestScheduler
+        scheduler = DigestScheduler(app, interval=Config.DIGEST_CHECK_INTERVAL)
+        scheduler.start(stop_event)
+
+    for consumer in consumers:
+        consumer.join()
+    if sender is not None:
+        sender.join()
+    if scheduler is not None:
+        scheduler.join()
+    logger.info(f"Worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the detection worker pool')
+    parser.add_argument('--workers', type=int, default=Config.DETECTION_WORKERS,
+                        help='Number of worker processes')
+    parser.add_argument('--threads', type=int, default=Config.DETECTION_WORKER_THREADS,
+                        help='Concurrent jobs per worker process')
+    parser.add_argument('--mail-senders', type=int, default=Config.MAIL_SENDER_THREADS,
+                        help='Outbox sender threads (pooled SMTP connections) per worker process')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [supervisor] %(levelname)s %(message)s')
+
+    processes = {}
+    stopping = False
+
+    def spawn(worker_id):
+        process = multiprocessing.Process(target=run_worker, args=(worker_id, args.threads, args.mail_senders), name=f"worker-{worker_id}")
+        process.start()
+        processes[worker_id] = process
+
+    def shutdown(*_):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for worker_id in range(max(1, args.workers)):
+        spawn(worker_id)
+    logger.info(f"Started {len(processes)} detection worker(s)")
+
+    # Restart workers that die unexpectedly
+    while not stopping:
+        for worker_id, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"Worker {worker_id} exited with code {process.exitcode}, restarting")
+                spawn(worker_id)
+        time.sleep(1)
+
+    for process in processes.values():
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,7 +10,7 @@ CREATE TABLE IF NOT EXISTS detection (
     filename TEXT NOT NULL,
     original_image_path TEXT NOT NULL,
     processed_image_path TEXT,
-    detection_results TEXT, -- JSON string
+    detection_results TEXT, -- JSON string, without the organism list (see detected_organisms)
     confidence_scores TEXT, -- JSON string  
     detected_organisms TEXT, -- JSON string
     water_usage_recommendations TEXT, -- JSON string
@@ -74,6 +74,13 @@ CREATE TABLE IF NOT EXISTS system_stats (
     UNIQUE(date)
 );
 
+-- Organism_stats table - detected instances per organism (rollup of detection_organisms)
+CREATE TABLE IF NOT EXISTS organism_stats (
+    organism_id INTEGER PRIMARY KEY,
+    detection_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (organism_id) REFERENCES organisms(id) ON DELETE CASCADE
+);
+
 -- User_sessions table - track user sessions (optional)
 CREATE TABLE IF NOT EXISTS user_sessions (
     id TEXT PRIMARY KEY,
@@ -92,36 +99,9 @@ CREATE INDEX IF NOT EXISTS idx_water_quality_detection_id ON water_quality(detec
 CREATE INDEX IF NOT EXISTS idx_system_stats_date ON system_stats(date);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_expires ON user_sessions(expires_at);
 
--- Create triggers for maintaining system stats
-CREATE TRIGGER IF NOT EXISTS update_stats_on_detection_insert
-AFTER INSERT ON detection
-WHEN NEW.status = 'completed' OR NEW.status = 'failed'
-BEGIN
-    INSERT OR IGNORE INTO system_stats (date, total_detections, successful_detections, failed_detections)
-    VALUES (date('now'), 0, 0, 0);
-    
-    UPDATE system_stats 
-    SET 
-        total_detections = total_detections + 1,
-        successful_detections = successful_detections + CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END,
-        failed_detections = failed_detections + CASE WHEN NEW.status = 'failed' THEN 1 ELSE 0 END
-    WHERE date = date('now');
-END;
-
-CREATE TRIGGER IF NOT EXISTS update_stats_on_detection_update
-AFTER UPDATE ON detection
-WHEN NEW.status != OLD.status AND (NEW.status = 'completed' OR NEW.status = 'failed')
-BEGIN
-    INSERT OR IGNORE INTO system_stats (date, total_detections, successful_detections, failed_detections)
-    VALUES (date('now'), 0, 0, 0);
-    
-    UPDATE system_stats 
-    SET 
-        total_detections = total_detections + 1,
-        successful_detections = successful_detections + CASE WHEN NEW.status = 'completed' THEN 1 ELSE 0 END,
-        failed_detections = failed_detections + CASE WHEN NEW.status = 'failed' THEN 1 ELSE 0 END
-    WHERE date = date('now');
-END;
+-- system_stats and organism_stats are maintained by the application in the same
+-- transaction as each detection change (backend/models/statistics.py); rebuild
+-- or verify them with backend/rebuild_stats.py
 
 -- Insert initial organism data
 INSERT OR IGNORE INTO organisms (name, scientific_name, gram_type, shape, pathogenicity, description) VALUES
@@ -60,7 +60,7 @@ const DetectionList = () => {
         detection_id: detection.id
       });
       if (response.data && response.data.message) {
-        toast.success('Email resent successfully!');
+        toast.success('Email queued for resending!');
         fetchDetections();
       } else {
         throw new Error(response.data?.error || 'Failed to resend email');
@@ -112,10 +112,14 @@ const DetectionList = () => {
                         {detection.detected_organisms?.length > 0 && (
                           <p>{detection.detected_organisms.length} organism{detection.detected_organisms.length !== 1 ? 's' : ''} detected</p>
                         )}
-                        <p>Email: {detection.email_status === 'success' ? (
+                        <p>Email: {['sent', 'success'].includes(detection.email_status) ? (
                           <span className="text-green-600">Sent</span>
-                        ) : detection.email_status === 'failure' ? (
+                        ) : ['failed', 'failure'].includes(detection.email_status) ? (
                           <span className="text-red-600">Failed</span>
+                        ) : ['queued', 'retrying'].includes(detection.email_status) ? (
+                          <span className="text-yellow-600 capitalize">{detection.email_status}</span>
+                        ) : detection.email_status === 'digest_pending' ? (
+                          <span className="text-yellow-600">In next digest</span>
                         ) : (
                           <span className="text-gray-400">Never sent</span>
                         )}
@@ -129,7 +133,7 @@ const DetectionList = () => {
                       </div>
                     </div>
                     {/* Resend Email button for failed/never sent */}
-                    {['failure', 'never_sent'].includes(detection.email_status) && detection.email_recipient && (
+                    {['failed', 'failure', 'never_sent'].includes(detection.email_status) && detection.email_recipient && (
                       <button
                         onClick={() => handleResendEmail(detection)}
                         className="p-2 text-blue-600 hover:text-blue-900"
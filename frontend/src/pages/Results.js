@@ -49,7 +49,7 @@ const ResultsPage = () => {
       const data = res.data;
       setDetection(data);
 
-      if (data.status === 'completed') {
+      if (data.status === 'completed' || data.status === 'failed') {
         // Update image URLs
         if (data.original_image_path) {
           const originalPath = data.original_image_path.startsWith('http')
@@ -138,16 +138,16 @@ const ResultsPage = () => {
           </p>
         </div>
 
-        {detection.status === 'processing' && (
+        {(detection.status === 'pending' || detection.status === 'processing') && (
           <div className="flex items-center space-x-2 text-yellow-600">
             <Loader className="h-5 w-5 animate-spin" />
-            <span>Processing...</span>
+            <span>{detection.status === 'pending' ? 'Queued...' : 'Processing...'}</span>
           </div>
         )}
       </div>
 
       {/* Processing notice */}
-      {detection.status === 'processing' && (
+      {(detection.status === 'pending' || detection.status === 'processing') && (
         <div className="bg-yellow-50 border border-yellow-200 rounded-lg p-6">
           <div className="flex items-center space-x-3">
             <Loader className="h-6 w-6 text-yellow-600 animate-spin" />
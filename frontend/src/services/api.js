@@ -13,12 +13,9 @@ const api = axios.create({
 // Request interceptor
 api.interceptors.request.use(
   (config) => {
-    // Add timestamp to prevent caching
-    config.params = {
-      ...config.params,
-      _t: Date.now(),
-    };
-    
+    // No cache-busting parameter: the API's Cache-Control/ETag headers decide what the
+    // browser may reuse, and unchanged data revalidates with a 304
+
     // Log request in development
     if (process.env.NODE_ENV === 'development') {
       console.log(`🚀 ${config.method?.toUpperCase()} ${config.url}`, config.data || config.params);
@@ -102,13 +99,76 @@ export const apiService = {
     });
   },
   
+  // Upload several images and/or ZIP archives of images as one batch
+  uploadBatch: (files, { name, email, tiled } = {}, onUploadProgress) => {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('images', file));
+    if (name) formData.append('name', name);
+    if (email) formData.append('email', email);
+    if (tiled !== undefined) formData.append('tiled', tiled);
+
+    return api.post('/api/uploads/batch', formData, {
+      headers: {
+        'Content-Type': 'multipart/form-data',
+      },
+      onUploadProgress,
+    });
+  },
+
+  // Progress of a batch; pass results=false to skip the per-file list
+  getBatch: (batchId, results = true) =>
+    api.get(`/api/uploads/batch/${batchId}`, { params: { results } }),
+
+  // Resumable chunked upload for large images: start, PUT chunks at the acknowledged offset, finalize
+  startUpload: (file, { name, email, tiled } = {}) =>
+    api.post('/api/uploads', { filename: file.name, size: file.size, name, email, tiled }),
+
+  getUpload: (uploadId) => api.get(`/api/uploads/${uploadId}`),
+
+  uploadChunk: (uploadId, offset, chunk) =>
+    api.put(`/api/uploads/${uploadId}`, chunk, {
+      params: { offset },
+      headers: { 'Content-Type': 'application/octet-stream' },
+      timeout: 0,
+    }),
+
+  finalizeUpload: (uploadId) => api.post(`/api/uploads/${uploadId}/finalize`),
+
+  // Upload a file in chunks; pass a previous uploadId to resume where the server left off
+  uploadResumable: async (file, options = {}, onProgress, uploadId = null, maxRetries = 5) => {
+    let upload = uploadId
+      ? (await apiService.getUpload(uploadId)).data
+      : (await apiService.startUpload(file, options)).data;
+    let offset = upload.offset;
+    let failures = 0;
+    while (offset < file.size) {
+      try {
+        const chunk = file.slice(offset, offset + upload.chunk_size);
+        offset = (await apiService.uploadChunk(upload.upload_id, offset, chunk)).data.offset;
+        failures = 0;
+        if (onProgress) onProgress({ uploadId: upload.upload_id, offset, size: file.size });
+      } catch (error) {
+        if (++failures > maxRetries) throw error;
+        // Resume from whatever the server acknowledged last
+        offset = (await apiService.getUpload(upload.upload_id)).data.offset;
+      }
+    }
+    return apiService.finalizeUpload(upload.upload_id);
+  },
+
   // Get detection result
   getDetectionResult: (detectionId) => api.get(`/api/detection/${detectionId}`),
   
-  // Get all detections
-  getDetections: (page = 1, perPage = 10) => 
+  // Get all detections; fields (e.g. 'id,filename,status,detected_organisms.class') trims the payload
+  getDetections: (page = 1, perPage = 10, fields = undefined) => 
     api.get('/api/detections', {
-      params: { page, per_page: perPage }
+      params: { page, per_page: perPage, fields }
+    }),
+  
+  // Get detections after a cursor (pass '' for the first page, then next_cursor)
+  getDetectionsAfter: (cursor = '', perPage = 10, includeTotal = false, fields = undefined) =>
+    api.get('/api/detections', {
+      params: { cursor, per_page: perPage, include_total: includeTotal, fields }
     }),
   
   // Get image
@@ -120,6 +180,11 @@ export const apiService = {
   // Get statistics
   getStatistics: () => api.get('/api/statistics'),
   
+  // Email delivery mode of a recipient: 'immediate', 'hourly' or 'daily' (digest)
+  getEmailPreference: (email) => api.get('/api/email-preferences', { params: { email } }),
+  
+  setEmailPreference: (email, mode) => api.put('/api/email-preferences', { email, mode }),
+  
   // Delete detection (if implemented)
   deleteDetection: (detectionId) => api.delete(`/api/detection/${detectionId}`),
 };
@@ -130,6 +195,16 @@ export const createImageUrl = (detectionId, imageType) => {
   return `${baseURL}/api/image/${detectionId}/${imageType}`;
 };
 
+// Link to the streamed export; filters: { start, end, status, organism }
+export const createExportUrl = (format = 'ndjson', filters = {}) => {
+  const baseURL = process.env.REACT_APP_API_URL || 'http://localhost:5000';
+  const params = new URLSearchParams({ format });
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value) params.append(key, value);
+  });
+  return `${baseURL}/api/detections/export?${params.toString()}`;
+};
+
 export const downloadImage = async (detectionId, imageType, filename) => {
   try {
     const response = await apiService.getImage(detectionId, imageType);
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# The backend is run from its own directory (``python app.py``), so its modules import top-level
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, 'backend'))
+# app.py builds its app at import time; this keeps it on TestingConfig's in-memory database
+os.environ['FLASK_CONFIG'] = 'testing'
+
+
+@pytest.fixture
+def app(tmp_path):
+    """
+    app.py's app on empty tables, with uploads and the job queue under ``tmp_path``
+
+    The module-level app is used because the upload, detection and
+    statistics routes are registered on it rather than on a blueprint.
+    """
+    from app import app, db
+    from services import job_queue
+    from services.response_cache import detection_cache, statistics_cache
+
+    app.config.update(UPLOAD_FOLDER=str(tmp_path / 'uploads'), JOB_QUEUE_PATH=str(tmp_path / 'job_queue.db'))
+    os.makedirs(app.config['UPLOAD_FOLDER'])
+    job_queue._queue = None
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+    job_queue._queue = None
+    detection_cache.clear()
+    statistics_cache.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def detections(app):
+    from app import db
+    from models.detection import Detection
+
+    now = datetime.utcnow()
+    rows = [
+        Detection(
+            filename=f"page-{i}.png",
+            original_image_path=f"uploads/page-{i}.png",
+            status='completed',
+            # Pairs share a timestamp so pages have to break ties on id
+            timestamp=now + timedelta(seconds=i // 2)
+        )
+        for i in range(120)
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+@pytest.mark.parametrize('params', ['per_page=1000', 'cursor=&per_page=1000'])
+def test_detections_per_page_is_capped(client, detections, params):
+    from utils.pagination import MAX_PER_PAGE
+
+    response = client.get(f'/api/detections?{params}')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['detections']) == MAX_PER_PAGE
+
+
+@pytest.mark.parametrize('params', ['per_page=0', 'cursor=&per_page=-5'])
+def test_detections_per_page_is_at_least_one(client, detections, params):
+    response = client.get(f'/api/detections?{params}')
+
+    assert response.status_code == 200
+    assert len(response.get_json()['detections']) == 1
+
+
+def test_keyset_pages_cover_every_detection_once_newest_first(client, detections):
+    seen, cursor, pages = [], '', 0
+    while True:
+        body = client.get(f'/api/detections?cursor={cursor}&per_page=7').get_json()
+        seen.extend(d['id'] for d in body['detections'])
+        pages += 1
+        if not body['has_more']:
+            break
+        cursor = body['next_cursor']
+
+    assert pages == 18
+    assert seen == sorted(detections, reverse=True)
+    assert body['next_cursor'] is None
+
+
+def test_keyset_page_counts_only_on_request(client, detections):
+    assert 'total' not in client.get('/api/detections?cursor=').get_json()
+    assert client.get('/api/detections?cursor=&include_total=true').get_json()['total'] == 120
+
+
+def test_keyset_cursor_continues_offset_paging(client, detections):
+    first = client.get('/api/detections?page=1&per_page=10').get_json()
+    after = client.get(f"/api/detections?cursor={first['next_cursor']}&per_page=10").get_json()
+    second = client.get('/api/detections?page=2&per_page=10').get_json()
+
+    assert [d['id'] for d in after['detections']] == [d['id'] for d in second['detections']]
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'WzEsMl0', '%%%'])
+def test_invalid_cursor_is_rejected(client, detections, cursor):
+    response = client.get(f'/api/detections?cursor={cursor}')
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid cursor'
@@ -0,0 +1,140 @@
+"""
+POST /api/uploads/batch: per-file limits, ZIP handling and queue failures
+"""
+import io
+import os
+import struct
+import zipfile
+
+import cv2
+import numpy as np
+
+
+def png(seed):
+    image = np.random.RandomState(seed).randint(0, 255, (64, 64, 3), dtype=np.uint8)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def zip_of(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        for name, data in members:
+            if name.endswith('/'):
+                zf.writestr(zipfile.ZipInfo(name), b'')
+            else:
+                zf.writestr(name, data)
+    return buffer.getvalue()
+
+
+def understate_sizes(archive, size):
+    """Rewrite every header in a stored-only archive to claim ``size`` bytes uncompressed"""
+    data = bytearray(archive)
+    for signature, offset in ((b'PK\x03\x04', 22), (b'PK\x01\x02', 24)):
+        start = data.find(signature)
+        while start != -1:
+            struct.pack_into('<I', data, start + offset, size)
+            start = data.find(signature, start + 4)
+    return bytes(data)
+
+
+def post_batch(client, files):
+    return client.post('/api/uploads/batch', data={
+        'images': [(io.BytesIO(data), filename) for filename, data in files],
+        'tiled': 'false'
+    }, content_type='multipart/form-data')
+
+
+def stored_blobs(app):
+    blobs = []
+    for root, _, files in os.walk(os.path.join(app.config['UPLOAD_FOLDER'], 'blobs')):
+        blobs.extend(os.path.join(root, name) for name in files)
+    return blobs
+
+
+def test_file_over_the_per_file_limit_is_skipped(app, client, monkeypatch):
+    small = png(1)
+    monkeypatch.setitem(app.config, 'BATCH_MAX_FILE_SIZE', len(small))
+
+    response = post_batch(client, [('big.png', small + b'\0'), ('small.png', small)])
+
+    assert response.status_code == 202
+    payload = response.get_json()
+    assert payload['total'] == 1
+    assert payload['skipped'] == [{'filename': 'big.png', 'reason': 'File is larger than the per-file limit'}]
+    assert len(stored_blobs(app)) == 1  # the oversized file left nothing behind
+
+
+def test_zip_member_over_the_limit_is_skipped(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'BATCH_MAX_FILE_SIZE', 1024)
+    archive = zip_of([('big.png', b'\0' * 4096)])
+
+    response = post_batch(client, [('honest.zip', archive)])
+    assert response.status_code == 400
+    assert response.get_json()['skipped'] == [
+        {'filename': 'big.png', 'reason': 'File is larger than the per-file limit'}
+    ]
+
+    # Headers that understate the size do not get the member stored either:
+    # reading stops at the declared size and the CRC check rejects it
+    response = post_batch(client, [('lying.zip', understate_sizes(archive, 100))])
+    assert response.status_code == 400
+    assert [item['filename'] for item in response.get_json()['skipped']] == ['big.png']
+    assert stored_blobs(app) == []
+
+
+def test_zip_members_are_unpacked_and_junk_skipped(client):
+    from models.detection import Detection
+    from models.upload_batch import UploadBatch
+
+    archive = zip_of([
+        ('scans/', b''),
+        ('scans/day1/plate.png', png(1)),
+        ('scans/.hidden.png', png(2)),
+        ('__MACOSX/scans/._plate.png', b'resource fork'),
+        ('scans/notes.txt', b'not an image'),
+    ])
+
+    response = post_batch(client, [('scans.zip', archive), ('loose.png', png(3)), ('broken.zip', b'not a zip')])
+
+    assert response.status_code == 202
+    payload = response.get_json()
+    assert payload['total'] == 2
+    assert payload['skipped'] == [
+        {'filename': 'scans/notes.txt', 'reason': 'Invalid file type'},
+        {'filename': 'broken.zip', 'reason': 'Not a valid ZIP archive'},
+    ]
+    names = [Detection.query.get(detection_id).filename for detection_id in payload['detection_ids']]
+    assert names == ['plate.png', 'loose.png']
+    batch = UploadBatch.query.get(payload['batch_id'])
+    assert (batch.total, batch.skipped) == (2, 2)
+
+
+def test_queue_failure_fails_the_detections(app, client, monkeypatch):
+    from app import db
+    from models.detection import Detection
+    from models.statistics import SystemStats, check_rollups, rebuild_rollups
+
+    class BrokenQueue:
+        def enqueue_many(self, payloads):
+            raise ConnectionError("queue is down")
+
+    monkeypatch.setattr('services.job_queue.get_job_queue', lambda config: BrokenQueue())
+
+    response = post_batch(client, [('a.png', png(1)), ('b.png', png(2))])
+
+    assert response.status_code == 503
+    payload = response.get_json()
+    assert payload['error'] == "Failed to queue images for processing"
+    assert payload['batch_id']
+
+    db.session.expire_all()
+    detections = Detection.query.all()
+    assert [detection.status for detection in detections] == ['failed', 'failed']
+    assert all('queue is down' in detection.error_message for detection in detections)
+
+    assert check_rollups() == []
+    expected = {'total_detections': 2, 'completed_detections': 0, 'failed_detections': 2}
+    assert SystemStats.totals() == expected
+    rebuild_rollups()
+    db.session.commit()
+    assert SystemStats.totals() == expected
@@ -0,0 +1,26 @@
+def test_json_documents_round_trip(app):
+    from app import db
+    from models.detection import Detection
+
+    detection = Detection(filename='a.png', original_image_path='uploads/a.png')
+    detection.parsed_organisms = [{'class': 'e_coli', 'confidence': 0.9}]
+    detection.parsed_recommendations = {'risk_level': 'high', 'safe_uses': []}
+    db.session.add(detection)
+    db.session.commit()
+    db.session.expire_all()
+
+    detection = Detection.query.one()
+    assert detection.parsed_organisms == [{'class': 'e_coli', 'confidence': 0.9}]
+    assert detection.parsed_recommendations == {'risk_level': 'high', 'safe_uses': []}
+    assert detection.to_dict()['organism_count'] == 1
+
+
+def test_json_documents_default_to_their_types(app):
+    from models.detection import Detection
+
+    detection = Detection(filename='a.png', original_image_path='uploads/a.png')
+
+    assert detection.parsed_results == {}
+    assert detection.parsed_organisms == []
+    assert detection.parsed_recommendations == {}
+    assert detection.to_dict()['recommendations'] == {}
@@ -0,0 +1,215 @@
+"""
+Job queue semantics and the retry split in process_detection_job
+
+Permanent errors (unreadable images) fail the detection at once; anything
+else is raised so the queue retries it with backoff until the attempts run
+out, after which the worker marks the detection failed.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def queue(tmp_path):
+    from services.job_queue import SQLiteJobQueue
+
+    return SQLiteJobQueue(str(tmp_path / 'queue.db'), max_attempts=2, visibility_timeout=600)
+
+
+def test_enqueue_dequeue_ack(queue):
+    first = queue.enqueue({'detection_id': 1})
+    queue.enqueue_many([{'detection_id': 2}, {'detection_id': 3}])
+    assert queue.size() == 3
+
+    job = queue.dequeue(timeout=0)
+    assert (job.id, job.payload, job.attempts) == (first, {'detection_id': 1}, 1)
+    queue.ack(job)
+
+    assert [queue.dequeue(timeout=0).payload['detection_id'] for _ in range(2)] == [2, 3]
+    assert queue.dequeue(timeout=0) is None
+
+
+def test_a_job_is_claimed_by_one_consumer_only(queue):
+    from services.job_queue import SQLiteJobQueue
+
+    queue.enqueue_many([{'n': n} for n in range(40)])
+    claimed = []
+
+    def consume():
+        # Own instance per thread, as separate worker processes would have
+        consumer = SQLiteJobQueue(queue.path)
+        while True:
+            job = consumer.dequeue(timeout=0)
+            if job is None:
+                return
+            claimed.append(job.payload['n'])
+
+    threads = [threading.Thread(target=consume) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == list(range(40))
+
+
+def test_unacknowledged_job_is_redelivered_after_the_visibility_timeout(queue):
+    queue.visibility_timeout = 0.2
+    queue.enqueue({'detection_id': 1})
+
+    job = queue.dequeue(timeout=0)
+    assert queue.dequeue(timeout=0) is None
+
+    time.sleep(0.3)
+    again = queue.dequeue(timeout=0)
+    assert again.id == job.id
+    assert again.attempts == 2
+
+
+def test_failed_job_is_retried_with_backoff_until_attempts_run_out(queue, monkeypatch):
+    queue.enqueue({'detection_id': 1})
+
+    job = queue.dequeue(timeout=0)
+    assert queue.fail(job, 'boom') is True
+    assert queue.dequeue(timeout=0) is None  # waiting out the backoff
+    assert queue.size() == 1
+
+    monkeypatch.setattr(queue, '_retry_delay', lambda attempts: 0)
+    queue.enqueue({'detection_id': 2})
+    queue.fail(queue.dequeue(timeout=0), 'boom')
+    retried = queue.dequeue(timeout=0)
+    assert (retried.payload, retried.attempts) == ({'detection_id': 2}, 2)
+
+    assert queue.fail(retried, 'boom again') is False
+    assert queue.dequeue(timeout=0) is None
+    assert queue.size() == 1  # only job 1, still backing off
+
+
+def test_retry_delay_is_exponential_and_capped(queue):
+    assert [queue._retry_delay(attempts) for attempts in (1, 2, 3, 10)] == [2, 4, 8, 60]
+
+
+@pytest.mark.parametrize('timeout, seconds', [(None, 0), (0, 1), (0.2, 1), (1, 1), (2.5, 3)])
+def test_redis_dequeue_never_turns_a_short_timeout_into_blocking_forever(timeout, seconds):
+    from services.job_queue import RedisJobQueue
+
+    class Client:
+        def zrangebyscore(self, key, low, high):
+            return []
+
+        def brpoplpush(self, source, destination, timeout):
+            self.timeout = timeout
+            return None
+
+    queue = RedisJobQueue.__new__(RedisJobQueue)
+    queue.redis = Client()
+    queue.pending_key, queue.delayed_key, queue.processing_key = 'pending', 'delayed', 'processing'
+
+    assert queue.dequeue(timeout=timeout) is None
+    assert queue.redis.timeout == seconds
+
+
+def new_detection(path):
+    from app import db
+    from models.detection import Detection
+
+    detection = Detection(filename='a.png', original_image_path=str(path))
+    db.session.add(detection)
+    db.session.commit()
+    return detection.id
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / 'image.png'
+    cv2.imwrite(str(path), np.random.RandomState(0).randint(0, 255, (64, 64, 3), dtype=np.uint8))
+    return path
+
+
+@pytest.fixture
+def unavailable_backend(monkeypatch):
+    import app as app_module
+
+    calls = []
+
+    def unavailable(image, tiled=False):
+        calls.append(tiled)
+        raise RuntimeError('inference backend unavailable')
+
+    monkeypatch.setattr(app_module, 'detect_microorganisms_colab', unavailable)
+    return calls
+
+
+def test_unreadable_image_fails_without_retry(app, tmp_path):
+    from app import process_detection_job
+    from models.detection import Detection
+
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image')
+    detection_id = new_detection(path)
+
+    assert process_detection_job(detection_id) == 'failed'
+    assert 'decode' in Detection.query.get(detection_id).error_message
+
+
+def test_transient_error_is_raised_for_the_queue_to_retry(app, image, unavailable_backend):
+    from app import process_detection_job
+    from models.detection import Detection
+
+    detection_id = new_detection(image)
+
+    with pytest.raises(RuntimeError):
+        process_detection_job(detection_id)
+    assert Detection.query.get(detection_id).status == 'processing'
+
+
+def drain(app, queue):
+    """Run the worker loop until the queue has nothing ready"""
+    import worker
+
+    stop = threading.Event()
+
+    class UntilEmpty:
+        def dequeue(self, timeout=None):
+            job = queue.dequeue(timeout=0)
+            if job is None:
+                stop.set()
+            return job
+
+        def __getattr__(self, name):
+            return getattr(queue, name)
+
+    worker._consume(app, UntilEmpty(), stop)
+
+
+def test_worker_retries_transient_errors_then_marks_failed(app, queue, image, unavailable_backend, monkeypatch):
+    from models.detection import Detection
+
+    monkeypatch.setattr(queue, '_retry_delay', lambda attempts: 0)
+    detection_id = new_detection(image)
+    queue.enqueue({'detection_id': detection_id})
+
+    drain(app, queue)
+
+    detection = Detection.query.get(detection_id)
+    assert len(unavailable_backend) == queue.max_attempts
+    assert detection.status == 'failed'
+    assert detection.error_message == 'inference backend unavailable'
+
+
+def test_worker_does_not_retry_permanent_errors(app, queue, tmp_path):
+    from models.detection import Detection
+
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image')
+    detection_id = new_detection(path)
+    queue.enqueue({'detection_id': detection_id})
+
+    drain(app, queue)
+
+    assert Detection.query.get(detection_id).status == 'failed'
+    assert queue.size() == 0
@@ -0,0 +1,193 @@
+"""
+Outbox delivery against the local SMTP sink (backend/smtp_sink.py)
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def sink():
+    from smtp_sink import SMTPSink
+
+    with SMTPSink(port=0) as sink:
+        yield sink
+
+
+def mail_settings(sink):
+    return {
+        'MAIL_SERVER': sink.address[0],
+        'MAIL_PORT': sink.address[1],
+        'MAIL_USE_TLS': False,
+        'MAIL_USERNAME': '',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': 'lab@example.com',
+        'MAIL_MAX_ATTEMPTS': 3,
+        'MAIL_RETRY_BASE_DELAY': 30,
+    }
+
+
+@pytest.fixture
+def sender(app, sink, monkeypatch):
+    from services.email_outbox import OutboxSender
+
+    for key, value in mail_settings(sink).items():
+        monkeypatch.setitem(app.config, key, value)
+    sender = OutboxSender(app)
+    yield sender
+    sender.pool.close()
+
+
+def enqueue(recipient, subject='Results'):
+    from app import db
+    from models.email_outbox import EmailOutbox
+
+    entry = EmailOutbox.enqueue(recipient=recipient, subject=subject, html_body='<p>Results</p>', summary='test')
+    db.session.commit()
+    return entry.id
+
+
+def state(entry_id):
+    from app import db
+    from models import EmailLog
+    from models.email_outbox import EmailOutbox
+
+    db.session.expire_all()
+    entry = EmailOutbox.query.get(entry_id)
+    return entry, EmailLog.query.get(entry.email_log_id)
+
+
+def make_due(entry_id):
+    """Move an entry's next attempt into the past"""
+    from app import db
+    from models.email_outbox import EmailOutbox
+
+    EmailOutbox.query.filter_by(id=entry_id).update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_delivery_marks_entry_and_log_sent(sender, sink):
+    entry_id = enqueue('someone@example.com')
+
+    assert sender.send_due() == 1
+
+    entry, log = state(entry_id)
+    assert (entry.status, entry.attempts, log.status) == ('sent', 1, 'sent')
+    assert [message['To'] for message in sink.messages] == ['someone@example.com']
+    assert sender.send_due() == 0
+
+
+def test_transient_rejection_is_retried_with_backoff(sender, sink):
+    sink.rejections['busy@example.com'] = '452 Mailbox temporarily full'
+    entry_id = enqueue('busy@example.com')
+
+    before = datetime.utcnow()
+    assert sender.send_due() == 1
+    entry, log = state(entry_id)
+    assert (entry.status, entry.attempts, log.status) == ('pending', 1, 'retrying')
+    assert '452' in entry.last_error
+    assert entry.next_attempt_at >= before + timedelta(seconds=30)
+    assert sender.send_due() == 0  # not due yet
+
+    # Due again, and the mailbox has room now
+    del sink.rejections['busy@example.com']
+    make_due(entry_id)
+    assert sender.send_due() == 1
+
+    entry, log = state(entry_id)
+    assert (entry.status, entry.attempts, log.status) == ('sent', 2, 'sent')
+    assert len(sink.messages) == 1
+
+
+def test_retries_stop_after_max_attempts(sender, sink):
+    sink.rejections['busy@example.com'] = '452 Mailbox temporarily full'
+    entry_id = enqueue('busy@example.com')
+    for _ in range(3):
+        assert sender.send_due() == 1
+        make_due(entry_id)
+
+    entry, log = state(entry_id)
+    assert (entry.status, entry.attempts, log.status) == ('failed', 3, 'failed')
+
+
+def test_permanent_rejection_fails_at_once(sender, sink):
+    sink.rejections['nobody@example.com'] = '550 No such user'
+    entry_id = enqueue('nobody@example.com')
+
+    assert sender.send_due() == 1
+
+    entry, log = state(entry_id)
+    assert (entry.status, entry.attempts, log.status) == ('failed', 1, 'failed')
+    assert '550' in log.result_summary
+    assert sink.messages == []
+
+
+def test_claimed_entry_is_not_claimed_again(app):
+    from models.email_outbox import EmailOutbox
+
+    entry_id = enqueue('someone@example.com')
+
+    assert [entry.id for entry in EmailOutbox.claim_due(10, 300)] == [entry_id]
+    assert EmailOutbox.claim_due(10, 300) == []
+
+
+def test_claim_lost_to_another_sender_is_skipped(app, monkeypatch):
+    """An entry another sender claims between our read and our update is not ours"""
+    from app import db
+    from models.email_outbox import EmailOutbox
+
+    enqueue('someone@example.com')
+    execute = db.session.execute
+
+    def other_sender_first(statement, *args, **kwargs):
+        monkeypatch.setattr(db.session, 'execute', execute)
+        execute(EmailOutbox.__table__.update().values(status='sending', attempts=EmailOutbox.attempts + 1))
+        return execute(statement, *args, **kwargs)
+
+    monkeypatch.setattr(db.session, 'execute', other_sender_first)
+
+    assert EmailOutbox.claim_due(10, 300) == []
+
+
+def test_concurrent_senders_deliver_each_entry_once(sink, tmp_path, monkeypatch):
+    """Several senders sharing a database file never send the same entry twice"""
+    import config
+    from app import create_app, db
+    from services.email_outbox import OutboxSender
+
+    # In-memory SQLite is one shared connection; concurrent claims need a real file
+    monkeypatch.setattr(config.TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'outbox.db'}")
+    app = create_app('testing')
+    app.config.update(mail_settings(sink), MAIL_BATCH_SIZE=3)
+    with app.app_context():
+        subjects = [f"Results {n}" for n in range(30)]
+        for subject in subjects:
+            enqueue('someone@example.com', subject)
+        db.session.remove()
+
+    sender = OutboxSender(app, threads=4)
+    errors = []
+
+    def drain():
+        idle = 0
+        while idle < 3:
+            try:
+                idle = 0 if sender.send_due() else idle + 1
+            except OperationalError:
+                # Lost a write race on the file: the entries stay claimable
+                idle = 0
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=drain) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sender.pool.close()
+
+    assert errors == []
+    assert sorted(message['Subject'] for message in sink.messages) == sorted(subjects)
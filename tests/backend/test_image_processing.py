@@ -0,0 +1,18 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.mark.parametrize('preset, quality, expected', [
+    ('standard', 'fast', 'standard'),
+    ('standard', 'high', 'standard'),
+    ('overlay', 'high', 'overlay'),
+    ('enhanced', 'fast', 'enhanced:fast'),
+    ('enhanced', 'high', 'enhanced:high'),
+])
+def test_stain_version_includes_quality_only_when_it_matters(preset, quality, expected):
+    from services.gram_staining import stain_version
+
+    config = SimpleNamespace(GRAM_STAIN_PRESET=preset, GRAM_STAIN_QUALITY=quality)
+
+    assert stain_version(config) == expected
@@ -0,0 +1,76 @@
+"""
+Query-count regression test for the /api/detections listing
+
+The number of SELECTs must not grow with the page size (the old per-row
+EmailLog lookup cost one extra query per detection).
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+MAX_SELECTS = 3  # count, page of detections, latest email logs
+
+
+@pytest.fixture
+def seeded(app):
+    from app import db
+    from models import EmailLog
+    from models.detection import Detection
+
+    now = datetime.utcnow()
+    detections = [
+        Detection(
+            filename=f"querycount-{i}.png",
+            original_image_path=f"uploads/querycount-{i}.png",
+            status='completed',
+            timestamp=now + timedelta(seconds=i)
+        )
+        for i in range(60)
+    ]
+    db.session.add_all(detections)
+    db.session.flush()
+    for detection in detections:
+        for attempt in range(3):
+            db.session.add(EmailLog(
+                recipient='lab@example.com',
+                detection_id=detection.id,
+                sent_at=now + timedelta(minutes=attempt),
+                status='sent' if attempt == 2 else 'failed'
+            ))
+    db.session.commit()
+    return app
+
+
+def count_selects(app, per_page):
+    from app import db
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = app.test_client().get(f'/api/detections?per_page={per_page}')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements)
+
+
+def test_listing_query_count_is_constant(seeded):
+    small = count_selects(seeded, 5)
+    large = count_selects(seeded, 50)
+
+    assert small == large
+    assert large <= MAX_SELECTS
+
+
+def test_listing_reports_latest_email_status(seeded):
+    listing = seeded.test_client().get('/api/detections?per_page=5').get_json()['detections']
+
+    assert len(listing) == 5
+    assert all(d['email_status'] == 'sent' for d in listing)
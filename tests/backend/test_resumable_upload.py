@@ -0,0 +1,130 @@
+"""
+Resumable uploads: chunk offsets, checksum verification and finalize retries
+"""
+import hashlib
+import os
+
+import cv2
+import numpy as np
+
+IMAGE = cv2.imencode('.png', np.random.RandomState(7).randint(0, 255, (64, 64, 3), dtype=np.uint8))[1].tobytes()
+SHA256 = hashlib.sha256(IMAGE).hexdigest()
+
+
+def start(client, **fields):
+    response = client.post('/api/uploads', json={'filename': 'slide.png', 'size': len(IMAGE), **fields})
+    assert response.status_code == 201
+    return response.get_json()['upload_id']
+
+
+def put(client, upload_id, offset, data):
+    return client.put(f'/api/uploads/{upload_id}?offset={offset}', data=data,
+                      content_type='application/octet-stream')
+
+
+def upload_all(client, upload_id):
+    half = len(IMAGE) // 2
+    assert put(client, upload_id, 0, IMAGE[:half]).status_code == 200
+    response = put(client, upload_id, half, IMAGE[half:])
+    assert response.status_code == 200
+    assert response.get_json()['complete'] is True
+
+
+def finalize(client, upload_id, **fields):
+    return client.post(f'/api/uploads/{upload_id}/finalize', json=fields)
+
+
+def partial_exists(app, upload_id):
+    from utils.file_handler import partial_path
+
+    return os.path.exists(partial_path(app.config['UPLOAD_FOLDER'], upload_id))
+
+
+def test_chunks_must_arrive_at_the_acknowledged_offset(client):
+    upload_id = start(client)
+
+    assert put(client, upload_id, 0, IMAGE[:100]).get_json()['offset'] == 100
+
+    # A repeated or skipped chunk is told where to resume
+    for offset in (0, 200):
+        response = put(client, upload_id, offset, IMAGE[offset:offset + 100])
+        assert response.status_code == 409
+        assert response.get_json()['offset'] == 100
+
+    response = put(client, upload_id, 100, IMAGE[100:] + b'extra')
+    assert response.status_code == 400
+    assert response.get_json()['error'] == "Chunk goes past the end of the file"
+
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['offset'] == 100
+    response = finalize(client, upload_id)
+    assert response.status_code == 409
+    assert response.get_json()['offset'] == 100
+
+
+def test_checksum_mismatch_fails_the_upload(app, client):
+    upload_id = start(client, sha256=hashlib.sha256(b'something else').hexdigest())
+    upload_all(client, upload_id)
+
+    response = finalize(client, upload_id)
+
+    assert response.status_code == 422
+    assert response.get_json()['sha256'] == SHA256
+    assert client.get(f'/api/uploads/{upload_id}').get_json()['status'] == 'failed'
+    assert not partial_exists(app, upload_id)
+    assert put(client, upload_id, len(IMAGE), b'x').status_code == 409
+
+
+def test_matching_checksum_is_finalized(app, client):
+    from models.detection import Detection
+
+    upload_id = start(client)
+    upload_all(client, upload_id)
+
+    response = finalize(client, upload_id, sha256=SHA256)
+
+    assert response.status_code == 202
+    detection = Detection.query.get(response.get_json()['detection_id'])
+    assert detection.status == 'pending'
+    with open(detection.original_image_path, 'rb') as f:
+        assert f.read() == IMAGE
+    assert not partial_exists(app, upload_id)
+
+
+def test_finalize_retries_after_the_queue_fails(app, client, monkeypatch):
+    import services.job_queue
+    from models.detection import Detection
+
+    class BrokenQueue:
+        def enqueue(self, payload):
+            raise ConnectionError("queue is down")
+
+    get_job_queue = services.job_queue.get_job_queue
+    monkeypatch.setattr(services.job_queue, 'get_job_queue', lambda config: BrokenQueue())
+    upload_id = start(client, sha256=SHA256)
+    upload_all(client, upload_id)
+
+    response = finalize(client, upload_id)
+
+    assert response.status_code == 503
+    failed_detection_id = response.get_json()['detection_id']
+    upload = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert upload['status'] == 'uploading'
+    assert 'queue is down' in upload['error_message']
+    assert partial_exists(app, upload_id)
+
+    # Once the queue is back, finalizing again queues a new detection
+    monkeypatch.setattr(services.job_queue, 'get_job_queue', get_job_queue)
+    response = finalize(client, upload_id)
+
+    assert response.status_code == 202
+    detection_id = response.get_json()['detection_id']
+    assert detection_id != failed_detection_id
+    assert Detection.query.get(failed_detection_id).status == 'failed'
+    upload = client.get(f'/api/uploads/{upload_id}').get_json()
+    assert (upload['status'], upload['error_message']) == ('completed', None)
+    assert not partial_exists(app, upload_id)
+
+    response = finalize(client, upload_id)
+    assert response.status_code == 200
+    assert response.get_json()['message'] == "Upload already finalized"
+    assert response.get_json()['detection_id'] == detection_id
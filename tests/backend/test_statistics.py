@@ -0,0 +1,169 @@
+"""
+The system_stats/organism_stats rollups must always agree with the raw rows
+
+Every test ends with ``check_rollups() == []`` and with the totals matching
+what ``rebuild_rollups()`` computes from scratch.
+"""
+import io
+import json
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import pytest
+
+ORGANISMS = [{'class': 'e_coli', 'confidence': 0.9}, {'class': 'e_coli', 'confidence': 0.8},
+             {'class': 'salmonella', 'confidence': 0.7}]
+
+
+def png(seed):
+    image = np.random.RandomState(seed).randint(0, 255, (64, 64, 3), dtype=np.uint8)
+    return cv2.imencode('.png', image)[1].tobytes()
+
+
+def new_detection(**fields):
+    from app import db
+    from models.detection import Detection
+
+    fields.setdefault('original_image_path', 'uploads/a.png')
+    detection = Detection(filename='a.png', **fields)
+    db.session.add(detection)
+    db.session.commit()
+    return detection
+
+
+def complete(detection, organisms=ORGANISMS):
+    from app import db
+    from models.organism import DetectionOrganism
+
+    detection.parsed_organisms = organisms
+    DetectionOrganism.add_for_detection(detection.id, organisms)
+    detection.status = 'completed'
+    db.session.commit()
+
+
+def assert_consistent(expected_totals):
+    from app import db
+    from models.statistics import OrganismStats, SystemStats, check_rollups, rebuild_rollups
+
+    assert check_rollups() == []
+    totals = SystemStats.totals()
+    assert totals == expected_totals
+
+    organisms = OrganismStats.counts()
+    rebuild_rollups()
+    db.session.commit()
+    assert SystemStats.totals() == totals
+    assert OrganismStats.counts() == organisms
+
+
+def totals(total, completed=0, failed=0):
+    return {'total_detections': total, 'completed_detections': completed, 'failed_detections': failed}
+
+
+def test_single_detection_lifecycle(app):
+    from app import db
+    from models.statistics import OrganismStats
+
+    completed = new_detection()
+    failed = new_detection(timestamp=datetime.utcnow() - timedelta(days=2))
+    assert_consistent(totals(2))
+
+    for detection in (completed, failed):
+        detection.status = 'processing'
+    db.session.commit()
+    assert_consistent(totals(2))
+
+    complete(completed)
+    failed.status = 'failed'
+    db.session.commit()
+    assert_consistent(totals(2, completed=1, failed=1))
+    assert OrganismStats.counts() == {'e_coli': 2, 'salmonella': 1}
+
+
+def test_status_change_on_an_expired_detection_is_counted(app):
+    from app import db
+    from models.detection import Detection
+
+    detection_id = new_detection(status='processing').id
+    db.session.rollback()  # expires everything, like process_detection_job's error path
+
+    detection = Detection.query.get(detection_id)
+    db.session.expire(detection)
+    detection.status = 'failed'
+    db.session.commit()
+
+    assert_consistent(totals(1, failed=1))
+
+
+def test_unreadable_image_job_is_counted_as_failed(app, tmp_path):
+    from app import process_detection_job
+
+    path = tmp_path / 'broken.png'
+    path.write_bytes(b'not an image')
+    detection_id = new_detection(original_image_path=str(path)).id
+
+    assert process_detection_job(detection_id) == 'failed'
+    assert_consistent(totals(1, failed=1))
+
+
+def test_transient_job_error_leaves_rollups_consistent(app, tmp_path, monkeypatch):
+    import app as app_module
+
+    def unavailable(image, tiled=False):
+        raise RuntimeError('inference backend unavailable')
+
+    monkeypatch.setattr(app_module, 'detect_microorganisms_colab', unavailable)
+    path = tmp_path / 'image.png'
+    path.write_bytes(png(1))
+    detection_id = new_detection(original_image_path=str(path)).id
+
+    with pytest.raises(RuntimeError):
+        app_module.process_detection_job(detection_id)
+    assert_consistent(totals(1))
+
+
+def test_deleting_detections(app, client):
+    from models.statistics import OrganismStats
+
+    kept, removed, failed = new_detection(), new_detection(), new_detection(status='failed')
+    complete(kept, ORGANISMS[:1])
+    complete(removed)
+
+    assert client.delete(f'/api/detection/{removed.id}').status_code == 200
+    assert client.delete(f'/api/detection/{failed.id}').status_code == 200
+
+    assert_consistent(totals(1, completed=1))
+    assert OrganismStats.counts() == {'e_coli': 1}
+
+
+def test_batch_insert_path(app, client):
+    from app import db, record_fingerprint
+    from models.detection import Detection
+    from models.upload_batch import UploadBatchItem
+
+    first = client.post('/api/uploads/batch', data={
+        'images': [(io.BytesIO(png(1)), 'a.png'), (io.BytesIO(png(2)), 'b.png')],
+        'tiled': 'false'
+    }, content_type='multipart/form-data').get_json()
+    assert_consistent(totals(2))
+
+    # Complete one, then upload it again so the batch reuses its results
+    source = Detection.query.get(first['detection_ids'][0])
+    complete(source)
+    content_hash = UploadBatchItem.query.filter_by(detection_id=source.id).one().content_hash
+    record_fingerprint(source, content_hash, False)
+    db.session.commit()
+
+    second = client.post('/api/uploads/batch', data={
+        'images': [(io.BytesIO(png(1)), 'again.png'), (io.BytesIO(png(3)), 'c.png')],
+        'tiled': 'false'
+    }, content_type='multipart/form-data').get_json()
+    assert second['cached'] == 1
+    cached = Detection.query.get(second['detection_ids'][0])
+    assert cached.status == 'completed'
+    assert json.loads(cached.detected_organisms) == ORGANISMS
+    assert_consistent(totals(4, completed=2))
+
+    assert client.delete(f"/api/detection/{second['detection_ids'][0]}").status_code == 200
+    assert_consistent(totals(3, completed=1))